@@ -0,0 +1,369 @@
+from array import array
+from dataclasses import dataclass, field
+import math
+import struct
+import sys
+
+from graphviz import Digraph
+
+from hoc_ast import *
+from parser import Parser
+from evaluator import functions, operators
+
+"""
+Arena: flat storage of the AST
+The nodes are rows of parallel arrays instead of objects:
+  ops[i] : The opcode of the node i
+  a[i], b[i] : The operands of the node i (index of a child, of a constant or of a name)
+The numbers live in a pool of constants (array of doubles) and the names of the variables
+and functions in a pool of names. The children of a node are always built before the node,
+so every child has a smaller index than its parent: a single pass over the arrays in order
+visits the children before the parents (a postorder of the whole program) with no recursion.
+
+  opcode      a            b
+  NUMBER      constant     -
+  VARIABLE    name         -
+  TARGET      name         -           (the variable on the left of an assignment)
+  ASSIGN      TARGET node  expr node
+  FUNCTION    expr node    name
+  EXP         base node    exp node
+  PARENS      expr node    -
+  ADD ... MOD left node    right node
+  NEG, POS    operand node -
+"""
+
+#Opcodes
+NUMBER, VARIABLE, TARGET, ASSIGN, FUNCTION, EXP, PARENS, ADD, SUB, MUL, DIV, MOD, NEG, POS = range(14)
+
+binary_opcodes = {'+': ADD, '-': SUB, '*': MUL, '/': DIV, '%': MOD}
+unary_opcodes = {'-': NEG, '+': POS}
+binary_operators = {opcode: operator for operator, opcode in binary_opcodes.items()}
+unary_operators = {opcode: operator for operator, opcode in unary_opcodes.items()}
+binary_functions = {opcode: operators[operator] for operator, opcode in binary_opcodes.items()}
+
+#Binary format: magic, version, byte order of the arrays, number of nodes, constants, roots, size of the names
+HEADER = struct.Struct('<4sHBxqqqq')
+MAGIC = b'HOCA'
+VERSION = 2
+LITTLE, BIG = 0, 1
+
+"""
+Arena class
+A whole program stored in parallel arrays. It is also a node factory:
+Parser(factory = arena) emits the nodes straight into the arrays and returns their indices.
+Attributes:
+  ops : array. The opcodes
+  a : array. The first operand of each node
+  b : array. The second operand of each node
+  consts : array. The pool of constants
+  names : list. The pool of names (variables and functions)
+  roots : array. The nodes of the statements
+Methods:
+  number, variable, ... : The NodeFactory interface, each method returns the index of the new node
+  children(self, i) -> tuple : The children of the node i
+  postorder(self, root) : Iterates over the nodes of a subtree, children first
+  to_node(self, i) -> Node : Builds the object tree of the node i
+  add(self, node) -> int : Stores an object tree in the arena
+  evaluate(self, env) -> list : Evaluates the statements
+  copy(self) -> Arena : Copies the arena (one copy per array)
+  tobytes(self) -> bytes, frombytes(data) -> Arena : Serialization
+"""
+@dataclass
+class Arena:
+  ops: array = field(default_factory = lambda: array('B'))
+  a: array = field(default_factory = lambda: array('i'))
+  b: array = field(default_factory = lambda: array('i'))
+  consts: array = field(default_factory = lambda: array('d'))
+  names: list = field(default_factory = list)
+  roots: array = field(default_factory = lambda: array('i'))
+  name_index: dict = field(default_factory = dict, repr = False)
+
+  def __len__(self):
+    return len(self.ops)
+
+  def _emit(self, op, a = 0, b = 0):
+    self.ops.append(op)
+    self.a.append(a)
+    self.b.append(b)
+    return len(self.ops) - 1
+
+  def _name(self, name):
+    index = self.name_index.get(name)
+    if index is None:
+      index = self.name_index[name] = len(self.names)
+      self.names.append(name)
+    return index
+
+  #NodeFactory interface ------------------------------------------------
+
+  def number(self, value):
+    self.consts.append(value)
+    return self._emit(NUMBER, len(self.consts) - 1)
+
+  def variable(self, name):
+    return self._emit(VARIABLE, self._name(name))
+
+  def assignment(self, var, expr):
+    self.ops[var] = TARGET #The variable is written, not read
+    return self._emit(ASSIGN, var, expr)
+
+  def function(self, name, expr):
+    return self._emit(FUNCTION, expr, self._name(name))
+
+  def exponentiation(self, base, exp):
+    return self._emit(EXP, base, exp)
+
+  def parentheses(self, expr):
+    return self._emit(PARENS, expr)
+
+  def binary(self, operator, left, right):
+    return self._emit(binary_opcodes[operator], left, right)
+
+  def unary(self, operator, operand):
+    return self._emit(unary_opcodes[operator], operand)
+
+  def is_variable(self, node):
+    return self.ops[node] == VARIABLE
+
+  def is_zero(self, node):
+    return self.ops[node] == NUMBER and self.consts[self.a[node]] == 0
+
+  #Traversal ------------------------------------------------------------
+
+  def children(self, i):
+    op = self.ops[i]
+    if op in (NUMBER, VARIABLE, TARGET):
+      return ()
+    if op in (FUNCTION, PARENS, NEG, POS):
+      return (self.a[i],)
+    return (self.a[i], self.b[i])
+
+  def postorder(self, root):
+    """
+    Iterates over the indices of the subtree of root, children first, with an explicit stack
+    """
+    stack = [(root, False)]
+    while stack:
+      i, expanded = stack.pop()
+      if expanded:
+        yield i
+      else:
+        stack.append((i, True))
+        stack.extend((child, False) for child in reversed(self.children(i)))
+
+  def to_node(self, root):
+    nodes = {}
+    for i in self.postorder(root):
+      op, a, b = self.ops[i], self.a[i], self.b[i]
+      if op == NUMBER:
+        node = Number(self.consts[a])
+      elif op in (VARIABLE, TARGET):
+        node = Variable(self.names[a])
+      elif op == ASSIGN:
+        node = Assignment(nodes.pop(a), nodes.pop(b))
+      elif op == FUNCTION:
+        node = Function(self.names[b], nodes.pop(a))
+      elif op == EXP:
+        node = Exponentiation(nodes.pop(a), nodes.pop(b))
+      elif op == PARENS:
+        node = Parentheses(nodes.pop(a))
+      elif op in binary_operators:
+        node = Binary(binary_operators[op], nodes.pop(a), nodes.pop(b))
+      else:
+        node = Unary(unary_operators[op], nodes.pop(a))
+      nodes[i] = node
+    return nodes[root]
+
+  def to_nodes(self):
+    return [self.to_node(root) for root in self.roots]
+
+  def add(self, node):
+    """
+    Stores an object tree in the arena, returns the index of its root
+    """
+    return node.accept(ArenaBuilder(self))
+
+  #Evaluation -----------------------------------------------------------
+
+  def evaluate(self, env = None):
+    """
+    Evaluates all the statements in one pass over the arrays, returns the value of each statement.
+    The nodes are stored in the order of the program, so the assignments are seen in order too.
+    """
+    env = {} if env is None else env
+    consts, names = self.consts, self.names
+    values = [0.0] * len(self.ops)
+    for i, (op, a, b) in enumerate(zip(self.ops, self.a, self.b)):
+      if op == NUMBER:
+        values[i] = consts[a]
+      elif op == VARIABLE:
+        try:
+          values[i] = env[names[a]]
+        except KeyError:
+          raise NameError(f"Undefined variable {names[a]}") from None
+      elif op in binary_functions:
+        values[i] = binary_functions[op](values[a], values[b])
+      elif op == NEG:
+        values[i] = -values[a]
+      elif op == POS or op == PARENS:
+        values[i] = values[a]
+      elif op == FUNCTION:
+        values[i] = functions[names[b]](values[a])
+      elif op == EXP:
+        values[i] = math.pow(values[a], values[b])
+      elif op == ASSIGN:
+        values[i] = env[names[self.a[a]]] = values[b]
+    return [values[root] for root in self.roots]
+
+  #Bulk operations ------------------------------------------------------
+
+  def copy(self):
+    return Arena(array('B', self.ops), array('i', self.a), array('i', self.b), array('d', self.consts),
+                 list(self.names), array('i', self.roots), dict(self.name_index))
+
+  def tobytes(self):
+    """
+    Serializes the arena: a header and then the raw bytes of each array, in the byte order of the
+    machine (given by the header)
+    """
+    names = '\n'.join(self.names).encode()
+    order = LITTLE if sys.byteorder == 'little' else BIG
+    header = HEADER.pack(MAGIC, VERSION, order, len(self.ops), len(self.consts), len(self.roots), len(names))
+    return b''.join([header, self.ops.tobytes(), self.a.tobytes(), self.b.tobytes(),
+                     self.consts.tobytes(), self.roots.tobytes(), names])
+
+  @classmethod
+  def frombytes(cls, data):
+    magic, version, order, nodes, consts, roots, names = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION or order not in (LITTLE, BIG):
+      raise ValueError('Not an arena of this version')
+    arena = cls()
+    view = memoryview(data)
+    offset = HEADER.size
+    for arr, count in ((arena.ops, nodes), (arena.a, nodes), (arena.b, nodes),
+                       (arena.consts, consts), (arena.roots, roots)):
+      size = count * arr.itemsize
+      arr.frombytes(view[offset:offset + size])
+      if order != (LITTLE if sys.byteorder == 'little' else BIG):
+        arr.byteswap() #Written by a machine of the other byte order
+      offset += size
+    if names:
+      arena.names = bytes(view[offset:offset + names]).decode().split('\n')
+    arena.name_index = {name: i for i, name in enumerate(arena.names)}
+    return arena
+
+
+"""
+ArenaBuilder class
+Inherits from Visitor
+Stores an object tree in an arena, returns the index of each node
+"""
+@dataclass
+class ArenaBuilder(Visitor):
+  arena: Arena
+
+  def visit(self, n : Number):
+    return self.arena.number(n.value)
+
+  def visit(self, v : Variable):
+    return self.arena.variable(v.name)
+
+  def visit(self, a : Assignment):
+    var = a.var.accept(self)
+    return self.arena.assignment(var, a.expr.accept(self))
+
+  def visit(self, f : Function):
+    return self.arena.function(f.name, f.expr.accept(self))
+
+  def visit(self, e : Exponentiation):
+    base = e.base.accept(self)
+    return self.arena.exponentiation(base, e.exp.accept(self))
+
+  def visit(self, p : Parentheses):
+    return self.arena.parentheses(p.expr.accept(self))
+
+  def visit(self, b : Binary):
+    left = b.left.accept(self)
+    return self.arena.binary(b.operator, left, b.right.accept(self))
+
+  def visit(self, u : Unary):
+    return self.arena.unary(u.operator, u.operand.accept(self))
+
+
+"""
+ArenaDot class
+The MakeDot of an arena: the same graph, built with a loop over the arrays
+Attributes:
+  dot : Digraph. Graphviz Digraph
+Methods:
+  add(self, arena) : Adds the nodes and edges of the statements of the arena
+  generate_dot(self) -> str : Generates the dot file
+"""
+@dataclass
+class ArenaDot:
+  dot: Digraph = field(default_factory = lambda: Digraph('hoc_ast'))
+
+  def __post_init__(self):
+    self.dot.attr('node', **MakeDot.node_default)
+    self.dot.attr('edge', **MakeDot.edge_default)
+
+  def add(self, arena):
+    names, consts = arena.names, arena.consts
+    for root in arena.roots:
+      for i in arena.postorder(root):
+        op, a, b = arena.ops[i], arena.a[i], arena.b[i]
+        name = f'n{i}'
+        if op == NUMBER:
+          self.dot.node(name, str(consts[a]))
+        elif op in (VARIABLE, TARGET):
+          self.dot.node(name, label = names[a], shape = 'ellipse', color = 'blue')
+        elif op in binary_operators:
+          self.dot.node(name, label = binary_operators[op], shape = 'circle', color = 'green')
+          self.dot.edge(name, f'n{a}', label = 'left')
+          self.dot.edge(name, f'n{b}', label = 'right')
+        elif op in unary_operators:
+          self.dot.node(name, label = unary_operators[op], color = 'red', shape = 'octagon')
+          self.dot.edge(name, f'n{a}')
+        else:
+          if op == FUNCTION:
+            self.dot.node(name, label = f'{names[b]}()')
+          elif op == ASSIGN:
+            self.dot.node(name, label = '=')
+          elif op == EXP:
+            self.dot.node(name, label = '^')
+          else:
+            self.dot.node(name, label = '( )')
+          for child in arena.children(i):
+            self.dot.edge(name, f'n{child}')
+
+  def generate_dot(self):
+    self.dot.save('hoc_ast.dot')
+    return self.dot.source
+
+
+def parse_arena(tokens):
+  """
+  Parses the tokens straight into an arena
+  """
+  arena = Arena()
+  arena.roots.extend(Parser(factory = arena).parse(tokens))
+  return arena
+
+
+if __name__ == '__main__':
+  lexer = Lexer()
+  data = """
+  r = 2
+  x = y = 2*PI*r
+  sqrt(x*x + r*r) - (-y)
+  """
+  arena = parse_arena(lexer.tokenize(data))
+  print(f'{len(arena)} nodes, {len(arena.tobytes())} bytes')
+  print(arena.evaluate())
+
+  copy = Arena.frombytes(arena.tobytes())
+  print(copy.to_nodes())
+
+  dot = ArenaDot()
+  dot.add(arena)
+  ast_dot = dot.generate_dot()
@@ -0,0 +1,384 @@
+from dataclasses import dataclass, field
+import math
+
+import numpy as np
+
+from lex import *
+from hoc_ast import *
+from evaluator import functions, operators
+from vectorized import ufuncs, binary_ufuncs
+
+"""
+Automatic differentiation
+Two ways to get the derivatives of a formula with respect to its variables:
+  - Symbolic (forward mode): derivative(node, name) returns the derivative as a new tree, that
+    can be evaluated, optimized, compiled or vectorized like any formula. One tree per variable.
+  - Reverse mode: Tape.record lists the nodes in the order of evaluation, Tape.forward
+    evaluates them once and keeps the value of each one, Tape.backward goes over the tape once
+    backwards and accumulates the adjoints. The whole gradient costs one forward pass plus one
+    backward pass, whatever the number of variables. A tape is recorded once and replayed.
+Both follow the assignments of a program: the derivatives are with respect to the values of the
+variables before the program runs (in x = x*x, the x read is the input).
+The values of the variables are floats (math, the errors of the Evaluator) or NumPy arrays
+(ufuncs, one derivative per row). The derivatives where a function has none raise as the
+Evaluator does (ZeroDivisionError for the derivative of sqrt or log at 0 with floats);
+abs has derivative 0 at 0 in reverse mode and x/abs(x) (undefined at 0) as a tree.
+"""
+
+LN10 = math.log(10)
+
+#Functions of the backward pass for floats and for arrays
+scalar_ops = {
+  'functions': functions,
+  'operators': operators,
+  'cos': math.cos,
+  'sin': math.sin,
+  'log': math.log,
+  'pow': math.pow,
+  'trunc': lambda x: float(math.trunc(x)),
+  'sign': lambda x: float((x > 0) - (x < 0)),
+}
+
+array_ops = {
+  'functions': ufuncs,
+  'operators': binary_ufuncs,
+  'cos': np.cos,
+  'sin': np.sin,
+  'log': np.log,
+  'pow': np.power,
+  'trunc': np.trunc,
+  'sign': np.sign,
+}
+
+#Symbolic derivatives---------------------------------------------
+
+def add(a, b):
+  if is_number(a, 0):
+    return b
+  if is_number(b, 0):
+    return a
+  if type(a) is Number and type(b) is Number:
+    return Number(a.value + b.value)
+  return Binary('+', a, b)
+
+def sub(a, b):
+  if is_number(b, 0):
+    return a
+  if is_number(a, 0):
+    return neg(b)
+  if type(a) is Number and type(b) is Number:
+    return Number(a.value - b.value)
+  return Binary('-', a, b)
+
+def mul(a, b):
+  if is_number(a, 0) or is_number(b, 0):
+    return Number(0.0)
+  if is_number(a, 1):
+    return b
+  if is_number(b, 1):
+    return a
+  if type(a) is Number and type(b) is Number:
+    return Number(a.value * b.value)
+  return Binary('*', a, b)
+
+def div(a, b):
+  if is_number(a, 0):
+    return Number(0.0)
+  if is_number(b, 1):
+    return a
+  return Binary('/', a, b)
+
+def neg(a):
+  if type(a) is Number:
+    return Number(-a.value)
+  if type(a) is Unary and a.operator == '-':
+    return a.operand
+  return Unary('-', a)
+
+#The derivative of f(x) with respect to x, from the trees of x and of y = f(x)
+derivative_rules = {
+  'sin': lambda x, y: Function('cos', x),
+  'cos': lambda x, y: neg(Function('sin', x)),
+  'atan': lambda x, y: div(Number(1.0), add(Number(1.0), mul(x, x))),
+  'log': lambda x, y: div(Number(1.0), x),
+  'log10': lambda x, y: div(Number(1.0), mul(x, Number(LN10))),
+  'exp': lambda x, y: y,
+  'sqrt': lambda x, y: div(Number(0.5), y),
+  'abs': lambda x, y: div(x, y),
+  'int': lambda x, y: Number(0.0),
+}
+
+def power_derivative(y, u, v, du, dv):
+  """
+  The derivative of y = u^v, from the trees of u, v and of their derivatives
+  """
+  if is_number(dv, 0): #Constant exponent: v*u^(v-1)*du, without the log of u
+    return mul(mul(v, Exponentiation(u, sub(v, Number(1.0)))), du)
+  if is_number(du, 0): #Constant base: u^v*log(u)*dv
+    return mul(mul(y, Function('log', u)), dv)
+  return mul(y, add(mul(dv, Function('log', u)), div(mul(v, du), u)))
+
+
+"""
+Derivative class
+Symbolic forward mode: computes (primal, derivative) for each node of the statements, the primal
+is the tree of the value with the assigned variables replaced by their tree
+Attributes:
+  name : str. The variable of the derivatives
+  primals : dict. The tree of the value of each assigned variable
+  derivatives : dict. The tree of the derivative of each assigned variable
+Methods:
+  differentiate(self, node) -> Expression : The derivative of a statement, records its assignments
+  leave(self, node, pairs) -> tuple : The (primal, derivative) of a node from the ones of its children
+"""
+@dataclass
+class Derivative:
+  name: str
+  primals: dict = field(default_factory = dict)
+  derivatives: dict = field(default_factory = dict)
+
+  def differentiate(self, node):
+    return fold(node, self.leave)[1]
+
+  def leave(self, node, pairs):
+    kind = type(node)
+    if kind is Number:
+      return node, Number(0.0)
+    if kind is Variable:
+      name = node.name
+      if name in self.derivatives:
+        return self.primals[name], self.derivatives[name]
+      return node, Number(1.0 if name == self.name else 0.0)
+    if kind is Assignment:
+      self.primals[node.var.name], self.derivatives[node.var.name] = pairs[0]
+      return pairs[0]
+    if kind is Parentheses:
+      return pairs[0]
+
+    primals = [primal for primal, _ in pairs]
+    #The node itself if no assigned variable was replaced, the trees are shared
+    y = node if all(primal is child for primal, child in zip(primals, children(node))) else rebuild(node, primals)
+    if kind is Unary:
+      (_, du), = pairs
+      return y, (neg(du) if node.operator == '-' else du)
+    if kind is Function:
+      (u, du), = pairs
+      return y, mul(derivative_rules[node.name](u, y), du)
+    (u, du), (v, dv) = pairs
+    if kind is Exponentiation or node.operator == '^':
+      return y, power_derivative(y, u, v, du, dv)
+    if node.operator == '+':
+      return y, add(du, dv)
+    if node.operator == '-':
+      return y, sub(du, dv)
+    if node.operator == '*':
+      return y, add(mul(du, v), mul(u, dv))
+    if node.operator == '/': #(du - y*dv)/v
+      return y, div(sub(du, mul(y, dv)), v)
+    #fmod(u, v) = u - int(u/v)*v
+    return y, sub(du, mul(Function('int', Binary('/', u, v)), dv))
+
+
+def derivative(node, name):
+  """
+  The tree of the derivative of an expression with respect to the variable name
+  """
+  return Derivative(name).differentiate(node)
+
+def derivatives(statements, name):
+  """
+  The trees of the derivatives of a list of statements with respect to the initial value of
+  the variable name. The trees only read the initial values of the variables
+  """
+  differentiator = Derivative(name)
+  return [differentiator.differentiate(stmt) for stmt in statements]
+
+
+#Reverse mode-----------------------------------------------------
+
+"""
+Tape class
+The nodes of the statements in the order of evaluation, and their values after a forward pass.
+The statements have no branches, the same tape is replayed over other values of the variables
+Attributes:
+  nodes : list. The node of each entry (a Variable for the inputs)
+  args : list. The entries of the children of each entry
+  values : list. The value of each entry
+  varying : list. For each entry, whether its value depends on an input
+  inputs : dict. The entry of each variable read before it is assigned
+  outputs : list. The entry of the value of each statement
+  ops : dict. The functions of the passes (scalar_ops or array_ops)
+Methods:
+  record(statements) -> Tape : The tape of a list of statements (classmethod)
+  forward(self, env) -> list : Evaluates the entries, returns the values of the statements
+  backward(self, output) -> dict : The derivatives of an output with respect to the inputs
+"""
+@dataclass
+class Tape:
+  nodes: list = field(default_factory = list)
+  args: list = field(default_factory = list)
+  values: list = field(default_factory = list)
+  varying: list = field(default_factory = list)
+  inputs: dict = field(default_factory = dict)
+  outputs: list = field(default_factory = list)
+  ops: dict = field(default = None, repr = False)
+
+  @property
+  def results(self):
+    return [self.values[entry] for entry in self.outputs]
+
+  @classmethod
+  def record(cls, statements):
+    tape = cls()
+    assigned = {}
+    nodes, args, varying = tape.nodes, tape.args, tape.varying
+
+    def push(node, entries, depends):
+      nodes.append(node)
+      args.append(entries)
+      varying.append(depends)
+      return len(nodes) - 1
+
+    def leave(node, entries):
+      kind = type(node)
+      if kind is Number:
+        return push(node, (), False)
+      if kind is Variable:
+        name = node.name
+        if name in assigned:
+          return assigned[name]
+        if name not in tape.inputs:
+          tape.inputs[name] = push(node, (), True)
+        return tape.inputs[name]
+      if kind is Assignment:
+        assigned[node.var.name] = entries[0]
+        return entries[0]
+      if kind is Parentheses or (kind is Unary and node.operator == '+'):
+        return entries[0]
+      return push(node, entries, any(varying[entry] for entry in entries))
+
+    tape.outputs = [fold(stmt, leave) for stmt in statements]
+    return tape
+
+  def forward(self, env):
+    arrays = any(isinstance(value, np.ndarray) for value in env.values())
+    self.ops = array_ops if arrays else scalar_ops
+    funcs, ops = self.ops['functions'], self.ops['operators']
+    values = self.values = [None] * len(self.nodes)
+    for entry, (node, args) in enumerate(zip(self.nodes, self.args)):
+      kind = type(node)
+      if kind is Binary:
+        values[entry] = ops[node.operator](values[args[0]], values[args[1]])
+      elif kind is Number:
+        values[entry] = node.value
+      elif kind is Variable:
+        try:
+          values[entry] = env[node.name]
+        except KeyError:
+          raise NameError(f"Undefined variable {node.name}") from None
+      elif kind is Function:
+        values[entry] = funcs[node.name](values[args[0]])
+      elif kind is Exponentiation:
+        values[entry] = ops['^'](values[args[0]], values[args[1]])
+      else:
+        values[entry] = -values[args[0]]
+    return self.results
+
+  def partials(self, entry):
+    """
+    The derivatives of an entry with respect to each of its children
+    """
+    node, ops, y = self.nodes[entry], self.ops, self.values[entry]
+    kind = type(node)
+    if kind is Unary:
+      return (-1.0,)
+    if kind is Function:
+      x = self.values[self.args[entry][0]]
+      name = node.name
+      if name == 'sin':
+        return (ops['cos'](x),)
+      if name == 'cos':
+        return (-ops['sin'](x),)
+      if name == 'atan':
+        return (1.0 / (1.0 + x * x),)
+      if name == 'log':
+        return (1.0 / x,)
+      if name == 'log10':
+        return (1.0 / (x * LN10),)
+      if name == 'exp':
+        return (y,)
+      if name == 'sqrt':
+        return (0.5 / y,)
+      if name == 'abs':
+        return (ops['sign'](x),)
+      return (0.0,) #int
+    left, right = self.args[entry]
+    u, v = self.values[left], self.values[right]
+    op = '^' if kind is Exponentiation else node.operator
+    if op == '+':
+      return (1.0, 1.0)
+    if op == '-':
+      return (1.0, -1.0)
+    if op == '*':
+      return (v, u)
+    if op == '/':
+      return (1.0 / v, -y / v)
+    if op == '%':
+      return (1.0, -ops['trunc'](u / v))
+    #u^v: the log of the base only if the exponent depends on an input
+    return (v * ops['pow'](u, v - 1.0), y * ops['log'](u) if self.varying[right] else 0.0)
+
+  def backward(self, output = -1):
+    """
+    The derivatives of the value of the statement output with respect to each input
+    """
+    top = self.outputs[output]
+    adjoints = [None] * (top + 1)
+    adjoints[top] = 1.0
+    args, varying = self.args, self.varying
+    for entry in range(top, -1, -1):
+      adjoint = adjoints[entry]
+      if adjoint is None or not args[entry]:
+        continue
+      for child, partial in zip(args[entry], self.partials(entry)):
+        if varying[child]:
+          previous = adjoints[child]
+          adjoints[child] = partial * adjoint if previous is None else previous + partial * adjoint
+    return {name: 0.0 if entry > top or adjoints[entry] is None else adjoints[entry]
+            for name, entry in self.inputs.items()}
+
+
+def gradient(statements, env, output = -1):
+  """
+  Evaluates the statements over env (floats or NumPy arrays) and returns the values of the
+  statements and the derivatives of the value of the statement output with respect to the
+  variables read (one forward and one backward pass)
+  """
+  tape = Tape.record(statements)
+  return tape.forward(env), tape.backward(output)
+
+
+if __name__ == '__main__':
+  from parser import Parser
+  from evaluator import Evaluator
+  from optimizer import Optimizer
+
+  data = """
+  r = sqrt(x*x + y*y)
+  r*sin(t)^2 + log(r) % 3 + atan(y/x)
+  """
+  statements = Parser().parse(Lexer().tokenize(data))
+  env = {'x': 3.0, 'y': 4.0, 't': 0.5}
+  values, grad = gradient(statements, env)
+  print(values, grad)
+  for name in env:
+    tree = Optimizer().run(derivatives(statements, name))[-1]
+    print(f'd/d{name}', Evaluator(dict(env)).evaluate(tree))
+  h = 1e-6
+  for name in env:
+    up, down = dict(env), dict(env)
+    up[name] += h
+    down[name] -= h
+    print(f'finite d/d{name}', (Evaluator(up).run(statements)[-1] - Evaluator(down).run(statements)[-1]) / (2 * h))
+  columns = {'x': np.linspace(1, 2, 4), 'y': np.linspace(2, 3, 4), 't': np.zeros(4)}
+  print(gradient(statements, columns)[1])
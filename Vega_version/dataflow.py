@@ -0,0 +1,157 @@
+from dataclasses import dataclass, field
+import heapq
+
+from hoc_ast import *
+from evaluator import compile_expr
+
+"""
+Dependency graph of a script
+A script is a list of statements evaluated in order, and a variable can be assigned more than
+once (x = 1, x = x + 1). Each assignment is given its own name (SSA: x@0, x@1, ...) and each
+Variable is renamed to the assignment it reads, the last one before it. The variables read
+before any assignment are the inputs of the script, they keep their name. Once renamed, a
+statement depends on the statements that assign the names it reads, always earlier ones: the
+order of the script is a topological order of the graph.
+When inputs change, Dataflow evaluates again only the statements downstream of them, in the
+order of the script. A statement whose value does not change does not make its dependents
+dirty (x = abs(y) when y changes sign).
+"""
+
+"""
+Dataflow class
+Attributes:
+  statements : list. The statements of the script (the output of Parser.parse)
+  env : dict. The inputs and the value of each assignment, by its SSA name
+  values : list. The value of each statement
+  renamed : list. Each statement, renamed
+  code : list. Each statement, renamed and compiled
+  dependents : list. The statements that read the assignments of each statement
+  readers : dict. The statements that read each input
+  names : dict. The last SSA name of each variable assigned by the script
+  pending : list. Heap of the dirty statements, not evaluated yet
+  recomputed : int. The statements evaluated by the last update
+  unchanged : int. The statements evaluated by the last update that kept their value
+  evaluations : int. The statements evaluated since the script was built
+  updates : int. The calls to update
+Methods:
+  run(self, inputs) -> list : Evaluates every statement with the inputs
+  update(self, inputs) -> list : Changes inputs, evaluates again the statements downstream of
+    them, returns the indexes of the statements whose value changed
+  value(self, name) -> float : The value of a variable at the end of the script
+  stats(self) -> dict : The dirty/clean counters
+"""
+@dataclass
+class Dataflow:
+  statements: list
+  env: dict = field(default_factory = dict)
+  values: list = field(default_factory = list, repr = False)
+  renamed: list = field(default_factory = list, repr = False)
+  code: list = field(default_factory = list, repr = False)
+  dependents: list = field(default_factory = list, repr = False)
+  readers: dict = field(default_factory = dict, repr = False)
+  names: dict = field(default_factory = dict, repr = False)
+  pending: list = field(default_factory = list, repr = False)
+  recomputed: int = 0
+  unchanged: int = 0
+  evaluations: int = 0
+  updates: int = 0
+
+  def __post_init__(self):
+    definitions = {} #SSA name -> the statement that assigns it
+    for index, stmt in enumerate(self.statements):
+      reads = set()
+
+      #Renaming in evaluation order: an assignment is renamed after its expression is
+      #(x = x + 1 reads the previous x)
+      def leave(node, values):
+        kind = type(node)
+        if kind is Variable:
+          name = self.names.get(node.name, node.name)
+          reads.add(name)
+          return Variable(name)
+        if kind is Assignment:
+          name = self.names[node.var.name] = f'{node.var.name}@{len(definitions)}'
+          definitions[name] = index
+          return Assignment(Variable(name), *values)
+        return rebuild(node, values)
+
+      self.renamed.append(fold(stmt, leave))
+      self.code.append(compile_expr(self.renamed[-1]))
+      self.dependents.append([])
+      for name in reads:
+        source = definitions.get(name)
+        if source is None:
+          self.readers.setdefault(name, []).append(index)
+        elif source != index and index not in self.dependents[source]:
+          self.dependents[source].append(index)
+    self.values = [None] * len(self.statements)
+
+  def run(self, inputs = None):
+    self.env.update(inputs or {})
+    self.pending = list(range(len(self.code)))
+    self._evaluate(compare = False)
+    return self.values
+
+  def update(self, inputs):
+    self.updates += 1
+    env = self.env
+    queued = set(self.pending)
+    for name, value in inputs.items():
+      if name in env and env[name] == value:
+        continue
+      env[name] = value
+      for index in self.readers.get(name, ()):
+        if index not in queued:
+          queued.add(index)
+          heapq.heappush(self.pending, index)
+    return self._evaluate()
+
+  def _evaluate(self, compare = True):
+    env, code, values, dependents, pending = self.env, self.code, self.values, self.dependents, self.pending
+    queued = set(pending)
+    changed = []
+    self.recomputed = self.unchanged = 0
+    while pending:
+      #A statement that raises stays pending, the next update evaluates it again
+      index = pending[0]
+      value = code[index](env)
+      heapq.heappop(pending)
+      self.recomputed += 1
+      if compare and value == values[index]:
+        self.unchanged += 1
+        continue
+      values[index] = value
+      changed.append(index)
+      for dependent in dependents[index]:
+        if dependent not in queued:
+          queued.add(dependent)
+          heapq.heappush(pending, dependent)
+    self.evaluations += self.recomputed
+    return changed
+
+  def value(self, name):
+    try:
+      return self.env[self.names.get(name, name)]
+    except KeyError:
+      raise NameError(f"Undefined variable {name}") from None
+
+  def stats(self):
+    return {'statements': len(self.code), 'inputs': len(self.readers), 'recomputed': self.recomputed,
+            'unchanged': self.unchanged, 'clean': len(self.code) - self.recomputed,
+            'evaluations': self.evaluations, 'updates': self.updates}
+
+
+if __name__ == '__main__':
+  from parser import Parser
+
+  data = """
+  area = PI*r^2
+  volume = area*h
+  r = r + 1
+  ratio = volume/(PI*r^2*h)
+  sign = abs(h)
+  """
+  flow = Dataflow(Parser().parse(Lexer().tokenize(data)))
+  print(flow.run({'r': 2, 'h': 3}))
+  print(flow.update({'h': -3}), flow.values, flow.stats())
+  print(flow.value('r'), flow.value('h'))
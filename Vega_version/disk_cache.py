@@ -0,0 +1,205 @@
+from dataclasses import dataclass, field
+import hashlib
+import mmap
+import os
+import struct
+import sys
+
+from lex import *
+from hoc_ast import *
+from parser import Parser
+from optimizer import Optimizer
+from arena import Arena, VERSION as ARENA_VERSION
+
+"""
+Persistent formula cache
+The parsed and optimized statements of each formula are stored in a binary file, so a worker
+that restarts maps the file and skips the lexer, the parser and the optimizer.
+File layout (header and index little endian, entries in the byte order of the machine):
+  header  : magic, version, format digest, number of entries
+  index   : one (key, offset, length) row per entry, sorted by key
+  entries : the Arena.tobytes of each formula (the native arrays of the Arena)
+The key is the blake2b digest of the source. The format digest identifies how the entries were
+built: the grammar (the text of the grammar.txt of the Parser), whether they were
+optimized, the version of the trees of the Parser and the Optimizer and the byte order of the
+machine. A file written with another format is ignored, as if it were empty.
+The file is opened with mmap and the index is binary searched in place, so opening the cache
+costs the same with ten entries or a million, and only the entries that are used are read.
+The misses are parsed with Parser.parse and kept in memory until save() writes a new file
+(to a temporary file that replaces the old one, so a reader never sees a partial file).
+"""
+
+HEADER = struct.Struct('<4sHxx32sq')
+ENTRY = struct.Struct('<16sqq')
+MAGIC = b'HOCC'
+VERSION = 2
+#To increase when the Parser or the Optimizer build other trees for the same source
+TREES_VERSION = 1
+
+def grammar_digest():
+  """
+  The digest of the grammar of the Parser: the text of the grammar file next to it
+  """
+  with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'grammar.txt'), 'rb') as file:
+    return hashlib.sha256(file.read()).digest()
+
+def format_digest(grammar, optimize):
+  """
+  The digest of the format of the entries: grammar digest, optimization, versions, byte order
+  """
+  digest = hashlib.sha256(grammar)
+  digest.update(f'optimize={bool(optimize)} trees={TREES_VERSION} arena={ARENA_VERSION} byteorder={sys.byteorder}'.encode())
+  return digest.digest()
+
+def source_key(source):
+  return hashlib.blake2b(source.encode(), digest_size = 16).digest()
+
+
+"""
+FormulaCache class
+Attributes:
+  path : str. The cache file
+  grammar : bytes. The grammar digest of the entries (grammar_digest, the grammar of the Parser)
+  optimize : bool. Store the statements optimized by the Optimizer
+  digest : bytes. The format digest of the header (format_digest)
+  entries : int. The number of entries of the mapped file
+  pending : dict. The entries parsed since the file was opened, by key
+  memo : dict. The statements already decoded, by key
+  hits : int. The formulas found in the file or in pending
+  misses : int. The formulas that had to be parsed
+Methods:
+  open(self) : Maps the file, if it exists and was written with the same format
+  lookup(self, source) -> list : The cached statements of source, or None
+  parse(self, source) -> list : The statements of source, from the cache or parsed
+  save(self) : Writes the entries of the file and the pending entries to a new file
+  close(self) : Unmaps the file
+"""
+@dataclass
+class FormulaCache:
+  path: str
+  grammar: bytes = field(default_factory = grammar_digest, init = False)
+  optimize: bool = True
+  entries: int = 0
+  pending: dict = field(default_factory = dict, repr = False)
+  memo: dict = field(default_factory = dict, repr = False)
+  hits: int = 0
+  misses: int = 0
+  digest: bytes = field(init = False, repr = False)
+  _file = None
+  _map = None
+
+  def __post_init__(self):
+    self.digest = format_digest(self.grammar, self.optimize)
+    self.open()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  def open(self):
+    self.close()
+    if not os.path.exists(self.path) or os.path.getsize(self.path) < HEADER.size:
+      return
+    self._file = open(self.path, 'rb')
+    self._map = mmap.mmap(self._file.fileno(), 0, access = mmap.ACCESS_READ)
+    magic, version, digest, entries = HEADER.unpack_from(self._map)
+    if magic != MAGIC or version != VERSION or digest != self.digest:
+      self.close() #Stale file: every formula is a miss and save() replaces it
+      return
+    self.entries = entries
+
+  def close(self):
+    if self._map is not None:
+      self._map.close()
+      self._file.close()
+    self._map = self._file = None
+    self.entries = 0
+
+  def _find(self, key):
+    #Binary search of the sorted index of the mapped file
+    lo, hi = 0, self.entries
+    while lo < hi:
+      mid = (lo + hi) // 2
+      row_key, offset, length = ENTRY.unpack_from(self._map, HEADER.size + mid * ENTRY.size)
+      if row_key == key:
+        return self._map[offset:offset + length]
+      if row_key < key:
+        lo = mid + 1
+      else:
+        hi = mid
+    return None
+
+  def _rows(self):
+    for i in range(self.entries):
+      key, offset, length = ENTRY.unpack_from(self._map, HEADER.size + i * ENTRY.size)
+      yield key, self._map[offset:offset + length]
+
+  def lookup(self, source):
+    key = source_key(source)
+    if key in self.memo:
+      return self.memo[key]
+    data = self.pending.get(key)
+    if data is None and self.entries:
+      data = self._find(key)
+    if data is None:
+      return None
+    statements = self.memo[key] = Arena.frombytes(data).to_nodes()
+    return statements
+
+  def parse(self, source):
+    statements = self.lookup(source)
+    if statements is not None:
+      self.hits += 1
+      return statements
+
+    self.misses += 1
+    statements = Parser().parse(Lexer().tokenize(source))
+    if self.optimize:
+      statements = Optimizer().run(statements)
+    arena = Arena()
+    for stmt in statements:
+      arena.roots.append(arena.add(stmt))
+    key = source_key(source)
+    self.pending[key] = arena.tobytes()
+    self.memo[key] = statements
+    return statements
+
+  def save(self):
+    rows = dict(self._rows()) if self.entries else {}
+    rows.update(self.pending)
+    keys = sorted(rows)
+
+    offset = HEADER.size + len(keys) * ENTRY.size
+    index = []
+    for key in keys:
+      index.append(ENTRY.pack(key, offset, len(rows[key])))
+      offset += len(rows[key])
+
+    tmp = f'{self.path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as file:
+      file.write(HEADER.pack(MAGIC, VERSION, self.digest, len(keys)))
+      file.writelines(index)
+      file.writelines(rows[key] for key in keys)
+    self.close()
+    os.replace(tmp, self.path)
+    self.pending.clear()
+    self.open()
+
+
+if __name__ == '__main__':
+  import tempfile
+  from evaluator import Evaluator
+
+  path = os.path.join(tempfile.mkdtemp(), 'formulas.hocc')
+  formulas = ['r = 2', 'x = y = 2*PI*r', 'sqrt(x*x + r*r) - (-y)']
+
+  evaluator = Evaluator()
+  with FormulaCache(path) as cache:
+    print([evaluator.run(cache.parse(source)) for source in formulas], cache.misses, 'misses')
+    cache.save()
+
+  with FormulaCache(path) as cache:
+    print(cache.entries, 'entries in', os.path.getsize(path), 'bytes')
+    print([cache.parse(source) for source in formulas], cache.hits, 'hits')
@@ -0,0 +1,180 @@
+from dataclasses import dataclass, field
+from itertools import chain
+import sys
+
+from hoc_ast import *
+
+"""
+Streaming DOT emitter
+MakeDot builds a graphviz.Digraph in memory and formats every node and edge through it.
+DotWriter writes the same graph (same names, labels and styles) straight to a file handle,
+one line per node or edge, walking the trees with an explicit stack: the memory used grows
+with the depth of a tree, not with its size, and there is no recursion limit.
+Large trees can be cut:
+  max_depth : the subtrees below this depth are collapsed
+  max_nodes : after this many nodes, the remaining subtrees are collapsed and the remaining
+              statements are summed up in a single node
+A collapsed subtree is drawn as a single node that tells how many nodes it hides. Counting
+them walks the hidden nodes: with count_hidden = False the label is only '...' and the cost
+of a graph is bounded by the budget.
+"""
+
+#The children of each node drawn, with the label of their edge (the target of an assignment is drawn)
+def edges(node):
+  kind = type(node)
+  if kind is Binary:
+    return ((node.left, 'left'), (node.right, 'right'))
+  if kind is Assignment:
+    return ((node.var, None), (node.expr, None))
+  return tuple((child, None) for child in children(node))
+
+#The label and the attributes of each node, as in MakeDot
+def style(node):
+  kind = type(node)
+  if kind is Binary:
+    return node.operator, ' shape=circle color=green'
+  if kind is Number:
+    return str(node.value), ''
+  if kind is Variable:
+    return node.name, ' shape=ellipse color=blue'
+  if kind is Unary:
+    return node.operator, ' color=red shape=octagon'
+  if kind is Function:
+    return f'{node.name}()', ''
+  if kind is Assignment:
+    return '=', ''
+  if kind is Exponentiation:
+    return '^', ''
+  return '( )', ''
+
+def size(node):
+  total = 0
+  stack = [node]
+  while stack:
+    total += 1
+    stack.extend(child for child, _ in edges(stack.pop()))
+  return total
+
+def plural(count, word):
+  return f'{count} {word}' + ('s' if count != 1 else '')
+
+def quote(text):
+  return '"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+def attributes(values):
+  return ' '.join(f'{key}={quote(value)}' for key, value in values.items())
+
+
+"""
+DotWriter class
+Attributes:
+  file : The file handle the graph is written to
+  max_depth : int. The depth below which the subtrees are collapsed (None: no limit)
+  max_nodes : int. The number of nodes after which the subtrees are collapsed (None: no limit)
+  count_hidden : bool. Count the nodes of the collapsed subtrees for their label
+  sequence : int. The sequence of the nodes, serves to assign a name to each node
+  collapsed : int. The number of collapsed subtrees
+  hidden : int. The number of nodes hidden in the collapsed subtrees
+Methods:
+  begin(self) : Writes the header of the graph
+  add(self, node) -> str : Writes the nodes and edges of a tree, returns the name of its root
+  end(self) : Writes the end of the graph
+  write(self, statements) : Writes a whole graph, the statements can be a generator (Parser.iterparse)
+"""
+@dataclass
+class DotWriter:
+  file: object = field(default_factory = lambda: sys.stdout)
+  max_depth: int = None
+  max_nodes: int = None
+  count_hidden: bool = True
+  sequence: int = 0
+  collapsed: int = 0
+  hidden: int = 0
+
+  def name(self):
+    self.sequence += 1
+    return f'n{self.sequence}'
+
+  def begin(self, graph = 'hoc_ast'):
+    self.file.write(f'digraph {graph} {{\n'
+                    f'\tnode [{attributes(MakeDot.node_default)}]\n'
+                    f'\tedge [{attributes(MakeDot.edge_default)}]\n')
+
+  def end(self):
+    self.file.write('}\n')
+
+  def exhausted(self):
+    return self.max_nodes is not None and self.sequence >= self.max_nodes
+
+  def _collapse(self, nodes, statements = False):
+    #nodes can be a generator: they are counted one by one, none is kept
+    name = self.name()
+    self.collapsed += 1
+    label = '...'
+    if self.count_hidden:
+      trees = count = 0
+      for node in nodes:
+        trees += 1
+        count += size(node)
+      self.hidden += count
+      label = f'... {plural(count, "node")}'
+      if statements:
+        label = f'{label} in {plural(trees, "statement")}'
+    self.file.write(f'\t{name} [label="{label}" style="filled,dashed" fillcolor=lightgrey]\n')
+    return name
+
+  def add(self, node):
+    write = self.file.write
+    max_depth, max_nodes = self.max_depth, self.max_nodes
+    root = None
+    stack = [(node, 0, None, None)] #(node, depth, name of the parent, label of the edge)
+    while stack:
+      node, depth, parent, label = stack.pop()
+      if (max_depth is not None and depth > max_depth) or (max_nodes is not None and self.sequence >= max_nodes):
+        name = self._collapse([node])
+      else:
+        name = self.name()
+        text, extra = style(node)
+        write(f'\t{name} [label={quote(text)}{extra}]\n')
+        stack.extend((child, depth + 1, name, edge) for child, edge in reversed(edges(node)))
+      if parent is None:
+        root = name
+      else:
+        write(f'\t{parent} -> {name}' + (f' [label={label}]\n' if label else '\n'))
+    return root
+
+  def write(self, statements, graph = 'hoc_ast'):
+    self.begin(graph)
+    statements = iter(statements)
+    for stmt in statements:
+      if self.exhausted():
+        #The remaining statements are read (and counted) one at a time, as they are parsed
+        self._collapse(chain([stmt], statements), statements = True)
+        break
+      self.add(stmt)
+    self.end()
+
+
+def write_dot(statements, path, max_depth = None, max_nodes = None, count_hidden = True):
+  """
+  Writes the graph of the statements to the file path, returns the DotWriter
+  """
+  with open(path, 'w') as file:
+    writer = DotWriter(file, max_depth, max_nodes, count_hidden)
+    writer.write(statements)
+  return writer
+
+
+if __name__ == '__main__':
+  from parser import Parser
+
+  lexer = Lexer()
+  parser = Parser()
+  data = """
+  x = y = 2*PI*r
+  sqrt(x*x + r*r) - (-y) % 3
+  """
+  ast = parser.parse(lexer.tokenize(data))
+  DotWriter(sys.stdout).write(ast)
+  DotWriter(sys.stdout, max_depth = 2).write(ast)
+  DotWriter(sys.stdout, max_nodes = 5).write(ast)
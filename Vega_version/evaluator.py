@@ -0,0 +1,227 @@
+from dataclasses import dataclass, field
+from functools import partial
+import math
+import operator
+
+from hoc_ast import *
+
+"""
+Evaluation of the AST
+There are two ways of evaluating a tree:
+  Evaluator : A Visitor that walks the tree on every evaluation (one dispatch per node).
+  Compiler  : A Visitor that walks the tree once and lowers it to a tree of closures.
+              The closures are called with the environment and do not dispatch anymore,
+              so evaluating the same formula many times only pays Python calls.
+"""
+
+#Builtin functions, one for each FUNC token of the lexer
+functions = {
+  'sin': math.sin,
+  'cos': math.cos,
+  'atan': math.atan,
+  'log': math.log,
+  'log10': math.log10,
+  'exp': math.exp,
+  'sqrt': math.sqrt,
+  'abs': math.fabs,
+  'int': lambda x: float(math.trunc(x)),
+}
+
+#Binary operators. '%' and '^' follow the C hoc (fmod and pow)
+operators = {
+  '+': operator.add,
+  '-': operator.sub,
+  '*': operator.mul,
+  '/': operator.truediv,
+  '%': math.fmod,
+  '^': math.pow,
+}
+
+unary_operators = {
+  '-': operator.neg,
+  '+': operator.pos,
+}
+
+"""
+Evaluator class
+Inherits from Visitor
+Attributes:
+  env : dict. The variables of the program (name -> value)
+Methods:
+  visit(self, n : Node) -> float : Evaluates a node
+  run(self, statements) -> list : Evaluates a list of statements (the output of Parser.parse)
+  evaluate(self, node) -> float : Evaluates a node without recursion
+  leave(self, node, values) -> float : The value of a node from the values of its children
+  compile(self, node) -> Callable : Compiles a node, the result is evaluated over env
+"""
+@dataclass
+class Evaluator(Visitor):
+  env: dict = field(default_factory = dict)
+
+  def visit(self, n : Number):
+    return n.value
+
+  def visit(self, v : Variable):
+    try:
+      return self.env[v.name]
+    except KeyError:
+      raise NameError(f"Undefined variable {v.name}") from None
+
+  def visit(self, a : Assignment):
+    value = self.env[a.var.name] = a.expr.accept(self)
+    return value
+
+  def visit(self, f : Function):
+    return functions[f.name](f.expr.accept(self))
+
+  def visit(self, e : Exponentiation):
+    return math.pow(e.base.accept(self), e.exp.accept(self))
+
+  def visit(self, p : Parentheses):
+    return p.expr.accept(self)
+
+  def visit(self, b : Binary):
+    return operators[b.operator](b.left.accept(self), b.right.accept(self))
+
+  def visit(self, u : Unary):
+    return unary_operators[u.operator](u.operand.accept(self))
+
+  def run(self, statements):
+    return [stmt.accept(self) for stmt in statements]
+
+  def evaluate(self, node):
+    """
+    Evaluates a node with an explicit stack (hoc_ast.fold) instead of recursive visits,
+    for the trees deeper than the recursion limit
+    """
+    return fold(node, self.leave)
+
+  def leave(self, node, values):
+    kind = type(node)
+    if kind is Binary:
+      return operators[node.operator](*values)
+    if kind is Number:
+      return node.value
+    if kind is Variable:
+      return self.visit(node)
+    if kind is Function:
+      return functions[node.name](*values)
+    if kind is Unary:
+      return unary_operators[node.operator](*values)
+    if kind is Exponentiation:
+      return math.pow(*values)
+    if kind is Assignment:
+      value = self.env[node.var.name] = values[0]
+      return value
+    return values[0] #Parentheses
+
+  def compile(self, node):
+    return partial(compile_expr(node), self.env)
+
+
+"""
+Compiler class
+Inherits from Visitor
+Each visit returns a function env -> value. Constants are captured by the closures
+and the operator functions are looked up once, at compile time.
+env is a dict of the variables, or the list of the slots when the tree was resolved by a
+symbols.SymbolTable (the variables are then read by index).
+Methods:
+  visit(self, n : Node) -> Callable : Lowers a node to a closure
+"""
+@dataclass
+class Compiler(Visitor):
+
+  def visit(self, n : Number):
+    value = n.value
+    return lambda env: value
+
+  def visit(self, v : Variable):
+    name = v.name
+    if v.slot is not None:
+      #Resolved variable (SymbolTable.resolve): env is the list of the slots
+      slot = v.slot
+      def load_slot(env):
+        value = env[slot]
+        if value is None:
+          raise NameError(f"Undefined variable {name}")
+        return value
+      return load_slot
+    def load(env):
+      try:
+        return env[name]
+      except KeyError:
+        raise NameError(f"Undefined variable {name}") from None
+    return load
+
+  def visit(self, a : Assignment):
+    name = a.var.name if a.var.slot is None else a.var.slot
+    expr = a.expr.accept(self)
+    def store(env):
+      value = env[name] = expr(env)
+      return value
+    return store
+
+  def visit(self, f : Function):
+    func = functions[f.name]
+    expr = f.expr.accept(self)
+    return lambda env: func(expr(env))
+
+  def visit(self, e : Exponentiation):
+    pow = math.pow
+    base = e.base.accept(self)
+    exp = e.exp.accept(self)
+    return lambda env: pow(base(env), exp(env))
+
+  def visit(self, p : Parentheses):
+    return p.expr.accept(self) #The parentheses only group, they do not need a closure
+
+  def visit(self, b : Binary):
+    op = operators[b.operator]
+    left = b.left.accept(self)
+    #Specialization of the common case "expr op NUMBER"
+    if isinstance(b.right, Number):
+      value = b.right.value
+      return lambda env: op(left(env), value)
+    right = b.right.accept(self)
+    return lambda env: op(left(env), right(env))
+
+  def visit(self, u : Unary):
+    operand = u.operand.accept(self)
+    if u.operator == '+':
+      return operand
+    return lambda env: -operand(env)
+
+
+def compile_expr(node):
+  """
+  Compiles a node to a function env -> value
+  """
+  return node.accept(Compiler())
+
+
+def compile_program(statements):
+  """
+  Compiles a list of statements to a function env -> list of values
+  """
+  compiled = [compile_expr(stmt) for stmt in statements]
+  return lambda env: [stmt(env) for stmt in compiled]
+
+
+if __name__ == '__main__':
+  from parser import Parser
+
+  lexer = Lexer()
+  parser = Parser()
+  data = """
+  r = 2
+  x = 2*PI*r
+  sqrt(x*x + r*r)
+  """
+  ast = parser.parse(lexer.tokenize(data))
+
+  evaluator = Evaluator()
+  print(evaluator.run(ast))
+
+  program = compile_program(ast)
+  print(program({}))
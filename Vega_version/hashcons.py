@@ -0,0 +1,252 @@
+from dataclasses import dataclass, field
+from functools import partial
+import math
+
+from hoc_ast import *
+from evaluator import functions, operators
+from optimizer import count_nodes
+
+"""
+Hash consing and common subexpression elimination
+HashConsFactory is a NodeFactory that returns the same node for structurally identical
+subtrees, so a formula that repeats sqrt(x*x+y*y) five times holds it once: the tree
+becomes a DAG. The key of a node is its class, its own values and the identity of its
+children, which are already unique.
+compile_dag lowers a DAG to a list of steps, one per distinct node, that store their value
+in a slot. A shared subtree is computed once per evaluation and read from its slot by all
+its parents.
+"""
+
+"""
+HashConsFactory class
+Inherits from NodeFactory
+Attributes:
+  table : dict. The unique nodes by key
+  hits : int. The nodes that were already in the table
+Methods:
+  intern(self, node) -> Node : Returns the hash consed copy of a tree built by another factory
+"""
+@dataclass
+class HashConsFactory(NodeFactory):
+  table: dict = field(default_factory = dict)
+  hits: int = 0
+
+  def _unique(self, key, make, *args):
+    node = self.table.get(key)
+    if node is None:
+      node = self.table[key] = make(*args)
+    else:
+      self.hits += 1
+    return node
+
+  def number(self, value):
+    return self._unique((Number, constant_key(value)), Number, value)
+
+  def variable(self, name):
+    return self._unique((Variable, name), Variable, name)
+
+  def assignment(self, var, expr):
+    return self._unique((Assignment, id(var), id(expr)), Assignment, var, expr)
+
+  def function(self, name, expr):
+    return self._unique((Function, name, id(expr)), Function, name, expr)
+
+  def exponentiation(self, base, exp):
+    return self._unique((Exponentiation, id(base), id(exp)), Exponentiation, base, exp)
+
+  def parentheses(self, expr):
+    return self._unique((Parentheses, id(expr)), Parentheses, expr)
+
+  def binary(self, operator, left, right):
+    return self._unique((Binary, operator, id(left), id(right)), Binary, operator, left, right)
+
+  def unary(self, operator, operand):
+    return self._unique((Unary, operator, id(operand)), Unary, operator, operand)
+
+  def intern(self, node):
+    return node.accept(HashConser(self))
+
+
+"""
+HashConser class
+Inherits from Visitor
+Rebuilds a tree with a HashConsFactory
+"""
+@dataclass
+class HashConser(Visitor):
+  factory: HashConsFactory
+
+  def visit(self, n : Number):
+    return self.factory.number(n.value)
+
+  def visit(self, v : Variable):
+    return self.factory.variable(v.name)
+
+  def visit(self, a : Assignment):
+    return self.factory.assignment(a.var.accept(self), a.expr.accept(self))
+
+  def visit(self, f : Function):
+    return self.factory.function(f.name, f.expr.accept(self))
+
+  def visit(self, e : Exponentiation):
+    return self.factory.exponentiation(e.base.accept(self), e.exp.accept(self))
+
+  def visit(self, p : Parentheses):
+    return self.factory.parentheses(p.expr.accept(self))
+
+  def visit(self, b : Binary):
+    return self.factory.binary(b.operator, b.left.accept(self), b.right.accept(self))
+
+  def visit(self, u : Unary):
+    return self.factory.unary(u.operator, u.operand.accept(self))
+
+
+"""
+StepCompiler class
+Inherits from Visitor
+Attributes:
+  slots : dict. The slot of each distinct node (by id)
+Methods:
+  visit(self, n : Node) -> Callable : The step (env, values) -> None that computes the node
+  into its slot, or None if the node reuses the slot of its child
+"""
+@dataclass
+class StepCompiler(Visitor):
+  slots: dict = field(default_factory = dict)
+
+  def slot(self, node):
+    return self.slots[id(node)]
+
+  def visit(self, n : Number):
+    value = n.value
+    def step(env, values, k = self.slot(n)):
+      values[k] = value
+    return step
+
+  def visit(self, v : Variable):
+    name = v.name
+    def step(env, values, k = self.slot(v)):
+      try:
+        values[k] = env[name]
+      except KeyError:
+        raise NameError(f"Undefined variable {name}") from None
+    return step
+
+  def visit(self, a : Assignment):
+    name = a.var.name
+    def step(env, values, k = self.slot(a), i = self.slot(a.expr)):
+      values[k] = env[name] = values[i]
+    return step
+
+  def visit(self, f : Function):
+    func = functions[f.name]
+    def step(env, values, k = self.slot(f), i = self.slot(f.expr)):
+      values[k] = func(values[i])
+    return step
+
+  def visit(self, e : Exponentiation):
+    pow = math.pow
+    def step(env, values, k = self.slot(e), i = self.slot(e.base), j = self.slot(e.exp)):
+      values[k] = pow(values[i], values[j])
+    return step
+
+  def visit(self, p : Parentheses):
+    return None
+
+  def visit(self, b : Binary):
+    op = operators[b.operator]
+    def step(env, values, k = self.slot(b), i = self.slot(b.left), j = self.slot(b.right)):
+      values[k] = op(values[i], values[j])
+    return step
+
+  def visit(self, u : Unary):
+    if u.operator == '+':
+      return None
+    def step(env, values, k = self.slot(u), i = self.slot(u.operand)):
+      values[k] = -values[i]
+    return step
+
+
+def distinct_nodes(root):
+  """
+  The distinct nodes of a DAG (by identity), children before parents
+  """
+  seen = set()
+  order = []
+  stack = [(root, False)]
+  while stack:
+    node, expanded = stack.pop()
+    if expanded:
+      order.append(node)
+    elif id(node) not in seen:
+      seen.add(id(node))
+      stack.append((node, True))
+      stack.extend((child, False) for child in reversed(children(node)) if id(child) not in seen)
+  return order
+
+
+def compile_dag(root):
+  """
+  Compiles a DAG to a function env -> value that computes each distinct node once
+  """
+  compiler = StepCompiler()
+  steps = []
+  for node in distinct_nodes(root):
+    if isinstance(node, Parentheses) or (isinstance(node, Unary) and node.operator == '+'):
+      compiler.slots[id(node)] = compiler.slots[id(children(node)[0])] #Same value as the child
+      continue
+    compiler.slots[id(node)] = len(steps)
+    steps.append(node.accept(compiler))
+  size = len(steps)
+  result = compiler.slots[id(root)]
+
+  def run(env):
+    values = [0.0] * size
+    for step in steps:
+      step(env, values)
+    return values[result]
+  return run
+
+
+"""
+CSEEvaluator class
+Evaluates statements computing each shared subtree once per statement.
+The values are not reused between statements because an assignment can change the variables.
+Attributes:
+  env : dict. The variables of the program
+Methods:
+  run(self, statements) -> list : Evaluates a list of statements
+  compile(self, node) -> Callable : Compiles a node, the result is evaluated over env
+"""
+@dataclass
+class CSEEvaluator:
+  env: dict = field(default_factory = dict)
+
+  def run(self, statements):
+    return [compile_dag(stmt)(self.env) for stmt in statements]
+
+  def compile(self, node):
+    return partial(compile_dag(node), self.env)
+
+
+def dag_size(root):
+  """
+  The number of distinct nodes of a DAG (count_nodes gives the size of the equivalent tree)
+  """
+  return len(distinct_nodes(root))
+
+
+if __name__ == '__main__':
+  from parser import Parser
+
+  lexer = Lexer()
+  factory = HashConsFactory()
+  parser = Parser(factory = factory)
+  data = """
+  x = 3
+  y = 4
+  sqrt(x*x + y*y) * 2 + sqrt(x*x + y*y) / sqrt(x*x + y*y) - sqrt(x*x + y*y)
+  """
+  ast = parser.parse(lexer.tokenize(data))
+  print(f'{count_nodes(ast[2])} nodes in the tree, {dag_size(ast[2])} distinct nodes ({factory.hits} shared)')
+  print(CSEEvaluator().run(ast))
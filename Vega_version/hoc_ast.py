@@ -1,8 +1,10 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import Union
+from dataclasses import dataclass, field
+import inspect
+import math
+import types
+from typing import Union, get_args, get_origin, get_type_hints
 from rich import print
-from multimethod import multimeta
 
 from lex import *
 from graphviz import Digraph
@@ -21,21 +23,144 @@ A practical result of this separation is the ability to add new operations to ex
 without modifying those structures.
 It is used here because the AST is a complex structure that is difficult to traverse and analyze.
 The Visitor pattern allows us to separate the algorithm from the AST structure.
-The Visitor pattern is implemented with the multimethod library.
-The multimethod library allows us to implement multiple dispatch in Python.
+The Visitor pattern is implemented with the dispatchmeta metaclass below.
 Dispatch significa que se llama a una función diferente dependiendo de los argumentos.
 
 """
 
+#Dispatch------------------------------------------------------
+
+"""
+The methods of a class of metaclass dispatchmeta that are defined several times in its body
+(visit(self, b : Binary), visit(self, n : Number), ...), or defined once with the argument after
+self annotated, are replaced by a single method that looks up
+type(node) in a dict, the DispatchTable of the method, and calls the function found. The
+table is filled on the first call for each type: the function of the nearest class of the mro
+of the type that has one. After that a call costs one dict lookup, whatever the number of
+methods (the multimethod library resolved the signature of the call on each one).
+The dispatch is on the type of the single argument after self. The subclasses of a visitor
+inherit its methods and can add or replace some of them. A method defined once without an
+annotation stays a plain method.
+"""
+
+class DispatchError(TypeError):
+  pass
+
+"""
+Overloads class
+The functions defined with the same name in the body of a class, in order
+"""
+class Overloads(list):
+  pass
+
+"""
+DispatchTable class
+A dict type -> function, filled on the first lookup of each type
+Attributes:
+  name : str. The name of the method
+  functions : list. The functions of the method, a later one replaces an earlier one of the same type
+  types : dict. The annotated type of each function (resolved on the first lookup)
+"""
+class DispatchTable(dict):
+  __slots__ = ('name', 'functions', 'types')
+
+  def __init__(self, name, functions):
+    super().__init__()
+    self.name = name
+    self.functions = functions
+    self.types = None
+
+  def _resolve(self):
+    #The annotations are strings (from __future__ import annotations) until the types exist
+    self.types = {}
+    for function in self.functions:
+      parameter = list(inspect.signature(function).parameters)[1]
+      hint = get_type_hints(function).get(parameter, object)
+      if get_origin(hint) in (Union, types.UnionType):
+        self.types.update(dict.fromkeys(get_args(hint), function))
+      else:
+        self.types[hint] = function
+
+  def __missing__(self, kind):
+    if self.types is None:
+      self._resolve()
+    for base in kind.__mro__:
+      if base in self.types:
+        function = self[kind] = self.types[base]
+        return function
+    raise DispatchError(f'{self.name}() has no method for {kind.__name__}')
+
+def annotated(function):
+  """
+  True if the function takes one argument after self and that argument is annotated
+  """
+  parameters = list(inspect.signature(function).parameters.values())
+  return len(parameters) == 2 and parameters[1].annotation is not inspect.Parameter.empty
+
+def dispatcher(name, functions):
+  for function in functions:
+    if len(inspect.signature(function).parameters) != 2:
+      raise TypeError(f'{function.__qualname__}: a dispatched method takes one argument after self')
+  table = DispatchTable(name, functions)
+  def dispatch(self, node):
+    return table[type(node)](self, node)
+  dispatch.__name__ = dispatch.__qualname__ = name
+  dispatch.table = table
+  return dispatch
+
+"""
+DispatchNamespace class
+The namespace of the body of a class: a name defined again collects its functions in Overloads
+"""
+class DispatchNamespace(dict):
+  def __setitem__(self, key, value):
+    if inspect.isfunction(value) and key in self:
+      previous = self[key]
+      if isinstance(previous, Overloads):
+        previous.append(value)
+        return
+      if inspect.isfunction(previous):
+        value = Overloads([previous, value])
+    super().__setitem__(key, value)
+
+"""
+dispatchmeta class
+Metaclass of the visitors
+Attributes (of the classes):
+  __overloads__ : dict. The functions of each dispatched method, the inherited ones first
+"""
+class dispatchmeta(type):
+  @classmethod
+  def __prepare__(mcs, name, bases):
+    return DispatchNamespace()
+
+  def __new__(mcs, name, bases, namespace):
+    overloads = {}
+    for base in reversed(bases):
+      for key, functions in getattr(base, '__overloads__', {}).items():
+        overloads[key] = overloads.get(key, []) + functions
+    attributes = dict(namespace)
+    for key, value in namespace.items():
+      if isinstance(value, Overloads):
+        overloads[key] = overloads.get(key, []) + value
+      elif inspect.isfunction(value) and (key in overloads or annotated(value)):
+        overloads[key] = overloads.get(key, []) + [value]
+      else:
+        continue
+      attributes[key] = dispatcher(key, overloads[key])
+    attributes['__overloads__'] = overloads
+    return super().__new__(mcs, name, bases, attributes)
+
+
 #Abstract classes----------------------------------------------
 
 """
 Visitor class
-Metaclass = multimeta
+Metaclass = dispatchmeta
 An abstract class of the Visitor pattern
 """
 @dataclass
-class Visitor(metaclass = multimeta):
+class Visitor(metaclass = dispatchmeta):
   pass
 
 """
@@ -45,9 +170,10 @@ Methods:
   accept(self, v: Visitor) -> str : Abstract method for the Visitor pattern
 
 Note: The accept method is an abstract method that must be implemented in the subclasses of the Node class.
-The visit methhod belongs to the visitor class because it is a multimethod.
+The visit methhod belongs to the visitor class because it is dispatched on the type of the node.
+The nodes are slotted dataclasses (no __dict__ per instance), so they must stay slotted in the subclasses.
 """
-@dataclass
+@dataclass(slots = True)
 class Node:
   def accept(self, v: Visitor):
     return v.visit(self) 
@@ -58,7 +184,7 @@ Inherits from Node
 
 An abstract class
 """
-@dataclass
+@dataclass(slots = True)
 class Expression (Node):
   pass
 
@@ -67,13 +193,15 @@ Variable class
 Inherits from Expression
 Attributes:
   name : str. The name of the variable
+  slot : int. The index of the variable in a SymbolTable (None: not resolved, see symbols.py)
 """
-@dataclass
+@dataclass(slots = True)
 class Variable (Expression):
   name: str
+  slot: int = field(default = None, compare = False, repr = False)
 
 
-@dataclass
+@dataclass(slots = True)
 class Assignment (Expression):
   var: Variable
   expr: Expression 
@@ -87,7 +215,7 @@ Attributes:
   name : str. The name of the function
   expr : Expression. The expression of the function
 """
-@dataclass
+@dataclass(slots = True)
 class Function (Expression):
   name: str
   expr: Expression
@@ -99,7 +227,7 @@ Attributes:
   base : Expression. The base of the exponentiation
   exp : Expression. The exponent
 """
-@dataclass
+@dataclass(slots = True)
 class Exponentiation (Expression):
   base: Expression
   exp: Expression
@@ -110,7 +238,7 @@ Inherits from Expression
 Attributes:
   expr : Expression. The expression inside the parentheses
 """
-@dataclass
+@dataclass(slots = True)
 class Parentheses (Expression):
   expr: Expression
 
@@ -123,7 +251,7 @@ Attributes:
   left : Expression. The left operand
   rigth : Expression. The right operand
 """
-@dataclass
+@dataclass(slots = True)
 class Binary (Expression):
   operator : str
   left : Expression
@@ -138,7 +266,7 @@ Attributes:
   operator : str. The operator
   operand : Expression. The operand
 """
-@dataclass
+@dataclass(slots = True)
 class Unary(Expression):
   operator: str
   operand: Expression
@@ -149,11 +277,146 @@ Inherits from Expression
 Attributes:
   value : Union [float, int]. The value of the number
 """
-@dataclass
+@dataclass(slots = True)
 class Number (Expression):
   value: Union [float, int]
 
 
+#Constants----------------------------------------------------
+
+def is_number(node, value):
+  return type(node) is Number and node.value == value
+
+def constant_key(value):
+  """
+  The key of a constant in a table of constants: 0.0 == -0.0 but they are different constants,
+  the sign is part of the key
+  """
+  return (value, math.copysign(1, value))
+
+
+#Iterative traversal-------------------------------------------
+
+"""
+accept and visit recurse once per node, so a tree deeper than the recursion limit (generated
+input like ((((...)))) or -(-(-(...)))) cannot be visited. The functions below walk the tree
+with an explicit stack instead, in the same order as the visitors: children left to right,
+before their parent.
+"""
+
+def children(node):
+  """
+  The children of a node that are evaluated (the target of an assignment is not one)
+  """
+  kind = type(node)
+  if kind is Binary:
+    return (node.left, node.right)
+  if kind is Unary:
+    return (node.operand,)
+  if kind is Exponentiation:
+    return (node.base, node.exp)
+  if kind is Function or kind is Parentheses or kind is Assignment:
+    return (node.expr,)
+  return ()
+
+def postorder(node):
+  """
+  Iterates over the nodes of a tree, children first
+  """
+  stack = [(node, False)]
+  while stack:
+    node, expanded = stack.pop()
+    if expanded:
+      yield node
+    else:
+      stack.append((node, True))
+      stack.extend((child, False) for child in reversed(children(node)))
+
+def fold(node, leave):
+  """
+  Computes a value for each node of a tree, children first: leave(node, values) gets the
+  values of the children of node. Returns the value of the root
+  """
+  values = []
+  stack = [(node, None)] #(node, number of children once they are on the stack)
+  while stack:
+    node, count = stack.pop()
+    if count is None:
+      nodes = children(node)
+      stack.append((node, len(nodes)))
+      stack.extend((child, None) for child in reversed(nodes))
+    elif count:
+      args = values[-count:]
+      del values[-count:]
+      values.append(leave(node, args))
+    else:
+      values.append(leave(node, ()))
+  return values[0]
+
+def rebuild(node, values):
+  """
+  A copy of node with other children, values in the order of children(node).
+  Used with fold to rewrite a tree (leaves are returned as they are)
+  """
+  kind = type(node)
+  if kind is Binary:
+    return Binary(node.operator, *values)
+  if kind is Unary:
+    return Unary(node.operator, *values)
+  if kind is Function:
+    return Function(node.name, *values)
+  if kind is Exponentiation:
+    return Exponentiation(*values)
+  if kind is Parentheses:
+    return Parentheses(*values)
+  if kind is Assignment:
+    return Assignment(node.var, *values)
+  return node
+
+
+"""
+NodeFactory class
+Builds the nodes of the tree for the Parser. The Parser never uses the node classes directly,
+so another factory can give another representation of the same tree (see arena.ArenaBuilder).
+Methods:
+  number, variable, assignment, function, exponentiation, parentheses, binary, unary : Build a node
+  is_variable(self, node) -> bool : True if the node is a Variable
+  is_zero(self, node) -> bool : True if the node is the number 0
+"""
+@dataclass
+class NodeFactory:
+
+  def number(self, value):
+    return Number(value)
+
+  def variable(self, name):
+    return Variable(name)
+
+  def assignment(self, var, expr):
+    return Assignment(var, expr)
+
+  def function(self, name, expr):
+    return Function(name, expr)
+
+  def exponentiation(self, base, exp):
+    return Exponentiation(base, exp)
+
+  def parentheses(self, expr):
+    return Parentheses(expr)
+
+  def binary(self, operator, left, right):
+    return Binary(operator, left, right)
+
+  def unary(self, operator, operand):
+    return Unary(operator, operand)
+
+  def is_variable(self, node):
+    return isinstance(node, Variable)
+
+  def is_zero(self, node):
+    return isinstance(node, Number) and node.value == 0
+
+
 """
 MakeDot class
 Inherits from Visitor
@@ -183,12 +446,14 @@ class MakeDot(Visitor):
     'arrowhead': 'none'
   }
   
-  #Digraph declaration
-  dot = Digraph('hoc_ast')
-  dot.attr('node', **node_default)
-  dot.attr('edge', **edge_default)
-  #Sequence of the nodes  
-  sequence = 0
+  #Digraph of each instance: the nodes of a run do not leak into the next one
+  dot : Digraph = field(default_factory = lambda: Digraph('hoc_ast'))
+  #Sequence of the nodes
+  sequence : int = 0
+
+  def __post_init__(self):
+    self.dot.attr('node', **self.node_default)
+    self.dot.attr('edge', **self.edge_default)
   
   def name(self):
     self.sequence += 1 #Increments the sequence
@@ -0,0 +1,161 @@
+from bisect import bisect_left
+from dataclasses import dataclass, field
+import re
+
+from lex import *
+from hoc_ast import *
+from parser import Parser
+
+"""
+Incremental parsing
+IncrementalParser keeps the source of a script and, for each statement, the span of its
+tokens in the source and its tree. An edit replaces a range of the source; only the
+statements around it are lexed and parsed again:
+  - The statements are parsed again from the statement before the first one the edit touches:
+    the end of that statement depends on its lookahead, the first token of the next one.
+  - Lexing restarts at the first token of that statement, a regex scan from a token boundary
+    gives the same tokens as a scan of the whole source.
+  - After the edit, as soon as a new statement starts at the (shifted) start of an old
+    statement, the tokens and the parse from there are the same as before: the old statements
+    are kept, with their spans shifted by the size of the edit.
+The cost of an edit is the lexing and parsing of the statements it touches (plus a shift of
+the offsets of the following statements), not of the whole script.
+"""
+
+"""
+Change class
+The result of an edit: the statements removed and added at index
+Attributes:
+  index : int. The position of the change in the list of statements
+  removed : list. The old statements
+  added : list. The new statements
+"""
+@dataclass
+class Change:
+  index: int
+  removed: list = field(default_factory = list)
+  added: list = field(default_factory = list)
+
+  def __bool__(self):
+    return bool(self.removed or self.added)
+
+
+"""
+IncrementalParser class
+Inherits from Parser
+Attributes:
+  source : str. The source of the script
+  starts : list. The offset of the first token of each statement
+  ends : list. The offset after the last token of each statement
+  nodes : list. The tree of each statement
+  reparsed : int. The statements parsed by the last load or edit
+Methods:
+  load(self, source) -> list : Parses a whole script
+  edit(self, start, end, text) -> Change : Replaces source[start:end] with text and parses again
+    the statements around it
+  edit_line(self, number, text) -> Change : Replaces a line (numbered from 0) of the source
+  statements -> list : The statements of the script
+"""
+@dataclass
+class IncrementalParser(Parser):
+  source: str = ''
+  starts: list = field(default_factory = list, repr = False)
+  ends: list = field(default_factory = list, repr = False)
+  nodes: list = field(default_factory = list, repr = False)
+  reparsed: int = 0
+
+  @property
+  def statements(self):
+    return self.nodes
+
+  def _spans(self, source, position, resync = None):
+    """
+    Parses the statements of source from position, yields (start, end, node).
+    resync(start) is called before each statement, the parse stops when it returns True
+    """
+    self.tok = None
+    self.next_tok = None
+    self.tokens = Lexer().tokenize(source, position)
+    self._advance()
+    while self.next_tok is not None:
+      start = self.next_tok.index
+      if resync and resync(start):
+        return
+      node = self.statement()
+      yield start, self.tok.index + len(self.tok.value), node
+
+  def load(self, source):
+    spans = list(self._spans(source, 0))
+    self.source = source
+    self.starts = [start for start, _, _ in spans]
+    self.ends = [end for _, end, _ in spans]
+    self.nodes = [node for _, _, node in spans]
+    self.reparsed = len(spans)
+    return self.nodes
+
+  def edit(self, start, end, text):
+    source = self.source[:start] + text + self.source[end:]
+    delta = len(text) - (end - start)
+    starts, ends = self.starts, self.ends
+
+    #The first statement the edit touches (a token that ends at start can join the new text),
+    #then one more before it
+    first = max(bisect_left(ends, start) - 1, 0)
+    position = starts[first] if first else 0
+
+    #The old statements after the edit, where the parse can resynchronize
+    after = bisect_left(starts, end)
+    last = len(starts)
+    def resync(new_start):
+      nonlocal last
+      if new_start < start + len(text):
+        return False
+      i = bisect_left(starts, new_start - delta, after)
+      if i < len(starts) and starts[i] == new_start - delta:
+        last = i
+        return True
+      return False
+
+    spans = list(self._spans(source, position, resync))
+
+    #The new state, the statements after the resynchronization are kept and shifted
+    removed = self.nodes[first:last]
+    added = [node for _, _, node in spans]
+    following = first + len(spans)
+    self.source = source
+    self.nodes[first:last] = added
+    starts[first:last] = [s for s, _, _ in spans]
+    ends[first:last] = [e for _, e, _ in spans]
+    if delta:
+      starts[following:] = [s + delta for s in starts[following:]]
+      ends[following:] = [e + delta for e in ends[following:]]
+    self.reparsed = len(spans)
+
+    #The statements parsed again that did not change are not part of the change
+    index = first
+    while removed and added and removed[0] == added[0]:
+      removed, added, index = removed[1:], added[1:], index + 1
+    while removed and added and removed[-1] == added[-1]:
+      removed, added = removed[:-1], added[:-1]
+    return Change(index, removed, added)
+
+  def edit_line(self, number, text):
+    lines = re.match('(?:.*\n){%d}' % number, self.source) #The lines before, scanned by re
+    if lines is None:
+      raise IndexError(f"No line {number}")
+    start = lines.end()
+    end = self.source.find('\n', start)
+    return self.edit(start, len(self.source) if end < 0 else end, text)
+
+
+if __name__ == '__main__':
+  from evaluator import Evaluator
+
+  parser = IncrementalParser()
+  parser.load("""r = 2
+x = 2*PI*r
+y = x/2
+sqrt(x*x + r*r)""")
+  print(parser.edit_line(1, 'x = 3*PI*r'), parser.reparsed, 'statements parsed again')
+  print(parser.edit_line(2, 'y = x/2 + 1'), parser.reparsed, 'statements parsed again')
+  print(Evaluator().run(parser.statements))
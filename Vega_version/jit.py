@@ -0,0 +1,265 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+import math
+
+from lex import *
+from hoc_ast import *
+from evaluator import Evaluator, functions
+from parser import Parser
+
+"""
+Generation of Python source
+The closures of evaluator.Compiler still cost one Python call per node. SourceGenerator writes
+a formula as Python source instead, compile() turns it into a single function and CPython runs
+the arithmetic of the whole formula in one frame:
+  jit_expr('sqrt(x*x + y*y)')   -> lambda v_x, v_y: _sqrt(v_x * v_x + v_y * v_y)
+  jit_program(statements)       -> def _program(_env): ... the contract of compile_program:
+                                   called with the variables, returns the value of each
+                                   statement and stores the assignments in the env
+The generated code computes exactly what the Evaluator does: the same operations in the same
+order ('%' is math.fmod, '^' is math.pow, as in the C hoc) and the same errors. Every variable of
+hoc is named v_ + its name in the generated code (x -> v_x, if -> v_if, _env -> v__env) and the
+helpers, the env and the temporaries start with '_', so no name of hoc can clash with them.
+JitCache interprets a formula (Evaluator.evaluate) until it has been evaluated threshold times, then
+generates its code. A formula too deep for compile() stays interpreted.
+"""
+
+#The namespace of the generated code
+namespace = {'_' + name: function for name, function in functions.items()}
+namespace.update(_pow = math.pow, _fmod = math.fmod, _NameError = NameError)
+
+#Precedence of the Python operators, the operands of lower precedence get parentheses
+ADDITIVE, MULTIPLICATIVE, UNARY, ATOM = 10, 20, 30, 40
+precedence = {'+': ADDITIVE, '-': ADDITIVE, '*': MULTIPLICATIVE, '/': MULTIPLICATIVE}
+
+def identifier(name):
+  #The Python name of a variable: never a keyword, never a name of the generated code
+  return 'v_' + name
+
+def literal(value):
+  if not math.isfinite(value):
+    return f"float('{value}')", ATOM
+  return repr(value), (UNARY if math.copysign(1, value) < 0 else ATOM)
+
+
+"""
+SourceGenerator class
+Inherits from Visitor
+Each visit returns the source of a node with its precedence
+Attributes:
+  load : Callable. The source that reads a variable, from its name
+  names : list. The variables read, in the order of their first reading
+Methods:
+  visit(self, n : Node) -> tuple : The source of a node and its precedence
+  source(self, node) -> str : The source of an expression
+"""
+@dataclass
+class SourceGenerator(Visitor):
+  load: object = identifier
+  names: list = field(default_factory = list)
+
+  def source(self, node):
+    return node.accept(self)[0]
+
+  def operand(self, node, minimum):
+    text, power = node.accept(self)
+    return text if power >= minimum else f'({text})'
+
+  def visit(self, n : Number):
+    return literal(n.value)
+
+  def visit(self, v : Variable):
+    if v.name not in self.names:
+      self.names.append(v.name)
+    return self.load(v.name), ATOM
+
+  def visit(self, a : Assignment):
+    raise TypeError('Assignments are statements, not part of an expression')
+
+  def visit(self, f : Function):
+    return f'_{f.name}({self.source(f.expr)})', ATOM
+
+  def visit(self, e : Exponentiation):
+    return f'_pow({self.source(e.base)}, {self.source(e.exp)})', ATOM
+
+  def visit(self, p : Parentheses):
+    return p.expr.accept(self)
+
+  def visit(self, b : Binary):
+    if b.operator == '%':
+      return f'_fmod({self.source(b.left)}, {self.source(b.right)})', ATOM
+    if b.operator == '^':
+      return f'_pow({self.source(b.left)}, {self.source(b.right)})', ATOM
+    power = precedence[b.operator]
+    #Left to right: an operand on the right of the same precedence keeps its parentheses
+    return f'{self.operand(b.left, power)} {b.operator} {self.operand(b.right, power + 1)}', power
+
+  def visit(self, u : Unary):
+    return f'{u.operator}{self.operand(u.operand, UNARY)}', UNARY
+
+
+def generate_expr(expr):
+  """
+  The source of a lambda of the variables of expr (in the order of their first reading)
+  """
+  generator = SourceGenerator()
+  body = generator.source(expr)
+  return f'lambda {", ".join(identifier(name) for name in generator.names)}: {body}', generator.names
+
+def generate_program(statements):
+  """
+  The source of a function env -> list of values, as compile_program
+  """
+  #The variables of the env are read with _env['x'] until they are assigned or read once
+  #(then they are locals): a missing one raises KeyError at the same point as the Evaluator
+  local = set()
+  def load(name):
+    return identifier(name) if name in local else f"_env[{name!r}]"
+
+  reads = [[] for _ in statements]
+  last = {} #The last statement that reads each variable
+  for index, stmt in enumerate(statements):
+    for node in postorder(stmt):
+      if type(node) is Variable:
+        reads[index].append(node.name)
+        last[node.name] = index
+
+  lines = ['def _program(_env):', '  try:']
+  for index, stmt in enumerate(statements):
+    targets = []
+    while type(stmt) is Assignment: #x = y = expr
+      targets.append(stmt.var.name)
+      stmt = stmt.expr
+    lines.append(f'    _{index} = {SourceGenerator(load).source(stmt)}')
+    for name in reversed(targets):
+      lines.append(f'    {identifier(name)} = _env[{name!r}] = _{index}')
+      local.add(name)
+    #The variables read from the env that are read again later become locals
+    for name in dict.fromkeys(reads[index]):
+      if name not in local and last[name] > index:
+        lines.append(f'    {identifier(name)} = _env[{name!r}]')
+        local.add(name)
+  lines.append('  except KeyError as _error:')
+  lines.append('    raise _NameError(f"Undefined variable {_error.args[0]}") from None')
+  lines.append(f'  return [{", ".join(f"_{index}" for index in range(len(statements)))}]')
+  return '\n'.join(lines)
+
+def _compile(source, name):
+  scope = dict(namespace)
+  exec(compile(source, f'<jit {name}>', 'exec'), scope)
+  return scope
+
+def jit_expr(expr):
+  """
+  Compiles an expression to a function of its variables, positional in the order of
+  function.names (the order of their first reading)
+  """
+  source, names = generate_expr(expr)
+  function = _compile(f'_function = {source}', 'expr')['_function']
+  function.names = names
+  function.source = source
+  return function
+
+def jit_program(statements):
+  """
+  Compiles a list of statements to a function env -> list of values
+  """
+  source = generate_program(statements)
+  function = _compile(source, 'program')['_program']
+  function.source = source
+  return function
+
+
+"""
+HotFormula class
+Attributes:
+  statements : list. The parsed statements
+  count : int. The number of evaluations
+  function : Callable. The generated code (None until the formula is hot)
+  compilable : bool. False if the formula is too deep for compile()
+"""
+@dataclass
+class HotFormula:
+  statements: list
+  count: int = 0
+  function: object = None
+  compilable: bool = True
+
+
+"""
+JitCache class
+Attributes:
+  threshold : int. The number of interpreted evaluations before a formula gets generated code
+  maxsize : int. The maximum number of formulas, the least recently used one is evicted
+  entries : OrderedDict. The HotFormula of each source
+  interpreted : int. The evaluations by Evaluator.evaluate
+  compiled : int. The evaluations by generated code
+  promotions : int. The formulas that got generated code
+  failures : int. The formulas that could not be compiled
+Methods:
+  run(self, source, env) -> list : Evaluates the statements of source over env
+  stats(self) -> dict : The counters and the number of formulas
+"""
+@dataclass
+class JitCache:
+  threshold: int = 100
+  maxsize: int = 4096
+  entries: OrderedDict = field(default_factory = OrderedDict, repr = False)
+  interpreted: int = 0
+  compiled: int = 0
+  promotions: int = 0
+  failures: int = 0
+
+  def formula(self, source):
+    entry = self.entries.get(source)
+    if entry is None:
+      entry = self.entries[source] = HotFormula(Parser().parse(Lexer().tokenize(source)))
+      if len(self.entries) > self.maxsize:
+        self.entries.popitem(last = False)
+    else:
+      self.entries.move_to_end(source)
+    return entry
+
+  def run(self, source, env):
+    entry = self.entries.get(source)
+    if entry is not None and entry.function is not None: #Hot formula
+      self.entries.move_to_end(source)
+      self.compiled += 1
+      return entry.function(env)
+    entry = self.formula(source)
+    entry.count += 1
+    if entry.count > self.threshold and entry.compilable:
+      try:
+        entry.function = jit_program(entry.statements)
+      except (SyntaxError, RecursionError, MemoryError): #Nested deeper than the Python parser allows
+        entry.compilable = False
+        self.failures += 1
+      else:
+        self.promotions += 1
+        self.compiled += 1
+        return entry.function(env)
+    self.interpreted += 1
+    evaluator = Evaluator(env)
+    return [evaluator.evaluate(stmt) for stmt in entry.statements] #Without recursion, for the deep formulas
+
+  def stats(self):
+    return {'formulas': len(self.entries), 'interpreted': self.interpreted, 'compiled': self.compiled,
+            'promotions': self.promotions, 'failures': self.failures}
+
+
+if __name__ == '__main__':
+  parser = Parser()
+  print(generate_expr(parser.parse(Lexer().tokenize('sqrt(x*x + y*y) - -(x - (y - 2)) % 3 ^ 2'))[0])[0])
+  data = """
+  r = 2
+  x = 2*PI*r
+  sqrt(x*x + r*r)
+  """
+  statements = parser.parse(Lexer().tokenize(data))
+  print(generate_program(statements))
+  print(jit_program(statements)({}))
+
+  cache = JitCache(threshold = 2)
+  for r in range(4):
+    print(cache.run('x = 2*PI*r\nsqrt(x*x + r*r)', {'r': r}))
+  print(cache.stats())
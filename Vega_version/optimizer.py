@@ -0,0 +1,135 @@
+from dataclasses import dataclass, fields
+import math
+
+from hoc_ast import *
+from evaluator import functions, operators
+
+"""
+Optimizer
+A Visitor that returns a simplified copy of the tree:
+  - Constant subtrees are folded to a Number (the constants of the lexer, PI, E..., are already
+    Numbers). Only the operations that succeed are folded: log(0) or 1/0 are left in the tree so
+    the error still happens when the formula is evaluated.
+  - The Parentheses nodes are removed, the tree already holds the grouping.
+  - Identities: x*1, 1*x, x/1, x+0, 0+x, x-0, x^1, +x and -(-x) are replaced by x.
+The folded values are computed with the same functions as the Evaluator, so the result
+of the optimized tree is the same as the result of the original one.
+"""
+
+"""
+Optimizer class
+Inherits from Visitor
+Attributes:
+  nodes_before : int. The nodes of the trees given to run
+  nodes_after : int. The nodes of the optimized trees
+Methods:
+  visit(self, n : Node) -> Node : Returns the optimized node
+  run(self, statements) -> list : Optimizes a list of statements and counts the nodes
+  eliminated -> int : The number of nodes removed by the optimizer
+"""
+@dataclass
+class Optimizer(Visitor):
+  nodes_before: int = 0
+  nodes_after: int = 0
+
+  @property
+  def eliminated(self):
+    return self.nodes_before - self.nodes_after
+
+  def run(self, statements):
+    optimized = [stmt.accept(self) for stmt in statements]
+    self.nodes_before += sum(count_nodes(stmt) for stmt in statements)
+    self.nodes_after += sum(count_nodes(stmt) for stmt in optimized)
+    return optimized
+
+  def visit(self, n : Number):
+    return n
+
+  def visit(self, v : Variable):
+    return v
+
+  def visit(self, a : Assignment):
+    return Assignment(a.var, a.expr.accept(self))
+
+  def visit(self, f : Function):
+    expr = f.expr.accept(self)
+    if isinstance(expr, Number):
+      return fold(functions[f.name], expr) or Function(f.name, expr)
+    return Function(f.name, expr)
+
+  def visit(self, e : Exponentiation):
+    base = e.base.accept(self)
+    exp = e.exp.accept(self)
+    if isinstance(base, Number) and isinstance(exp, Number):
+      return fold(math.pow, base, exp) or Exponentiation(base, exp)
+    if is_number(exp, 1):
+      return base
+    return Exponentiation(base, exp)
+
+  def visit(self, p : Parentheses):
+    return p.expr.accept(self)
+
+  def visit(self, b : Binary):
+    left = b.left.accept(self)
+    right = b.right.accept(self)
+    if isinstance(left, Number) and isinstance(right, Number):
+      return fold(operators[b.operator], left, right) or Binary(b.operator, left, right)
+    if b.operator in '+-' and is_number(right, 0):
+      return left
+    if b.operator in '*/' and is_number(right, 1):
+      return left
+    if (b.operator == '+' and is_number(left, 0)) or (b.operator == '*' and is_number(left, 1)):
+      return right
+    return Binary(b.operator, left, right)
+
+  def visit(self, u : Unary):
+    operand = u.operand.accept(self)
+    if u.operator == '+':
+      return operand
+    if isinstance(operand, Number):
+      return Number(-operand.value)
+    if isinstance(operand, Unary) and operand.operator == '-':
+      return operand.operand
+    return Unary(u.operator, operand)
+
+
+def fold(func, *args):
+  """
+  Applies func to the values of the Number args. Returns None if the operation fails
+  """
+  try:
+    return Number(func(*(arg.value for arg in args)))
+  except (ArithmeticError, ValueError):
+    return None
+
+
+def count_nodes(node):
+  """
+  Counts the nodes of a tree
+  """
+  total = 0
+  stack = [node]
+  while stack:
+    node = stack.pop()
+    total += 1
+    stack.extend(child for child in (getattr(node, f.name) for f in fields(node)) if isinstance(child, Node))
+  return total
+
+
+if __name__ == '__main__':
+  from parser import Parser
+
+  lexer = Lexer()
+  parser = Parser()
+  data = """
+  r = 2
+  x = 2*PI*r
+  (3+4)*x + 0
+  sqrt(2)*(r^1)/1 - -(-log(E))
+  """
+  ast = parser.parse(lexer.tokenize(data))
+
+  optimizer = Optimizer()
+  optimized = optimizer.run(ast)
+  print(optimized)
+  print(f'{optimizer.nodes_before} nodes -> {optimizer.nodes_after} nodes ({optimizer.eliminated} eliminated)')
@@ -0,0 +1,186 @@
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_EXCEPTION
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+import os
+import traceback
+
+import numpy as np
+
+from hoc_ast import *
+from dataflow import Dataflow
+from vectorized import compile_vector
+
+"""
+Parallel evaluation over columns
+The statements are evaluated with the vectorized plans (vectorized.py) by a pool of worker
+processes. The input columns and the value of every statement live in one block of shared
+memory: a matrix with one row per column, the workers write their results in place and only
+the names of the block and of the columns are pickled.
+There are two ways of splitting the work:
+  rows       : each worker evaluates every statement over a slice of the rows. The rows are
+               independent, the statements run in order in each worker.
+  statements : the statements are sorted in levels of the dependency graph of the script
+               (dataflow.Dataflow, the reassigned variables are renamed). The statements of a
+               level only read the inputs and the previous levels: they are shared out among
+               the workers, and a level starts when the previous one is done.
+The inputs are 1-D arrays of the same length, or numbers. Unlike evaluate_batch, the value of
+every statement is a whole column (a statement without variables is broadcast).
+"""
+
+def _evaluate(segment, shape, layout, scalars, statements, start, stop):
+  """
+  Worker task: evaluates the statements (output, expression) over the rows start:stop of the
+  columns of the shared memory segment
+  """
+  block = shared_memory.SharedMemory(segment)
+  try:
+    _evaluate_block(block.buf, shape, layout, scalars, statements, start, stop)
+  except BaseException as e:
+    #The frames of the traceback hold views of the block: their variables are cleared so
+    #that no view outlives the mapping
+    traceback.clear_frames(e.__traceback__)
+    raise
+  finally:
+    block.close()
+
+def _evaluate_block(buffer, shape, layout, scalars, statements, start, stop):
+  data = np.ndarray(shape, np.float64, buffer = buffer)
+  for output, expr in statements:
+    plan = compile_vector(expr)
+    columns = {name: scalars[name] if name in scalars else data[layout[name], start:stop]
+               for name in plan.columns if name in scalars or name in layout}
+    plan(columns, out = data[layout[output], start:stop])
+
+
+"""
+ParallelEvaluator class
+Attributes:
+  workers : int. The number of worker processes
+  executor : ProcessPoolExecutor. The pool, started on the first evaluation
+Methods:
+  evaluate_rows(self, statements, columns) -> list : Evaluates the statements, the rows are
+    shared out among the workers
+  evaluate_statements(self, statements, columns) -> list : Evaluates the statements, the
+    independent statements are shared out among the workers
+  close(self) : Stops the workers
+"""
+@dataclass
+class ParallelEvaluator:
+  workers: int = field(default_factory = os.cpu_count)
+  executor: ProcessPoolExecutor = field(default = None, repr = False)
+
+  def __post_init__(self):
+    if self.workers < 1:
+      raise ValueError(f'workers must be positive, got {self.workers}')
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+  def close(self):
+    if self.executor is not None:
+      self.executor.shutdown()
+      self.executor = None
+
+  def _run(self, tasks):
+    if self.executor is None:
+      self.executor = ProcessPoolExecutor(self.workers)
+    futures = [self.executor.submit(_evaluate, *task) for task in tasks]
+    done, pending = wait(futures, return_when = FIRST_EXCEPTION)
+    for future in pending:
+      future.cancel()
+    wait(pending)
+    for future in futures:
+      if future.done() and not future.cancelled():
+        future.result() #Raises the error of a worker
+
+  def _evaluate(self, statements, columns, schedule):
+    flow = Dataflow(statements)
+    arrays = {name: np.asarray(value, np.float64) for name, value in columns.items()}
+    scalars = {name: float(value) for name, value in arrays.items() if value.ndim == 0}
+    arrays = {name: value for name, value in arrays.items() if value.ndim > 0}
+    lengths = {value.shape for value in arrays.values()}
+    if len(lengths) > 1 or any(len(shape) > 1 for shape in lengths):
+      raise ValueError(f'The columns must be 1-D arrays of the same length, got {sorted(lengths)}')
+    rows = lengths.pop()[0] if lengths else 1
+
+    #One row of the matrix for each input and for each statement, the assigned names are
+    #aliases of the row of their statement
+    layout = {name: index for index, name in enumerate(arrays)}
+    outputs = []
+    for index, stmt in enumerate(flow.renamed):
+      output = layout[f'@{index}'] = len(arrays) + index
+      while type(stmt) is Assignment:
+        layout[stmt.var.name] = output
+        stmt = stmt.expr
+      outputs.append((f'@{index}', stmt))
+    shape = (len(arrays) + len(outputs), rows)
+
+    block = shared_memory.SharedMemory(create = True, size = max(shape[0] * rows * 8, 1))
+    data = np.ndarray(shape, np.float64, buffer = block.buf)
+    try:
+      for name, value in arrays.items():
+        data[layout[name]] = value
+      for statements, start, stop in schedule(flow, outputs, rows):
+        self._run([(block.name, shape, layout, scalars, group, start, stop) for group in statements])
+      return [data[layout[output]].copy() for output, _ in outputs]
+    finally:
+      del data
+      block.close()
+      block.unlink()
+
+  def evaluate_rows(self, statements, columns):
+    def schedule(flow, outputs, rows):
+      step = max(-(-rows // self.workers), 1)
+      for start in range(0, rows, step):
+        yield [outputs], start, min(start + step, rows)
+    return self._evaluate(statements, columns, schedule)
+
+  def evaluate_statements(self, statements, columns):
+    def schedule(flow, outputs, rows):
+      #The level of a statement is one more than the levels of the statements it reads
+      levels = [0] * len(outputs)
+      for index, dependents in enumerate(flow.dependents):
+        for dependent in dependents:
+          levels[dependent] = max(levels[dependent], levels[index] + 1)
+      for level in range(max(levels, default = -1) + 1):
+        batch = [output for output, value in zip(outputs, levels) if value == level]
+        groups = [batch[worker::self.workers] for worker in range(min(self.workers, len(batch)))]
+        yield groups, 0, rows
+    return self._evaluate(statements, columns, schedule)
+
+
+def evaluate_parallel(statements, columns, workers = None, by = 'rows'):
+  """
+  Evaluates a list of statements over columns (name -> array) with a pool of workers,
+  splitting the rows (by = 'rows') or the statements (by = 'statements')
+  """
+  with ParallelEvaluator(workers or os.cpu_count()) as evaluator:
+    if by == 'rows':
+      return evaluator.evaluate_rows(statements, columns)
+    if by == 'statements':
+      return evaluator.evaluate_statements(statements, columns)
+    raise ValueError(f"by must be 'rows' or 'statements', got {by!r}")
+
+
+if __name__ == '__main__':
+  from parser import Parser
+  from vectorized import evaluate_batch
+
+  data = """
+  r = sqrt(x*x + y*y)
+  a = atan(y/x)
+  s = r*sin(a)
+  c = r*cos(a)
+  r = r + 1
+  s + c + r
+  """
+  statements = Parser().parse(Lexer().tokenize(data))
+  rng = np.random.default_rng(0)
+  columns = {'x': rng.random(100_000) + 1, 'y': rng.random(100_000)}
+  expected = evaluate_batch(statements, columns)
+  with ParallelEvaluator(2) as evaluator:
+    for results in (evaluator.evaluate_rows(statements, columns), evaluator.evaluate_statements(statements, columns)):
+      print(all(np.allclose(a, b) for a, b in zip(results, expected)), results[-1][:3])
@@ -0,0 +1,89 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from lex import *
+from hoc_ast import *
+from parser import Parser
+
+"""
+Parse cache
+A bounded LRU cache in front of Lexer.tokenize + Parser.parse. The key is the source text,
+so a formula that was already parsed costs one dict lookup. With normalize = True the runs
+of whitespace are collapsed before the lookup: 'x = 1+2' and 'x  =  1+2' share an entry.
+Whitespace is collapsed to a single space, not removed, so 'a b' and 'ab' stay different keys.
+The cached statements are shared by all the callers: they must not be modified.
+Sources that raise SyntaxError are not cached.
+"""
+
+"""
+ParseCache class
+Attributes:
+  maxsize : int. The maximum number of entries, the least recently used one is evicted
+  normalize : bool. Collapse the whitespace of the source before the lookup
+  factory : NodeFactory. Builds the nodes of the parsed trees
+  entries : OrderedDict. The statements of each key, the most recently used last
+  hits : int. The lookups found in the cache
+  misses : int. The lookups that had to parse the source
+  evictions : int. The entries removed to respect maxsize
+Methods:
+  key(self, source) -> str : The cache key of a source
+  parse(self, source) -> list : The statements of source, parsed or from the cache
+  clear(self) : Removes every entry and resets the counters
+  stats(self) -> dict : The counters and the size of the cache
+"""
+@dataclass
+class ParseCache:
+  maxsize: int = 4096
+  normalize: bool = False
+  factory: NodeFactory = field(default_factory = NodeFactory)
+  entries: OrderedDict = field(default_factory = OrderedDict)
+  hits: int = 0
+  misses: int = 0
+  evictions: int = 0
+
+  def __post_init__(self):
+    if self.maxsize < 1:
+      raise ValueError(f'maxsize must be positive, got {self.maxsize}')
+
+  def __len__(self):
+    return len(self.entries)
+
+  def __contains__(self, source):
+    return self.key(source) in self.entries
+
+  def key(self, source):
+    return ' '.join(source.split()) if self.normalize else source
+
+  def parse(self, source):
+    key = self.key(source)
+    statements = self.entries.get(key)
+    if statements is not None:
+      self.hits += 1
+      self.entries.move_to_end(key)
+      return statements
+
+    self.misses += 1
+    statements = Parser(factory = self.factory).parse(Lexer().tokenize(key))
+    self.entries[key] = statements
+    if len(self.entries) > self.maxsize:
+      self.entries.popitem(last = False)
+      self.evictions += 1
+    return statements
+
+  def clear(self):
+    self.entries.clear()
+    self.hits = self.misses = self.evictions = 0
+
+  def stats(self):
+    return {'size': len(self.entries), 'maxsize': self.maxsize, 'hits': self.hits,
+            'misses': self.misses, 'evictions': self.evictions}
+
+
+if __name__ == '__main__':
+  from evaluator import Evaluator
+
+  cache = ParseCache(maxsize = 2, normalize = True)
+  evaluator = Evaluator()
+  for source in ['r = 2', 'x = 2*PI*r', 'r  =  2', 'sqrt(x*x + r*r)', 'x = 2*PI*r', 'r = 2']:
+    print(source, '->', evaluator.run(cache.parse(source)))
+  print(cache.stats())
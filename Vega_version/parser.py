@@ -1,23 +1,44 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from rich import print
 from lex import *
 from hoc_ast import *
 
 
+#Binding power of the binary operators: (left, right), the precedence of the C hoc.
+#An operator on the left of an operand keeps it when the operator on its right has a lower
+#left power than its right power: left < right makes it left associative, left == right
+#right associative (^).
+BINDING_POWER = {
+  '+': (10, 11),
+  '-': (10, 11),
+  '*': (20, 21),
+  '/': (20, 21),
+  '%': (20, 21),
+  '^': (30, 30),
+}
+
+#Right power of the signs: -x^2 is -(x^2) and -x*2 is (-x)*2
+UNARY_POWER = 25
+
+
 """
 Parser class
 Attributes:
   tok : Token. The current token
   next_tok : Token. The next token
   tokens : list. The tokens
+  factory : NodeFactory. Builds the nodes of the tree
 Methods:
   _advance : Advance the current token and the next token
   _accept : Accept the next token if it is of type type
   _expect : Expect the next token to be of type type
-  expr : Parse an expression
+  _unexpected : Raises the SyntaxError of an unexpected token or of the end of the input
+  expr : Parse an expression (precedence climbing over BINDING_POWER)
   factor : Parse a factor
   list : Parse a list of expressions
+  statement : Parse an assignment or an expression
   parse : Parse the tokens
+  iterparse : Parse the tokens lazily, one statement at a time
 
 """
 @dataclass
@@ -25,6 +46,7 @@ class Parser:
   tok : Token = None
   next_tok : Token = None
   tokens = None
+  factory : NodeFactory = field(default_factory = NodeFactory)
   
   def _advance(self):
     self.tok, self.next_tok = self.next_tok, next(self.tokens, None)
@@ -37,7 +59,12 @@ class Parser:
   
   def _expect(self, type):
     if not self._accept(type):
-      raise SyntaxError(f'Expected {type} but got {self.next_tok.type}') 
+      self._unexpected(type)
+
+  def _unexpected(self, expected):
+    if self.next_tok is None:
+      raise SyntaxError('unexpected end of input')
+    raise SyntaxError(f'Expected {expected} but got {self.next_tok.type}')
     
   def assignment (self, var):
     """
@@ -46,14 +73,14 @@ class Parser:
     self._expect('=')
     expr = self.expr()
     
-    if isinstance (expr, Variable) and self.next_tok.type == '=':
+    if self.factory.is_variable(expr) and self.next_tok and self.next_tok.type == '=':
       expr = self.assignment(expr)
       
-    return Assignment(var, expr)
+    return self.factory.assignment(var, expr)
     
     
   #Each of the methods below parse a different part of the grammar
-  def expr(self):
+  def expr(self, min_power = 0, left = None):
     """
     expr ::= NUMBER
           VAR
@@ -63,50 +90,70 @@ class Parser:
           expr - expr
           expr * expr
           expr / expr
+          expr % expr
           expr ^ expr
           ( expr )
           '-' expr
           '+' expr
+    Precedence climbing: the operators are read while their left power (BINDING_POWER) is
+    at least min_power, each one takes as right operand an expr of its right power.
+    left is the first operand when the caller has already parsed it
     """
-      
-    left = self.factor()
-    
-    if self._accept('^'):
-      exp = self.expr()
-      left = Exponentiation(left, exp)
-    
-    while self._accept('+') or self._accept('-') or self._accept('*') or self._accept('/') or self._accept('%'):
-      oper = self.tok.value
+    if left is None:
+      left = self.factor()
+    factory = self.factory
+    binding_power = BINDING_POWER.get
+
+    while self.next_tok:
+      power = binding_power(self.next_tok.type)
+      if power is None or power[0] < min_power:
+        break
+      oper = self.next_tok.type
+      self._advance()
       rigth = self.factor()
-      if oper == '/' and isinstance(rigth, Number) and rigth.value == 0:
-        raise ValueError("Division by zero")
-      left = Binary(oper, left, rigth)
-      
+      #The right operand only needs a recursive call if the next operator binds more
+      following = binding_power(self.next_tok.type) if self.next_tok else None
+      if following is not None and following[0] >= power[1]:
+        rigth = self.expr(power[1], rigth)
+      if oper == '^':
+        left = factory.exponentiation(left, rigth)
+      else:
+        if oper == '/' and factory.is_zero(rigth):
+          raise ValueError("Division by zero")
+        left = factory.binary(oper, left, rigth)
+
     return left
   
   def factor(self):
-    if self._accept('+') or self._accept('-'):
-      oper = self.tok.value
-      operand = self.factor()
-      return Unary(oper, operand)
-    elif self._accept('NUMBER'):
-      return Number(float(self.tok.value))
-    elif self._accept('CONST'):
-      return Number(Lexer.constants[self.tok.value])
-    elif self._accept('FUNC'):
-      func = self.tok.value
-      self._expect('(')
+    #The type of the next token is read once instead of trying each _accept in turn
+    tok = self.next_tok
+    kind = tok.type if tok else None
+    if kind == 'VAR':
+      self._advance()
+      return self.factory.variable(tok.value)
+    elif kind == 'NUMBER':
+      self._advance()
+      return self.factory.number(float(tok.value))
+    elif kind == '(':
+      self._advance()
       expr = self.expr()
       self._expect(')')
-      return Function(func, expr)
-    elif self._accept('VAR'):
-      return Variable(self.tok.value)
-    elif self._accept('('):
+      return self.factory.parentheses(expr)
+    elif kind == '+' or kind == '-':
+      self._advance()
+      operand = self.expr(UNARY_POWER)
+      return self.factory.unary(tok.value, operand)
+    elif kind == 'FUNC':
+      self._advance()
+      self._expect('(')
       expr = self.expr()
       self._expect(')')
-      return Parentheses(expr)
+      return self.factory.function(tok.value, expr)
+    elif kind == 'CONST':
+      self._advance()
+      return self.factory.number(Lexer.constants[tok.value])
     else:
-      raise SyntaxError(f"Expected NUMBER, VAR, FUNC, CONST or '(' but got {self.next_tok.type}")
+      self._unexpected("NUMBER, VAR, FUNC, CONST or '('")
 
   def list(self):
     """
@@ -117,28 +164,138 @@ class Parser:
     list = []
     
     while self.next_tok != None:
-      if self._accept('VAR'):
-        var = Variable(self.tok.value)
-        if self.next_tok and self.next_tok.type == '=':
-          list.append(self.assignment(var))
-        else:
-          list.append(var)
-      else:
-        list.append(self.expr())
-      
-      if self.next_tok is None:
-        break
+      list.append(self.statement())
       
     return list
+  
+  def statement(self):
+    """
+    statement ::= asgn
+              expr
+    """
+    if self._accept('VAR'):
+      var = self.factory.variable(self.tok.value)
+      if self.next_tok and self.next_tok.type == '=':
+        return self.assignment(var)
+      return self.expr(left = var) #The variable is the first operand of the expression
+    return self.expr()
+  
   def parse(self, tokens):
     self.tok = None
     self.next_tok = None
     self.tokens = tokens
     self._advance()
     return self.list()
+  
+  def iterparse(self, tokens):
+    """
+    Parses the tokens lazily and yields the statements one by one,
+    so a statement is available as soon as its tokens have arrived
+    """
+    self.tok = None
+    self.next_tok = None
+    self.tokens = iter(tokens)
+    self._advance()
+    while self.next_tok is not None:
+      yield self.statement()
     
   
   
+"""
+StackParser class
+Inherits from Parser
+The same grammar and trees as Parser, with expr and assignment written with explicit stacks
+instead of recursion: the nesting of parentheses, functions, signs, exponents and assignment
+chains is not limited by the recursion limit.
+Methods:
+  expr : Parse an expression (shunting-yard over BINDING_POWER)
+  assignment : Parse a chain of assignments
+"""
+@dataclass
+class StackParser(Parser):
+
+  def assignment(self, var):
+    targets = [var]
+    self._expect('=')
+    expr = self.expr()
+    while self.factory.is_variable(expr) and self.next_tok and self.next_tok.type == '=':
+      targets.append(expr)
+      self._expect('=')
+      expr = self.expr()
+    for var in reversed(targets):
+      expr = self.factory.assignment(var, expr)
+    return expr
+
+  def _reduce(self, operands, operators):
+    kind, oper = operators.pop()
+    right = operands.pop()
+    if kind == 'unary':
+      operands.append(self.factory.unary(oper, right))
+    elif oper == '^':
+      operands.append(self.factory.exponentiation(operands.pop(), right))
+    else:
+      if oper == '/' and self.factory.is_zero(right):
+        raise ValueError("Division by zero")
+      operands.append(self.factory.binary(oper, operands.pop(), right))
+
+  def _binds(self, entry, power):
+    #True if the operator entry on the stack takes the operand before an operator of this left power
+    kind, oper = entry
+    if kind == 'binary':
+      return power < BINDING_POWER[oper][1]
+    return kind == 'unary' and power < UNARY_POWER
+
+  def expr(self, left = None):
+    factory = self.factory
+    operands = []
+    operators = [] #('unary', sign), ('call', name), ('(', None) or ('binary', operator)
+    operand = left
+    while True:
+      if operand is None:
+        #Operand: the prefixes, then a NUMBER, a CONST or a VAR
+        while True:
+          if self._accept('+') or self._accept('-'):
+            operators.append(('unary', self.tok.value))
+          elif self._accept('FUNC'):
+            func = self.tok.value
+            self._expect('(')
+            operators.append(('call', func))
+          elif self._accept('('):
+            operators.append(('(', None))
+          else:
+            break
+        if self._accept('NUMBER'):
+          operand = factory.number(float(self.tok.value))
+        elif self._accept('CONST'):
+          operand = factory.number(Lexer.constants[self.tok.value])
+        elif self._accept('VAR'):
+          operand = factory.variable(self.tok.value)
+        else:
+          self._unexpected("NUMBER, VAR, FUNC, CONST or '('")
+
+      #Operator: a binary operator reduces the operators that bind more than it,
+      #a ')' or any other token ends a group or the expression
+      operands.append(operand)
+      operand = None
+      while True:
+        tok = self.next_tok
+        power = BINDING_POWER.get(tok.type) if tok else None
+        if power is not None:
+          self._advance()
+          while operators and self._binds(operators[-1], power[0]):
+            self._reduce(operands, operators)
+          operators.append(('binary', tok.type))
+          break
+        while operators and operators[-1][0] in ('binary', 'unary'):
+          self._reduce(operands, operators)
+        if not operators:
+          return operands.pop()
+        self._expect(')')
+        kind, func = operators.pop()
+        expr = operands.pop()
+        operands.append(factory.function(func, expr) if kind == 'call' else factory.parentheses(expr))
+
+
 if __name__ == '__main__':
   lexer = Lexer()
   parser = Parser()
@@ -0,0 +1,215 @@
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from functools import cache
+import os
+import sys
+import tempfile
+import time
+
+from lex import *
+from hoc_ast import *
+from evaluator import Evaluator
+from parser import Parser
+from dot_stream import style
+
+"""
+Profiling
+Profiler times the stages of a formula (lex, parse, evaluate) and, optionally, each node of
+the trees: instrument(Evaluator) is a subclass of the Evaluator whose visits are timed. The
+times go to frames keyed by their stack (('evaluate', 'x =', '+', 'sin()'), ...) with the
+number of calls, the total time and the time of the frame alone (without the frames it calls).
+  collapsed() : the profile in the collapsed stack format of the flame graph tools, one line
+                per stack with its own time in ns (flamegraph.pl, speedscope, inferno...)
+  report()    : the costliest frames, as text
+  CostDot     : MakeDot with the cost of each node as the color of the node (reds9)
+Profiling is opt-in: the Lexer, the Parser and the Evaluator are not changed and never check
+for a profiler, the instrumented code only runs when a Profiler runs it.
+"""
+
+#The nodes whose visits are instrumented
+node_types = Number | Variable | Assignment | Function | Exponentiation | Parentheses | Binary | Unary
+
+def label(node):
+  if type(node) is Assignment:
+    return f'{node.var.name} ='
+  return style(node)[0]
+
+
+"""
+Frame class
+The cost of a stack (or of a node) of the profile
+Attributes:
+  calls : int. The number of calls
+  total : int. The time of the calls in ns, with the frames they called
+  own : int. The time of the calls in ns, without the frames they called
+"""
+@dataclass
+class Frame:
+  calls: int = 0
+  total: int = 0
+  own: int = 0
+
+
+"""
+Profiler class
+Attributes:
+  frames : dict. The Frame of each stack (a tuple of names, the outermost first)
+  nodes : dict. id(node) -> (node, Frame), the cost of each instrumented node
+  stack : list. The names of the open frames
+  inner : list. For each open frame, the time (ns) of the frames it called
+Methods:
+  enter(self, name) : Opens a frame
+  leave(self, elapsed, node) -> Frame : Closes the last frame, that took elapsed ns
+  stage(self, name) : Context manager, times a block as a frame
+  run(self, source, env, nodes) -> tuple : Lexes, parses and evaluates source in frames
+  collapsed(self) -> str : The profile in the collapsed stack format
+  write_collapsed(self, path) : Writes the collapsed profile to a file
+  report(self, top) -> str : The top frames by own time
+"""
+@dataclass
+class Profiler:
+  frames: dict = field(default_factory = dict)
+  nodes: dict = field(default_factory = dict, repr = False)
+  stack: list = field(default_factory = list, repr = False)
+  inner: list = field(default_factory = list, repr = False)
+
+  def enter(self, name):
+    self.stack.append(name)
+    self.inner.append(0)
+
+  def leave(self, elapsed, node = None):
+    path = tuple(self.stack)
+    frame = self.frames.get(path)
+    if frame is None:
+      frame = self.frames[path] = Frame()
+    own = elapsed - self.inner.pop()
+    frame.calls += 1
+    frame.total += elapsed
+    frame.own += own
+    self.stack.pop()
+    if self.inner:
+      self.inner[-1] += elapsed
+    if node is not None:
+      entry = self.nodes.get(id(node))
+      if entry is None:
+        entry = self.nodes[id(node)] = (node, Frame())
+      entry[1].calls += 1
+      entry[1].total += elapsed
+      entry[1].own += own
+    return frame
+
+  @contextmanager
+  def stage(self, name):
+    self.enter(name)
+    start = time.perf_counter_ns()
+    try:
+      yield self
+    finally:
+      self.leave(time.perf_counter_ns() - start)
+
+  def run(self, source, env = None, nodes = False):
+    """
+    Evaluates source, the lexing, the parsing and the evaluation are timed as stages and,
+    if nodes is True, each node evaluated. Returns the statements and their values
+    """
+    evaluator = instrument(Evaluator) if nodes else Evaluator
+    with self.stage('lex'):
+      tokens = list(Lexer().tokenize(source))
+    with self.stage('parse'):
+      statements = Parser().parse(iter(tokens))
+    with self.stage('evaluate'):
+      visitor = evaluator(env if env is not None else {})
+      if nodes:
+        visitor.profiler = self
+      values = visitor.run(statements)
+    return statements, values
+
+  def cost(self, node):
+    """
+    The Frame of an instrumented node (None if it was not evaluated)
+    """
+    entry = self.nodes.get(id(node))
+    return entry[1] if entry is not None and entry[0] is node else None
+
+  def collapsed(self):
+    return ''.join(f'{";".join(path)} {frame.own}\n' for path, frame in self.frames.items() if frame.own > 0)
+
+  def write_collapsed(self, path):
+    with open(path, 'w') as file:
+      file.write(self.collapsed())
+
+  def report(self, top = 10):
+    lines = [f'{"own us":>10} {"total us":>10} {"calls":>8}  stack']
+    for path, frame in sorted(self.frames.items(), key = lambda item: -item[1].own)[:top]:
+      lines.append(f'{frame.own / 1000:10.1f} {frame.total / 1000:10.1f} {frame.calls:8}  {";".join(path)}')
+    return '\n'.join(lines)
+
+
+@cache
+def instrument(visitor_class):
+  """
+  A subclass of a visitor whose visits are timed in the Profiler of its attribute profiler,
+  one frame per node
+  """
+  def visit(self, node: node_types):
+    profiler = self.profiler
+    profiler.enter(label(node))
+    start = time.perf_counter_ns()
+    try:
+      return visitor_class.visit(self, node)
+    finally:
+      profiler.leave(time.perf_counter_ns() - start, node)
+
+  namespace = {'visit': visit, 'profiler': field(default_factory = Profiler), '__annotations__': {'profiler': Profiler}}
+  return dataclass(dispatchmeta(f'Profiled{visitor_class.__name__}', (visitor_class,), namespace))
+
+
+"""
+CostDot class
+Inherits from MakeDot
+Draws the trees as MakeDot does, the evaluated nodes are filled with a color of the reds9
+scheme by their share of the costliest node and get their time as an external label
+Attributes:
+  profiler : Profiler. The profile of the nodes (Profiler.run with nodes = True)
+  metric : str. 'total' (with the children) or 'own'
+Methods:
+  visit(self, node : Node) -> str : Draws a node with its cost
+"""
+@dataclass
+class CostDot(MakeDot):
+  profiler: Profiler = None
+  metric: str = 'total'
+
+  def __post_init__(self):
+    super().__post_init__()
+    self.maximum = max((getattr(frame, self.metric) for _, frame in self.profiler.nodes.values()), default = 0) or 1
+
+  def visit(self, node : node_types):
+    name = MakeDot.visit(self, node)
+    frame = self.profiler.cost(node)
+    if frame is not None:
+      value = getattr(frame, self.metric)
+      self.dot.node(name, colorscheme = 'reds9', fillcolor = str(1 + min(8, 8 * value // self.maximum)),
+                    xlabel = f'{value / 1000:.1f}us x{frame.calls}')
+    return name
+
+
+if __name__ == '__main__':
+  #python profiling.py [file] [directory] : profiles a program, writes profile.folded and hoc_ast.dot
+  #to the directory (by default, a new temporary directory)
+  data = open(sys.argv[1]).read() if len(sys.argv) > 1 else """
+  r = sqrt(x*x + y*y)
+  theta = atan(y/x)
+  r*sin(theta)^2 + log(r + 1) % 3 + exp(-r)
+  """
+  directory = sys.argv[2] if len(sys.argv) > 2 else tempfile.mkdtemp(prefix = 'hoc_profile_')
+  profiler = Profiler()
+  statements, values = profiler.run(data, {'x': 3.0, 'y': 4.0}, nodes = True)
+  print(values)
+  print(profiler.report())
+  profiler.write_collapsed(os.path.join(directory, 'profile.folded'))
+  dot = CostDot(profiler = profiler)
+  for stmt in statements:
+    stmt.accept(dot)
+  dot.dot.save(os.path.join(directory, 'hoc_ast.dot'))
+  print(f'profile.folded, hoc_ast.dot in {directory}')
@@ -0,0 +1,302 @@
+from array import array
+from dataclasses import dataclass, field
+import math
+import mmap
+import struct
+import sys
+
+from hoc_ast import *
+from evaluator import functions
+from arena import (NUMBER, VARIABLE, ASSIGN, FUNCTION, EXP, PARENS, NEG, POS,
+                   binary_opcodes, unary_opcodes, binary_operators, unary_operators, binary_functions)
+
+"""
+Binary AST format
+A list of statements is written as a preorder stream: every node is an opcode (one byte)
+and an argument (four bytes), followed by its children. The argument is an index in the
+table of constants (NUMBER), in the table of names (VARIABLE, FUNCTION, ASSIGN) or 0.
+The target of an assignment is its argument, so an ASSIGN has a single child, the expr.
+
+  header     : magic, version, byte order, nodes, constants, statements, size of the names
+  consts     : float64 * constants
+  args       : uint32 * nodes
+  starts     : uint32 * statements   (the first node of each statement)
+  ops        : uint8 * nodes
+  names      : the names, utf-8, separated by '\n'
+
+The sections are in decreasing order of alignment, so BinaryAst reads them in place with
+memoryview.cast over the bytes, an mmap or any buffer: loading does not copy the stream.
+The opcodes are the ones of the arena.
+"""
+
+HEADER = struct.Struct('<4sHBxIIII')
+MAGIC = b'HOCB'
+VERSION = 1
+LITTLE, BIG = 0, 1
+
+#Number of children of each opcode in the stream
+arity = {NUMBER: 0, VARIABLE: 0, ASSIGN: 1, FUNCTION: 1, PARENS: 1, EXP: 2, NEG: 1, POS: 1}
+arity.update((opcode, 2) for opcode in binary_operators)
+
+"""
+Serializer class
+Writes the nodes in preorder, with an explicit stack: the depth of a tree is not limited
+by the recursion limit
+Attributes:
+  ops : array. The opcodes
+  args : array. The argument of each node
+  consts : array. The table of constants
+  constants : dict. The index of each constant
+  names : dict. The index of each name
+  starts : array. The first node of each statement
+Methods:
+  add(self, node) : Writes a statement
+  tobytes(self) -> bytes : The serialized statements
+"""
+@dataclass
+class Serializer:
+  ops: array = field(default_factory = lambda: array('B'))
+  args: array = field(default_factory = lambda: array('I'))
+  consts: array = field(default_factory = lambda: array('d'))
+  constants: dict = field(default_factory = dict)
+  names: dict = field(default_factory = dict)
+  starts: array = field(default_factory = lambda: array('I'))
+
+  def _name(self, name):
+    return self.names.setdefault(name, len(self.names))
+
+  def _constant(self, value):
+    key = constant_key(value)
+    if key not in self.constants:
+      self.constants[key] = len(self.consts)
+      self.consts.append(value)
+    return self.constants[key]
+
+  def add(self, node):
+    self.starts.append(len(self.ops))
+    emit_op, emit_arg = self.ops.append, self.args.append
+    stack = [node]
+    push, pop = stack.append, stack.pop
+    while stack:
+      node = pop()
+      kind = type(node)
+      if kind is Binary:
+        emit_op(binary_opcodes[node.operator])
+        emit_arg(0)
+        push(node.right) #The stack is LIFO: the left child is written first
+        push(node.left)
+      elif kind is Number:
+        emit_op(NUMBER)
+        emit_arg(self._constant(node.value))
+      elif kind is Variable:
+        emit_op(VARIABLE)
+        emit_arg(self._name(node.name))
+      elif kind is Function:
+        emit_op(FUNCTION)
+        emit_arg(self._name(node.name))
+        push(node.expr)
+      elif kind is Unary:
+        emit_op(unary_opcodes[node.operator])
+        emit_arg(0)
+        push(node.operand)
+      elif kind is Parentheses:
+        emit_op(PARENS)
+        emit_arg(0)
+        push(node.expr)
+      elif kind is Exponentiation:
+        emit_op(EXP)
+        emit_arg(0)
+        push(node.exp)
+        push(node.base)
+      elif kind is Assignment:
+        emit_op(ASSIGN)
+        emit_arg(self._name(node.var.name))
+        push(node.expr)
+      else:
+        raise TypeError(f'Cannot serialize {kind.__name__}')
+
+  def tobytes(self):
+    names = '\n'.join(self.names).encode()
+    order = LITTLE if sys.byteorder == 'little' else BIG
+    header = HEADER.pack(MAGIC, VERSION, order, len(self.ops), len(self.consts), len(self.starts), len(names))
+    return b''.join([header, self.consts.tobytes(), self.args.tobytes(), self.starts.tobytes(),
+                     self.ops.tobytes(), names])
+
+
+"""
+BinaryAst class
+A read-only view of serialized statements. The sections are memoryviews of the buffer.
+Attributes:
+  buffer : The serialized statements (bytes, bytearray, mmap...)
+  ops, args, consts, starts : memoryview. The sections of the buffer
+  names : list. The table of names
+Methods:
+  to_nodes(self, factory) -> list : Builds the statements with a NodeFactory
+  evaluate(self, env) -> list : Evaluates the statements straight from the buffer
+  release(self) : Releases the views of the buffer (needed before closing an mmap)
+"""
+@dataclass
+class BinaryAst:
+  buffer: object
+  ops: memoryview = field(init = False, repr = False)
+  args: memoryview = field(init = False, repr = False)
+  consts: memoryview = field(init = False, repr = False)
+  starts: memoryview = field(init = False, repr = False)
+  names: list = field(init = False)
+
+  def __post_init__(self):
+    magic, version, order, nodes, consts, statements, names = HEADER.unpack_from(self.buffer)
+    if magic != MAGIC or version != VERSION:
+      raise ValueError('Not a binary AST of this version')
+    view = memoryview(self.buffer).cast('B')
+    offset = HEADER.size
+    sections = []
+    for code, count in (('d', consts), ('I', nodes), ('I', statements)):
+      size = count * struct.calcsize(code)
+      section = view[offset:offset + size].cast(code)
+      if order != (LITTLE if sys.byteorder == 'little' else BIG):
+        section = array(code, section) #Written by a machine of the other byte order: one copy
+        section.byteswap()
+      sections.append(section)
+      offset += size
+    self.consts, self.args, self.starts = sections
+    self.ops = view[offset:offset + nodes]
+    offset += nodes
+    self.names = bytes(view[offset:offset + names]).decode().split('\n') if names else []
+
+  def __len__(self):
+    return len(self.starts)
+
+  def release(self):
+    for section in (self.ops, self.args, self.consts, self.starts):
+      if isinstance(section, memoryview):
+        section.release()
+
+  def _end(self, i):
+    return self.starts[i + 1] if i + 1 < len(self.starts) else len(self.ops)
+
+  def _fold(self, start, end, leaf, node):
+    """
+    Folds the preorder stream of a statement without recursion: leaf(op, arg) is the value of
+    a node without children, node(op, arg, children) the value of the others.
+    The children are folded left to right, in the order of the Evaluator, so the assignments
+    happen in the order of the program.
+    """
+    ops, args = self.ops, self.args
+    pending = [] #The inner nodes still waiting for children: (op, arg, children)
+    for i in range(start, end):
+      op, arg = ops[i], args[i]
+      if arity[op]:
+        pending.append((op, arg, []))
+        continue
+      value = leaf(op, arg)
+      while pending:
+        op, arg, children = pending[-1]
+        children.append(value)
+        if len(children) < arity[op]:
+          break
+        pending.pop()
+        value = node(op, arg, children)
+    return value
+
+  def to_nodes(self, factory = None):
+    """
+    Builds the statements with the factory. The nodes are built in the order of the Parser,
+    children first and left to right, so an Arena gets its nodes in the order of the program.
+    """
+    factory = NodeFactory() if factory is None else factory
+    consts, names = self.consts, self.names
+
+    def leaf(op, arg):
+      if op == NUMBER:
+        return factory.number(consts[arg])
+      return factory.variable(names[arg])
+
+    def node(op, arg, children):
+      if op in binary_operators:
+        return factory.binary(binary_operators[op], *children)
+      if op == FUNCTION:
+        return factory.function(names[arg], children[0])
+      if op == EXP:
+        return factory.exponentiation(*children)
+      if op == PARENS:
+        return factory.parentheses(children[0])
+      if op == ASSIGN:
+        return factory.assignment(factory.variable(names[arg]), children[0])
+      return factory.unary(unary_operators[op], children[0])
+
+    return [self._fold(self.starts[i], self._end(i), leaf, node) for i in range(len(self))]
+
+  def evaluate(self, env = None):
+    env = {} if env is None else env
+    consts, names = self.consts, self.names
+
+    def leaf(op, arg):
+      if op == NUMBER:
+        return consts[arg]
+      try:
+        return env[names[arg]]
+      except KeyError:
+        raise NameError(f"Undefined variable {names[arg]}") from None
+
+    def node(op, arg, children):
+      if op in binary_functions:
+        return binary_functions[op](*children)
+      if op == NEG:
+        return -children[0]
+      if op == FUNCTION:
+        return functions[names[arg]](children[0])
+      if op == EXP:
+        return math.pow(*children)
+      if op == ASSIGN:
+        env[names[arg]] = children[0]
+      return children[0] #ASSIGN, PARENS and POS
+
+    return [self._fold(self.starts[i], self._end(i), leaf, node) for i in range(len(self))]
+
+
+def dumps(statements):
+  """
+  Serializes a list of statements
+  """
+  serializer = Serializer()
+  for stmt in statements:
+    serializer.add(stmt)
+  return serializer.tobytes()
+
+def loads(data, factory = None):
+  """
+  Loads the statements of a buffer
+  """
+  ast = BinaryAst(data)
+  try:
+    return ast.to_nodes(factory)
+  finally:
+    ast.release()
+
+def dump(statements, file):
+  file.write(dumps(statements))
+
+def load(file, factory = None):
+  """
+  Loads the statements of a binary file through an mmap
+  """
+  with mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ) as data:
+    return loads(data, factory)
+
+
+if __name__ == '__main__':
+  from parser import Parser
+
+  lexer = Lexer()
+  parser = Parser()
+  data = """
+  r = 2
+  x = y = 2*PI*r
+  sqrt(x*x + r*r) - (-y) % 3
+  """
+  ast = parser.parse(lexer.tokenize(data))
+  data = dumps(ast)
+  print(f'{len(data)} bytes')
+  print(loads(data) == ast)
+  print(BinaryAst(data).evaluate())
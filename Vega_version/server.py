@@ -0,0 +1,329 @@
+import asyncio
+from dataclasses import dataclass, field
+import json
+import sys
+import time
+
+import numpy as np
+
+from lex import *
+from hoc_ast import *
+from evaluator import Evaluator
+from parse_cache import ParseCache
+from vectorized import evaluate_batch
+
+"""
+Evaluation server
+An asyncio server (TCP or Unix socket) with a line-delimited protocol. Each line is a request:
+  {"id": 1, "formula": "x*y + 1", "env": {"x": 2, "y": 3}}   ("id" and "env" are optional)
+  x*y + 1                                                    (a line that is not JSON: a formula)
+  {"stats": true}                                            (the counters and the latencies)
+and gets a line of reply, in the order of the requests of the connection:
+  {"id": 1, "values": [7.0]}  or  {"id": 1, "error": "NameError: Undefined variable y"}
+The requests are queued and evaluated by a single batcher. The requests of a batch that have
+the same formula and the same variables are coalesced: the formula is parsed once (ParseCache)
+and evaluated once with the vectorized plans, one row per request. The rows whose result is
+not finite are evaluated again one by one with the Evaluator, so that a request gets the same
+error (math domain error, division by zero) as without batching.
+Back-pressure: the queue of the batcher and the replies of each connection are bounded, a
+connection is not read while they are full (the client is then held back by TCP).
+"""
+
+"""
+LatencyHistogram class
+Counts the latencies in buckets of powers of two of microseconds
+Attributes:
+  counts : list. The number of latencies of each bucket, bucket i holds [2^(i-1), 2^i) us
+  count : int. The number of latencies
+  total : float. The sum of the latencies, in seconds
+  maximum : float. The largest latency, in seconds
+Methods:
+  record(self, seconds) : Counts a latency
+  percentile(self, p) -> float : The upper bound (seconds) of the bucket of the percentile p
+  snapshot(self) -> dict : The summary and the non-empty buckets
+"""
+@dataclass
+class LatencyHistogram:
+  counts: list = field(default_factory = lambda: [0] * 32)
+  count: int = 0
+  total: float = 0.0
+  maximum: float = 0.0
+
+  def record(self, seconds):
+    bucket = int(seconds * 1e6).bit_length()
+    self.counts[min(bucket, len(self.counts) - 1)] += 1
+    self.count += 1
+    self.total += seconds
+    self.maximum = max(self.maximum, seconds)
+
+  def percentile(self, p):
+    rank = p / 100 * self.count
+    seen = 0
+    for bucket, count in enumerate(self.counts):
+      seen += count
+      if count and seen >= rank:
+        return (1 << bucket) / 1e6
+    return 0.0
+
+  def snapshot(self):
+    return {'count': self.count, 'mean': self.total / self.count if self.count else 0.0,
+            'max': self.maximum, 'p50': self.percentile(50), 'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'buckets': {f'<{1 << bucket}us': count for bucket, count in enumerate(self.counts) if count}}
+
+
+"""
+Request class
+Attributes:
+  formula : str. The source of the formula
+  env : dict. The variables of the request
+  reply : dict. The start of the reply (the id of the request)
+  future : Future. Gets the reply
+  received : float. The time the request was read (time.perf_counter)
+"""
+@dataclass
+class Request:
+  formula: str
+  env: dict
+  reply: dict
+  future: asyncio.Future
+  received: float
+
+
+"""
+HocServer class
+Attributes:
+  window : float. The seconds the batcher waits for more requests after the first one of a batch
+  max_batch : int. The maximum number of requests of a batch
+  queue_size : int. The maximum number of requests waiting for the batcher
+  inflight : int. The maximum number of requests of a connection waiting for their reply
+  cache : ParseCache. The parsed formulas
+  latency : LatencyHistogram. The time from the reading of a request to its reply
+  counters : dict. requests, batches, groups (evaluations), coalesced (requests evaluated in a
+    group of several), fallbacks (rows evaluated again one by one), errors
+  address : The address the server listens on
+  connections : set. The tasks of the open connections
+Methods:
+  start(self, host, port, path) : Starts listening, on a Unix socket if path is given
+  serve_forever(self) : Serves until cancelled
+  close(self) : Stops the server, the connections and the batcher
+  submit(self, formula, env) -> dict : Evaluates a request without a connection
+  evaluate(self, batch) : Evaluates a batch of requests and replies to them
+  stats(self) -> dict : The counters, the parse cache and the latencies
+"""
+@dataclass
+class HocServer:
+  window: float = 0.0
+  max_batch: int = 1024
+  queue_size: int = 4096
+  inflight: int = 256
+  cache: ParseCache = field(default_factory = ParseCache)
+  latency: LatencyHistogram = field(default_factory = LatencyHistogram)
+  counters: dict = field(default_factory = lambda: dict.fromkeys(
+    ['requests', 'batches', 'groups', 'coalesced', 'fallbacks', 'errors'], 0))
+  address: object = None
+  queue: asyncio.Queue = field(default = None, repr = False)
+  server: asyncio.AbstractServer = field(default = None, repr = False)
+  batcher: asyncio.Task = field(default = None, repr = False)
+  connections: set = field(default_factory = set, repr = False)
+
+  async def start(self, host = '127.0.0.1', port = 0, path = None):
+    self.queue = asyncio.Queue(self.queue_size)
+    self.batcher = asyncio.create_task(self._batch())
+    if path is not None:
+      self.server = await asyncio.start_unix_server(self.handle, path)
+    else:
+      self.server = await asyncio.start_server(self.handle, host, port)
+    self.address = self.server.sockets[0].getsockname()
+    return self.address
+
+  async def serve_forever(self):
+    await self.server.serve_forever()
+
+  async def close(self):
+    self.server.close()
+    await self.server.wait_closed()
+    tasks = [self.batcher, *self.connections]
+    for task in tasks:
+      task.cancel()
+    await asyncio.gather(*tasks, return_exceptions = True)
+
+  async def __aenter__(self):
+    return self
+
+  async def __aexit__(self, *exc):
+    await self.close()
+
+  #Connections-------------------------------------------------
+
+  async def handle(self, reader, writer):
+    replies = asyncio.Queue(self.inflight) #The futures of the replies, in the order of the requests
+
+    async def write():
+      while (future := await replies.get()) is not None:
+        writer.write(json.dumps(await future).encode() + b'\n')
+        await writer.drain()
+
+    async def put(future):
+      #Waits for room in the replies, unless the writer stopped: nothing would make room
+      if writing.done():
+        raise ConnectionError('The replies are no longer written')
+      if not replies.full():
+        return replies.put_nowait(future)
+      putting = asyncio.ensure_future(replies.put(future))
+      try:
+        done, _ = await asyncio.wait([putting, writing], return_when = asyncio.FIRST_COMPLETED)
+      finally:
+        putting.cancel()
+      if putting not in done:
+        raise ConnectionError('The replies are no longer written')
+
+    writing = asyncio.create_task(write())
+    self.connections.add(asyncio.current_task())
+    try:
+      while True:
+        try:
+          line = await reader.readline()
+        except (asyncio.LimitOverrunError, ValueError): #A line longer than the limit of the reader
+          await put(self._done({'error': 'ValueError: Request line too long'}))
+          break
+        if not line:
+          break
+        line = line.strip()
+        if line:
+          await put(await self._dispatch(line))
+      await put(None)
+      await writing
+    except (ConnectionError, asyncio.CancelledError): #The client left, or the server is closed
+      pass
+    finally:
+      self.connections.discard(asyncio.current_task())
+      writing.cancel()
+      writer.close()
+
+  def _done(self, reply):
+    future = asyncio.get_running_loop().create_future()
+    future.set_result(reply)
+    return future
+
+  async def _dispatch(self, line):
+    received = time.perf_counter()
+    try:
+      text = line.decode()
+      if not text.startswith('{'):
+        return await self._enqueue(text, {}, {}, received)
+      message = json.loads(text)
+      if message.get('stats'):
+        return self._done(self.stats())
+      reply = {'id': message['id']} if 'id' in message else {}
+      formula, env = message['formula'], message.get('env', {})
+      if not isinstance(formula, str) or not isinstance(env, dict):
+        raise TypeError('formula must be a string and env an object')
+      for name, value in env.items():
+        if type(value) not in (int, float):
+          raise TypeError(f'The value of {name} is not a number')
+      env = {name: float(value) for name, value in env.items()}
+    except (ValueError, KeyError, TypeError, AttributeError) as e: #UnicodeDecodeError is a ValueError
+      self.counters['errors'] += 1
+      return self._done({'error': f'{type(e).__name__}: {e}'})
+    return await self._enqueue(formula, env, reply, received)
+
+  async def _enqueue(self, formula, env, reply, received):
+    request = Request(formula, env, reply, asyncio.get_running_loop().create_future(), received)
+    await self.queue.put(request) #Waits while the queue is full
+    return request.future
+
+  async def submit(self, formula, env = None):
+    received = time.perf_counter()
+    future = await self._enqueue(formula, {name: float(value) for name, value in (env or {}).items()}, {}, received)
+    return await future
+
+  #Evaluation--------------------------------------------------
+
+  async def _batch(self):
+    while True:
+      batch = [await self.queue.get()]
+      #Lets the connections read the requests already received, or waits for them
+      await asyncio.sleep(self.window)
+      while len(batch) < self.max_batch and not self.queue.empty():
+        batch.append(self.queue.get_nowait())
+      try:
+        self.evaluate(batch)
+      except Exception as e: #The batcher serves the next batches anyway
+        for request in batch:
+          self._reply(request, {'error': f'{type(e).__name__}: {e}'})
+
+  def _reply(self, request, reply):
+    if 'error' in reply:
+      self.counters['errors'] += 1
+    self.latency.record(time.perf_counter() - request.received)
+    if not request.future.done():
+      request.future.set_result({**request.reply, **reply})
+
+  def _evaluate_one(self, request, statements):
+    try:
+      values = Evaluator(dict(request.env)).run(statements)
+    except Exception as e: #The errors of the formula go to the client
+      self._reply(request, {'error': f'{type(e).__name__}: {e}'})
+    else:
+      self._reply(request, {'values': values})
+
+  def evaluate(self, batch):
+    self.counters['batches'] += 1
+    self.counters['requests'] += len(batch)
+    groups = {}
+    for request in batch:
+      groups.setdefault((request.formula, tuple(sorted(request.env))), []).append(request)
+
+    for (formula, names), group in groups.items():
+      self.counters['groups'] += 1
+      try:
+        statements = self.cache.parse(formula)
+      except (SyntaxError, ValueError) as e: #ValueError: a literal division by zero
+        for request in group:
+          self._reply(request, {'error': f'{type(e).__name__}: {e}'})
+        continue
+      if len(group) == 1:
+        self._evaluate_one(group[0], statements)
+        continue
+
+      self.counters['coalesced'] += len(group)
+      columns = {name: np.array([request.env[name] for request in group]) for name in names}
+      try:
+        with np.errstate(all = 'ignore'):
+          results = evaluate_batch(statements, columns)
+      except Exception:
+        rows = None #The errors are the ones of each request, evaluated alone
+      else:
+        rows = np.empty((len(group), len(results)))
+        for column, result in enumerate(results):
+          rows[:, column] = result
+      for row, request in enumerate(group):
+        if rows is not None and np.isfinite(rows[row]).all():
+          self._reply(request, {'values': rows[row].tolist()})
+        else:
+          self.counters['fallbacks'] += 1
+          self._evaluate_one(request, statements)
+
+  def stats(self):
+    return {**self.counters, 'queued': self.queue.qsize() if self.queue else 0,
+            'cache': self.cache.stats(), 'latency': self.latency.snapshot()}
+
+
+async def main(address):
+  server = HocServer()
+  if address.isdigit():
+    await server.start(port = int(address))
+  else:
+    await server.start(path = address)
+  print(f'Listening on {server.address}')
+  async with server:
+    await server.serve_forever()
+
+
+if __name__ == '__main__':
+  #python server.py [port | path of a Unix socket]
+  try:
+    asyncio.run(main(sys.argv[1] if len(sys.argv) > 1 else '7777'))
+  except KeyboardInterrupt:
+    pass
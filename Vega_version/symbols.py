@@ -0,0 +1,118 @@
+from array import array
+from dataclasses import dataclass, field
+
+from lex import *
+from hoc_ast import *
+
+"""
+Symbol table
+The tree names the variables by string, so every evaluation of a Variable is a dict lookup.
+SymbolTable gives each distinct name a slot, an index in a flat list of values, and resolve
+rewrites the trees so that their Variables carry the slot. The compiled closures of a resolved
+tree (evaluator.Compiler) read and write the list by index.
+The first slots hold the constants of the lexer (Lexer.constants) and are read-only. The
+parser already turns a CONST token into a Number, the slots serve the trees built by other
+means and the variables given by the caller.
+An undefined variable is a None slot, as in the registers of the vm.
+"""
+
+"""
+SymbolTable class
+Attributes:
+  slots : dict. The slot of each name
+  values : list. The value of each slot (None: undefined)
+  readonly : int. The number of read-only slots, the constants come first
+Methods:
+  slot(self, name) -> int : The slot of a name, a new one if the name is new
+  resolve(self, node) -> Node : A copy of a tree whose Variables carry their slot
+  resolve_all(self, statements) -> list : Resolves a list of statements
+  load(self, env) : Stores the values of a dict of variables
+  dump(self) -> dict : The defined variables (the constants excepted)
+  array(self) -> array : The values as an array('d'), the undefined slots are NaN
+Indexing by name reads and writes a variable: table['x'] = 2
+"""
+@dataclass
+class SymbolTable:
+  slots: dict = field(default_factory = dict)
+  values: list = field(default_factory = list, repr = False)
+  readonly: int = 0
+
+  def __post_init__(self):
+    for name, value in Lexer.constants.items():
+      self.slots[name] = len(self.values)
+      self.values.append(value)
+    self.readonly = len(self.values)
+
+  def __len__(self):
+    return len(self.values)
+
+  def __contains__(self, name):
+    return name in self.slots
+
+  def __getitem__(self, name):
+    slot = self.slots.get(name)
+    if slot is None or self.values[slot] is None:
+      raise NameError(f"Undefined variable {name}")
+    return self.values[slot]
+
+  def __setitem__(self, name, value):
+    self.values[self.writable(name)] = value
+
+  def slot(self, name):
+    slot = self.slots.get(name)
+    if slot is None:
+      slot = self.slots[name] = len(self.values)
+      self.values.append(None)
+    return slot
+
+  def writable(self, name):
+    slot = self.slot(name)
+    if slot < self.readonly:
+      raise NameError(f"Cannot assign the constant {name}")
+    return slot
+
+  def resolve(self, node):
+    def leave(node, values):
+      kind = type(node)
+      if kind is Variable:
+        return Variable(node.name, self.slot(node.name))
+      if kind is Assignment:
+        name = node.var.name
+        return Assignment(Variable(name, self.writable(name)), *values)
+      return rebuild(node, values)
+    return fold(node, leave)
+
+  def resolve_all(self, statements):
+    return [self.resolve(stmt) for stmt in statements]
+
+  def load(self, env):
+    for name, value in env.items():
+      self[name] = value
+
+  def dump(self):
+    values = self.values
+    return {name: values[slot] for name, slot in self.slots.items()
+            if slot >= self.readonly and values[slot] is not None}
+
+  def array(self):
+    nan = float('nan')
+    return array('d', (nan if value is None else value for value in self.values))
+
+
+if __name__ == '__main__':
+  from parser import Parser
+  from evaluator import compile_program
+
+  data = """
+  r = 2
+  x = 2*PI*r
+  sqrt(x*x + r*r)
+  """
+  table = SymbolTable()
+  statements = table.resolve_all(Parser().parse(Lexer().tokenize(data)))
+  print(table.slots)
+  print(compile_program(statements)(table.values), table.dump())
+  try:
+    table.resolve(Assignment(Variable('PI'), Number(3)))
+  except NameError as e:
+    print(e)
@@ -0,0 +1,227 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from hoc_ast import *
+
+"""
+Vectorized evaluation of the AST with NumPy
+A formula is lowered once to a list of instructions (ufunc, operands, output register).
+Evaluating the plan over columns of data runs one ufunc per operator over the whole
+columns instead of one Python evaluation per row. The intermediate results live in
+register buffers that are allocated once and reused on every call: a register is
+released as soon as its value is consumed, so the number of buffers is small and
+ufuncs write in place (out = ...).
+"""
+
+#Ufunc for each FUNC token of the lexer
+ufuncs = {
+  'sin': np.sin,
+  'cos': np.cos,
+  'atan': np.arctan,
+  'log': np.log,
+  'log10': np.log10,
+  'exp': np.exp,
+  'sqrt': np.sqrt,
+  'abs': np.absolute,
+  'int': np.trunc,
+}
+
+def power(base, exp, out = None):
+  #NumPy computes x ** 0.5 as sqrt(x) when the exponent is a scalar: sqrt(-inf) is nan and
+  #sqrt(-0.0) is -0.0, where pow (math.pow, the Evaluator) gives inf and 0.0
+  result = np.power(base, exp, out = out)
+  if np.ndim(exp) == 0 and exp == 0.5:
+    fixed = np.where(np.equal(base, -np.inf), np.inf, result) + 0.0 #-0.0 + 0.0 is 0.0
+    if out is None:
+      return fixed
+    out[...] = fixed
+  return result
+
+binary_ufuncs = {
+  '+': np.add,
+  '-': np.subtract,
+  '*': np.multiply,
+  '/': np.divide,
+  '%': np.fmod,
+  '^': power,
+}
+
+#Kinds of operands of an instruction
+CONST, COLUMN, REGISTER = range(3)
+
+"""
+VectorCompiler class
+Inherits from Visitor
+Attributes:
+  code : list. The instructions (ufunc, operands, output register)
+  free : list. The registers that can be reused
+  registers : int. The number of registers used by the plan
+  columns : set. The names of the variables read by the formula
+Methods:
+  visit(self, n : Node) -> tuple : Lowers a node, returns the operand with its value
+  alloc(self) -> tuple : Takes a free register (or a new one)
+  release(self, *operands) : Returns the registers of the operands to the free list
+"""
+@dataclass
+class VectorCompiler(Visitor):
+  code: list = field(default_factory = list)
+  free: list = field(default_factory = list)
+  registers: int = 0
+  columns: set = field(default_factory = set)
+
+  def alloc(self):
+    if self.free:
+      return (REGISTER, self.free.pop())
+    self.registers += 1
+    return (REGISTER, self.registers - 1)
+
+  def release(self, *operands):
+    for kind, value in operands:
+      if kind == REGISTER:
+        self.free.append(value)
+
+  def emit(self, ufunc, *operands):
+    self.release(*operands)
+    out = self.alloc()
+    self.code.append((ufunc, operands, out[1]))
+    return out
+
+  def visit(self, n : Number):
+    return (CONST, n.value)
+
+  def visit(self, v : Variable):
+    self.columns.add(v.name)
+    return (COLUMN, v.name)
+
+  def visit(self, a : Assignment):
+    raise TypeError('Assignments are evaluated by evaluate_batch, not inside an expression')
+
+  def visit(self, f : Function):
+    return self.emit(ufuncs[f.name], f.expr.accept(self))
+
+  def visit(self, e : Exponentiation):
+    return self.emit(power, e.base.accept(self), e.exp.accept(self))
+
+  def visit(self, p : Parentheses):
+    return p.expr.accept(self)
+
+  def visit(self, b : Binary):
+    return self.emit(binary_ufuncs[b.operator], b.left.accept(self), b.right.accept(self))
+
+  def visit(self, u : Unary):
+    operand = u.operand.accept(self)
+    if u.operator == '+':
+      return operand
+    return self.emit(np.negative, operand)
+
+
+"""
+VectorPlan class
+A formula lowered to ufunc instructions, with its pool of register buffers
+Attributes:
+  code : list. The instructions
+  result : tuple. The operand that holds the value of the formula
+  registers : int. The number of register buffers
+  columns : frozenset. The variables read by the formula
+  buffers : list. The register buffers of the last shape evaluated
+  dtype : type. The type of the buffers and of the result
+Methods:
+  __call__(self, columns, out = None) -> ndarray : Evaluates the formula over the columns
+"""
+@dataclass
+class VectorPlan:
+  code: list
+  result: tuple
+  registers: int
+  columns: frozenset
+  buffers: list = field(default_factory = list)
+  dtype: type = np.float64
+
+  @classmethod
+  def compile(cls, expr):
+    compiler = VectorCompiler()
+    result = expr.accept(compiler)
+    return cls(compiler.code, result, compiler.registers, frozenset(compiler.columns))
+
+  def _shape(self, columns):
+    return np.broadcast_shapes(*(np.shape(columns[name]) for name in self.columns))
+
+  def _buffers(self, shape):
+    #The buffers are only reallocated when the shape of the input changes
+    if not self.buffers or self.buffers[0].shape != shape:
+      self.buffers = [np.empty(shape, self.dtype) for _ in range(self.registers)]
+    return self.buffers
+
+  def __call__(self, columns, out = None):
+    missing = self.columns - columns.keys()
+    if missing:
+      raise NameError(f"Undefined variable {', '.join(sorted(missing))}")
+    values = {name: np.asarray(columns[name], dtype = self.dtype) for name in self.columns}
+    shape = self._shape(values)
+    buffers = self._buffers(shape)
+    if out is None:
+      out = np.empty(shape, self.dtype)
+
+    def operand(kind, value):
+      if kind == CONST:
+        return value
+      if kind == COLUMN:
+        return values[value]
+      return buffers[value]
+
+    last = len(self.code) - 1
+    for i, (ufunc, operands, register) in enumerate(self.code):
+      #The last instruction writes straight to the output array
+      target = out if i == last else buffers[register]
+      ufunc(*(operand(kind, value) for kind, value in operands), out = target)
+
+    if not self.code:
+      out[...] = operand(*self.result) #A formula without operators: a number or a variable
+    return out
+
+
+def compile_vector(expr):
+  """
+  Lowers an expression to a VectorPlan
+  """
+  return VectorPlan.compile(expr)
+
+
+def evaluate_batch(statements, columns):
+  """
+  Evaluates a list of statements over columns (name -> array)
+  The assignments add new columns, visible to the following statements.
+  Returns the list of the values of the statements.
+  """
+  columns = dict(columns)
+  results = []
+  for stmt in statements:
+    names = []
+    while isinstance(stmt, Assignment): #x = y = expr
+      names.append(stmt.var.name)
+      stmt = stmt.expr
+    value = compile_vector(stmt)(columns)
+    for name in names:
+      columns[name] = value
+    results.append(value)
+  return results
+
+
+if __name__ == '__main__':
+  from parser import Parser
+  from evaluator import compile_expr
+
+  lexer = Lexer()
+  parser = Parser()
+  ast = parser.parse(lexer.tokenize('sqrt(x*x+y*y)*sin(t)'))
+
+  rows = 1_000_000
+  rng = np.random.default_rng(0)
+  columns = {'x': rng.random(rows), 'y': rng.random(rows), 't': rng.random(rows)}
+
+  plan = compile_vector(ast[0])
+  print(plan(columns)[:5])
+
+  scalar = compile_expr(ast[0]) #Same formula, row by row
+  print([scalar({name: column[i] for name, column in columns.items()}) for i in range(5)])
@@ -0,0 +1,268 @@
+from array import array
+from dataclasses import dataclass, field
+import math
+
+from hoc_ast import *
+from evaluator import functions
+
+"""
+Bytecode virtual machine
+The statements of a program (Parser.parse) are compiled to a register machine.
+Every value lives in a register: the variables (resolved at compile time to a register
+index), the constants (loaded in their registers before the run) and the temporaries
+of the expressions. An instruction is four integers (opcode, dst, a, b):
+  ADD, SUB, MUL, DIV, MOD, POW   regs[dst] = regs[a] op regs[b]
+  NEG       regs[dst] = -regs[a]
+  CALL      regs[dst] = funcs[b](regs[a])
+  MOVE      regs[dst] = regs[a]
+  EMIT      the value of a statement is regs[a]
+There are no jumps in the language, so the interpreter loop is a single pass over the code.
+The operands are registers, so a formula needs one instruction per operator, without the
+pushes of a stack machine.
+"""
+
+#Opcodes
+ADD, SUB, MUL, DIV, MOD, POW, NEG, CALL, MOVE, EMIT = range(10)
+
+binary_opcodes = {'+': ADD, '-': SUB, '*': MUL, '/': DIV, '%': MOD}
+
+opnames = ['ADD', 'SUB', 'MUL', 'DIV', 'MOD', 'POW', 'NEG', 'CALL', 'MOVE', 'EMIT']
+
+"""
+Program class
+Attributes:
+  code : array. The bytecode, four integers per instruction
+  registers : list. The initial registers: the constants in their registers, None elsewhere
+  variables : dict. The register of each variable
+  funcs : list. The builtin functions called by the program
+  decoded : list. The instructions as (op, dst, a, b) tuples, decoded once from code
+Methods:
+  decode(self) -> list : Decodes code into decoded
+  run(self, env) -> list : Runs the program, returns the value of each statement
+  undefined(self, register) : Raises the NameError of the variable of a register
+  disassemble(self) -> str : The code in text
+"""
+@dataclass
+class Program:
+  code: array = field(default_factory = lambda: array('i'))
+  registers: list = field(default_factory = list)
+  variables: dict = field(default_factory = dict)
+  funcs: list = field(default_factory = list)
+  decoded: list = field(default_factory = list, repr = False, compare = False)
+
+  def decode(self):
+    #Called once the code is final: a run iterates the tuples instead of decoding the array
+    code = self.code.tolist()
+    self.decoded = list(zip(code[0::4], code[1::4], code[2::4], code[3::4]))
+    return self.decoded
+
+  def run(self, env = None):
+    """
+    Runs the program. The variables of env are loaded in their registers before the run
+    and the registers of the variables are written back to env after it.
+    """
+    env = {} if env is None else env
+    regs = self.registers.copy()
+    for name, register in self.variables.items():
+      regs[register] = env.get(name)
+    funcs = self.funcs
+    fmod = math.fmod
+    pow = math.pow
+    results = []
+    emit = results.append
+    instructions = self.decoded or self.decode()
+    try:
+      for op, dst, a, b in instructions:
+        if op == MUL:
+          regs[dst] = regs[a] * regs[b]
+        elif op == ADD:
+          regs[dst] = regs[a] + regs[b]
+        elif op == SUB:
+          regs[dst] = regs[a] - regs[b]
+        elif op == DIV:
+          regs[dst] = regs[a] / regs[b]
+        elif op == CALL:
+          regs[dst] = funcs[b](regs[a])
+        elif op == EMIT:
+          if regs[a] is None:
+            self.undefined(a)
+          emit(regs[a])
+        elif op == NEG:
+          regs[dst] = -regs[a]
+        elif op == MOVE:
+          if regs[a] is None:
+            self.undefined(a)
+          regs[dst] = regs[a]
+        elif op == POW:
+          regs[dst] = pow(regs[a], regs[b])
+        elif op == MOD:
+          regs[dst] = fmod(regs[a], regs[b])
+    except TypeError:
+      #The operations only fail with a TypeError when an operand is an undefined variable (None)
+      for register in ((a,) if op in (CALL, NEG) else (a, b)):
+        if regs[register] is None:
+          self.undefined(register)
+      raise
+    finally:
+      for name, register in self.variables.items():
+        if regs[register] is not None:
+          env[name] = regs[register]
+    return results
+
+  def undefined(self, register):
+    name = next(name for name, reg in self.variables.items() if reg == register)
+    raise NameError(f"Undefined variable {name}") from None
+
+  def disassemble(self):
+    names = {register: name for name, register in self.variables.items()}
+    def operand(register):
+      if register in names:
+        return names[register]
+      if self.registers[register] is not None:
+        return repr(self.registers[register])
+      return f'r{register}'
+
+    lines = []
+    for i, (op, dst, a, b) in enumerate(self.decoded or self.decode()):
+      if op == EMIT:
+        lines.append(f'{i:4d} EMIT {operand(a)}')
+      elif op in (NEG, MOVE):
+        lines.append(f'{i:4d} {opnames[op]} {operand(dst)}, {operand(a)}')
+      elif op == CALL:
+        lines.append(f'{i:4d} CALL {operand(dst)}, {self.funcs[b].__name__}({operand(a)})')
+      else:
+        lines.append(f'{i:4d} {opnames[op]} {operand(dst)}, {operand(a)}, {operand(b)}')
+    return '\n'.join(lines)
+
+
+"""
+BytecodeCompiler class
+Inherits from Visitor
+Each visit returns the register that holds the value of the node.
+Attributes:
+  program : Program. The program being compiled
+  constants : dict. The register of each constant
+  temporaries : set. The registers of the temporaries
+  free : list. The temporaries that can be reused
+  calls : dict. The index of each builtin function
+Methods:
+  emit(self, op, dst, a, b) : Appends an instruction
+  compile(self, statements) -> Program : Compiles a list of statements
+"""
+@dataclass
+class BytecodeCompiler(Visitor):
+  program: Program = field(default_factory = Program)
+  constants: dict = field(default_factory = dict)
+  temporaries: set = field(default_factory = set)
+  free: list = field(default_factory = list)
+  calls: dict = field(default_factory = dict)
+
+  def emit(self, op, dst = 0, a = 0, b = 0):
+    self.program.code.extend((op, dst, a, b))
+
+  def register(self, value = None):
+    self.program.registers.append(value)
+    return len(self.program.registers) - 1
+
+  def temporary(self, *operands):
+    #The operands are consumed by the instruction, their temporaries can hold its result
+    for register in operands:
+      if register in self.temporaries:
+        self.free.append(register)
+    if self.free:
+      return self.free.pop()
+    register = self.register()
+    self.temporaries.add(register)
+    return register
+
+  def variable(self, name):
+    if name not in self.program.variables:
+      self.program.variables[name] = self.register()
+    return self.program.variables[name]
+
+  def compile(self, statements):
+    for stmt in statements:
+      register = stmt.accept(self)
+      self.emit(EMIT, a = register)
+      if register in self.temporaries:
+        self.free.append(register)
+    self.program.decode()
+    return self.program
+
+  def visit(self, n : Number):
+    key = (n.value, math.copysign(1, n.value))
+    if key not in self.constants:
+      self.constants[key] = self.register(n.value)
+    return self.constants[key]
+
+  def visit(self, v : Variable):
+    return self.variable(v.name)
+
+  def visit(self, a : Assignment):
+    value = a.expr.accept(self)
+    var = self.variable(a.var.name)
+    code = self.program.code
+    if value in self.temporaries and code[-4] != EMIT and code[-3] == value:
+      code[-3] = var #The last instruction writes straight to the variable
+      self.free.append(value)
+    else:
+      self.emit(MOVE, var, value)
+      if value in self.temporaries:
+        self.free.append(value)
+    return var
+
+  def visit(self, f : Function):
+    operand = f.expr.accept(self)
+    if f.name not in self.calls:
+      self.calls[f.name] = len(self.program.funcs)
+      self.program.funcs.append(functions[f.name])
+    dst = self.temporary(operand)
+    self.emit(CALL, dst, operand, self.calls[f.name])
+    return dst
+
+  def visit(self, e : Exponentiation):
+    base = e.base.accept(self)
+    exp = e.exp.accept(self)
+    dst = self.temporary(base, exp)
+    self.emit(POW, dst, base, exp)
+    return dst
+
+  def visit(self, p : Parentheses):
+    return p.expr.accept(self)
+
+  def visit(self, b : Binary):
+    left = b.left.accept(self)
+    right = b.right.accept(self)
+    dst = self.temporary(left, right)
+    self.emit(binary_opcodes[b.operator], dst, left, right)
+    return dst
+
+  def visit(self, u : Unary):
+    operand = u.operand.accept(self)
+    if u.operator == '+':
+      return operand
+    dst = self.temporary(operand)
+    self.emit(NEG, dst, operand)
+    return dst
+
+
+def compile_bytecode(statements):
+  """
+  Compiles a list of statements to a Program
+  """
+  return BytecodeCompiler().compile(statements)
+
+
+if __name__ == '__main__':
+  from parser import Parser
+
+  lexer = Lexer()
+  parser = Parser()
+  data = """
+  r = 2
+  x = y = 2*PI*r
+  sqrt(x*x + r*r) - (-y) % 3
+  """
+  program = compile_bytecode(parser.parse(lexer.tokenize(data)))
+  print(program.disassemble())
+  print(program.run())
@@ -0,0 +1,108 @@
+"""
+Benchmark: the gradient of a formula of n variables, per gradient
+  finite      : central differences, 2n evaluations of the compiled program (compile_program)
+  symbolic    : n derivative trees (autodiff.derivatives, optimized), compiled once, n evaluations
+  reverse     : autodiff.gradient, records the tape, one forward pass and one backward pass
+  tape        : the same tape replayed, Tape.forward then Tape.backward
+  reverse x1k : autodiff.gradient over NumPy columns of 1000 rows, time per row
+Usage: python benchmarks/bench_autodiff.py [sizes, comma separated] [runs]
+"""
+import gc
+import os
+import string
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Vega_version'))
+
+from lex import Lexer
+from parser import Parser
+from evaluator import compile_expr, compile_program
+from optimizer import Optimizer
+from autodiff import Tape, derivatives, gradient
+
+def variables(n):
+  #The variables of hoc are letters: xa, xb, ..., xaa, xab...
+  letters = string.ascii_lowercase
+  names = []
+  for i in range(n):
+    name = ''
+    while True:
+      name = letters[i % 26] + name
+      i = i // 26 - 1
+      if i < 0:
+        break
+    names.append('x' + name)
+  return names
+
+def balanced(terms):
+  #A sum of depth log(n), for the recursive compiler
+  if len(terms) == 1:
+    return terms[0]
+  middle = len(terms) // 2
+  return f'({balanced(terms[:middle])}) + ({balanced(terms[middle:])})'
+
+def formula(names):
+  terms = [f'sin({a}*{b}) + exp(-{a}^2/2)' for a, b in zip(names, names[1:] + names[:1])]
+  return f's = {balanced(terms)}\nsqrt(s*s + 1) + log(1 + {names[0]}*{names[0]})'
+
+def timeit(function, runs):
+  gc.collect()
+  gc.disable()
+  try:
+    best = float('inf')
+    for _ in range(runs):
+      start = time.perf_counter()
+      function()
+      best = min(best, time.perf_counter() - start)
+    return best
+  finally:
+    gc.enable()
+
+
+if __name__ == '__main__':
+  sizes = [int(size) for size in sys.argv[1].split(',')] if len(sys.argv) > 1 else [4, 16, 64]
+  runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+  for n in sizes:
+    names = variables(n)
+    statements = Parser().parse(Lexer().tokenize(formula(names)))
+    env = {name: 0.1 + i / n for i, name in enumerate(names)}
+    columns = {name: np.linspace(0.1, 1.0, 1000) + i / n for i, name in enumerate(names)}
+    program = compile_program(statements)
+    trees = [compile_expr(Optimizer().run(derivatives(statements, name))[-1]) for name in names]
+
+    def finite(h = 1e-6):
+      grad = {}
+      for name in names:
+        up, down = dict(env), dict(env)
+        up[name] += h
+        down[name] -= h
+        grad[name] = (program(up)[-1] - program(down)[-1]) / (2 * h)
+      return grad
+
+    def symbolic():
+      return {name: tree(dict(env)) for name, tree in zip(names, trees)}
+
+    tape = Tape.record(statements)
+
+    def replay():
+      tape.forward(env)
+      return tape.backward()
+
+    exact = gradient(statements, env)[1]
+    assert replay() == exact
+    assert all(abs(exact[name] - value) < 1e-9 for name, value in symbolic().items())
+    assert all(abs(exact[name] - value) < 1e-4 for name, value in finite().items())
+
+    times = {
+      'finite': timeit(finite, runs),
+      'symbolic': timeit(symbolic, runs),
+      'reverse': timeit(lambda: gradient(statements, env), runs),
+      'tape': timeit(replay, runs),
+      'reverse x1k': timeit(lambda: gradient(statements, columns), runs) / 1000,
+    }
+    print(f'n = {n}')
+    for name, elapsed in times.items():
+      print(f'  {name:12} {elapsed * 1e6:10.1f} us   x{times["finite"] / elapsed:7.1f}')
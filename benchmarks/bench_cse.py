@@ -0,0 +1,55 @@
+"""
+Benchmark: hash consing and common subexpression elimination
+A formula repeats the same subexpression k times. It is parsed with the default NodeFactory
+(a tree) and with HashConsFactory (a DAG), then evaluated with the compiled closures of the
+tree (compile_expr) and with the steps of the DAG (compile_dag).
+Usage: python benchmarks/bench_cse.py [repeat]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Vega_version'))
+
+from lex import Lexer
+from hoc_ast import NodeFactory
+from parser import Parser
+from evaluator import compile_expr
+from hashcons import HashConsFactory, compile_dag, dag_size
+from optimizer import count_nodes
+
+SUBEXPRESSION = 'sqrt(x*x + y*y + z*z) * atan(y/x)'
+
+def formula(k):
+  return '(' + ' + '.join(f'({SUBEXPRESSION})*{i}' for i in range(1, k + 1)) + ')'
+
+def parse(source, factory):
+  tracemalloc.start()
+  ast = Parser(factory = factory).parse(Lexer().tokenize(source))
+  memory = tracemalloc.get_traced_memory()[0]
+  tracemalloc.stop()
+  return ast[0], memory
+
+def timeit(func, env, repeat):
+  start = time.perf_counter()
+  for _ in range(repeat):
+    func(env)
+  return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+  repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+  env = {'x': 1.5, 'y': 2.5, 'z': 0.5}
+  for k in (1, 5, 20, 100):
+    source = formula(k)
+    tree, tree_memory = parse(source, NodeFactory())
+    dag, dag_memory = parse(source, HashConsFactory())
+
+    compiled, steps = compile_expr(tree), compile_dag(dag)
+    assert compiled(env) == steps(env)
+    tree_time = timeit(compiled, env, repeat)
+    dag_time = timeit(steps, env, repeat)
+    print(f'k={k:<4} nodes {count_nodes(tree):6d} -> {dag_size(dag):5d}   '
+          f'memory {tree_memory / 1024:8.1f} KiB -> {dag_memory / 1024:7.1f} KiB   '
+          f'time {tree_time:.3f}s -> {dag_time:.3f}s')
@@ -0,0 +1,62 @@
+"""
+Benchmark: what-if updates of one input in large scripts of assignments
+  full     : compile_program over the whole script for every update (the compiled closures)
+  dataflow : Dataflow.update, only the statements downstream of the input are evaluated
+Usage: python benchmarks/bench_dataflow.py [updates] [statements ...]
+"""
+import gc
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Vega_version'))
+
+from lex import Lexer
+from parser import Parser
+from evaluator import compile_program
+from dataflow import Dataflow
+
+
+def script(statements, inputs, rng):
+  #Each assignment reads an input or one of the last assignments: chains of dependencies
+  def operand(index):
+    if index == 0 or rng.random() < 0.3:
+      return f'x{rng.randrange(inputs)}'
+    return f'v{rng.randrange(max(index - 20, 0), index)}'
+  return '\n'.join(f'v{i} = {operand(i)} {rng.choice("+-*")} {operand(i)} / 7' for i in range(statements))
+
+def timeit(update, changes):
+  gc.collect()
+  gc.disable()
+  try:
+    start = time.perf_counter()
+    for change in changes:
+      update(change)
+    return (time.perf_counter() - start) / len(changes)
+  finally:
+    gc.enable()
+
+
+if __name__ == '__main__':
+  count = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+  sizes = [int(arg) for arg in sys.argv[2:]] or [1000, 10000, 100000]
+  rng = random.Random(0)
+  for size in sizes:
+    inputs = max(size // 10, 1)
+    statements = Parser().parse(Lexer().tokenize(script(size, inputs, rng)))
+    env = {f'x{i}': 1.0 for i in range(inputs)}
+    changes = [{f'x{rng.randrange(inputs)}': float(rng.randint(1, 100))} for _ in range(count)]
+
+    program = compile_program(statements)
+    full_env = dict(env)
+    def full(change):
+      full_env.update(change)
+      program(full_env)
+
+    flow = Dataflow(statements)
+    flow.run(dict(env))
+    full_time = timeit(full, changes)
+    flow_time = timeit(flow.update, changes)
+    print(f'{size:7} statements   full {full_time * 1e3:8.3f} ms   dataflow {flow_time * 1e3:8.3f} ms   '
+          f'x{full_time / flow_time:7.1f}   ({(flow.evaluations - size) / len(changes) / size:6.1%} evaluated per update)')
@@ -0,0 +1,52 @@
+"""
+Benchmark: deeply nested input, recursive vs explicit-stack parser and evaluator
+Each shape nests depth levels. The recursive Parser and the Evaluator visitor stop with
+RecursionError, StackParser and Evaluator.evaluate (hoc_ast.fold) do not depend on the depth.
+The default depths are 200 (within the recursion limit, to compare both) and 10^5.
+Usage: python benchmarks/bench_deep.py [depth ...]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Vega_version'))
+
+from lex import Lexer
+from parser import Parser, StackParser
+from evaluator import Evaluator
+from hoc_ast import postorder
+
+SHAPES = {
+  'parentheses': lambda n: '(' * n + 'x' + ')' * n,
+  'signs': lambda n: '-(' * n + 'x' + ')' * n,
+  'functions': lambda n: 'abs(' * n + 'x' + ')' * n,
+  'exponents': lambda n: 'f = ' + 'x^' * n + 'x',
+  'assignments': lambda n: ' = '.join(f'v{i}' for i in range(n)) + ' = x',
+}
+
+def timeit(func, repeat = 1):
+  start = time.perf_counter()
+  try:
+    for _ in range(repeat):
+      func()
+  except RecursionError:
+    return '   RecursionError'
+  return f'{(time.perf_counter() - start) * 1000:11.1f} ms    '
+
+
+if __name__ == '__main__':
+  depths = [int(arg) for arg in sys.argv[1:]] or [200, 10**5]
+  for depth in depths:
+    print(f'depth {depth}' + (f' (x{max(1, 10**5 // depth)})' if depth < 10**5 else ''))
+    print(f'  {"shape":12} {"Parser":>17} {"StackParser":>17} {"Evaluator.run":>17} {"evaluate":>17} {"postorder":>17}')
+    for name, shape in SHAPES.items():
+      tokens = list(Lexer().tokenize(shape(depth)))
+      repeat = max(1, 10**5 // depth) #The same number of nodes at every depth
+      ast = StackParser().parse(iter(tokens))
+      env = {'x': 1.0}
+      columns = [timeit(lambda: Parser().parse(iter(tokens)), repeat),
+                 timeit(lambda: StackParser().parse(iter(tokens)), repeat),
+                 timeit(lambda: Evaluator(dict(env)).run(ast), repeat),
+                 timeit(lambda: [Evaluator(dict(env)).evaluate(stmt) for stmt in ast], repeat),
+                 timeit(lambda: sum(1 for stmt in ast for _ in postorder(stmt)), repeat)]
+      print(f'  {name:12} ' + ' '.join(columns))
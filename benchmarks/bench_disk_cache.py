@@ -0,0 +1,56 @@
+"""
+Benchmark: cold start with and without the persistent formula cache
+A worker parses a library of formulas once. The cold start is timed three ways:
+  parse  : Lexer.tokenize + Parser.parse + Optimizer for every formula
+  build  : the same through FormulaCache, then save() (first start)
+  mapped : FormulaCache over the saved file (every later start)
+Usage: python benchmarks/bench_disk_cache.py [formulas]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Vega_version'))
+
+from lex import Lexer
+from parser import Parser
+from optimizer import Optimizer
+from disk_cache import FormulaCache
+from bench_optimizer import generated_corpus
+
+
+def cold_start(formulas, path):
+  cache = FormulaCache(path)
+  statements = [cache.parse(source) for source in formulas]
+  cache.close()
+  return statements
+
+
+if __name__ == '__main__':
+  count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+  formulas = list(generated_corpus(count))
+  path = os.path.join(tempfile.mkdtemp(), 'formulas.hocc')
+
+  start = time.perf_counter()
+  expected = [Optimizer().run(Parser().parse(Lexer().tokenize(source))) for source in formulas]
+  parse = time.perf_counter() - start
+
+  start = time.perf_counter()
+  cache = FormulaCache(path)
+  for source in formulas:
+    cache.parse(source)
+  cache.save()
+  cache.close()
+  build = time.perf_counter() - start
+
+  start = time.perf_counter()
+  loaded = cold_start(formulas, path)
+  mapped = time.perf_counter() - start
+  assert loaded == expected
+
+  print(f'{count} formulas, cache file {os.path.getsize(path) / 1024:.1f} KiB')
+  print(f'parse   {parse * 1000:8.1f} ms')
+  print(f'build   {build * 1000:8.1f} ms')
+  print(f'mapped  {mapped * 1000:8.1f} ms   x{parse / mapped:.1f}')
+  os.remove(path)
@@ -0,0 +1,99 @@
+"""
+Benchmark: visitor dispatch, in nodes visited per second
+The same visitors (a node counter and an evaluator) are built with two metaclasses:
+  multimeta    : the multimethod library (the dispatch used before), if it is installed
+  dispatchmeta : the type -> function tables of hoc_ast
+Usage: python benchmarks/bench_dispatch.py [formulas] [runs]
+"""
+import gc
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Vega_version'))
+
+from hoc_ast import *
+from lex import Lexer
+from parser import Parser
+from evaluator import functions, operators, unary_operators
+from bench_optimizer import generated_corpus
+
+try:
+  from multimethod import multimeta
+except ImportError:
+  multimeta = None
+
+
+def visitors(metaclass):
+  class Counter(metaclass = metaclass):
+    def visit(self, n : Number):
+      return 1
+    def visit(self, v : Variable):
+      return 1
+    def visit(self, a : Assignment):
+      return 1 + a.expr.accept(self)
+    def visit(self, f : Function):
+      return 1 + f.expr.accept(self)
+    def visit(self, e : Exponentiation):
+      return 1 + e.base.accept(self) + e.exp.accept(self)
+    def visit(self, p : Parentheses):
+      return 1 + p.expr.accept(self)
+    def visit(self, b : Binary):
+      return 1 + b.left.accept(self) + b.right.accept(self)
+    def visit(self, u : Unary):
+      return 1 + u.operand.accept(self)
+
+  class Evaluator(metaclass = metaclass):
+    env = {'x': 0.5, 'y': 1.5, 'r': 2.0, 'theta': 0.25}
+    def visit(self, n : Number):
+      return n.value
+    def visit(self, v : Variable):
+      return self.env[v.name]
+    def visit(self, a : Assignment):
+      return a.expr.accept(self)
+    def visit(self, f : Function):
+      return functions[f.name](f.expr.accept(self))
+    def visit(self, e : Exponentiation):
+      return math.pow(e.base.accept(self), e.exp.accept(self))
+    def visit(self, p : Parentheses):
+      return p.expr.accept(self)
+    def visit(self, b : Binary):
+      return operators[b.operator](b.left.accept(self), b.right.accept(self))
+    def visit(self, u : Unary):
+      return unary_operators[u.operator](u.operand.accept(self))
+
+  return Counter(), Evaluator()
+
+def rate(visitor, statements, nodes, runs):
+  gc.collect()
+  gc.disable()
+  try:
+    best = float('inf')
+    for _ in range(runs):
+      start = time.perf_counter()
+      for stmt in statements:
+        stmt.accept(visitor)
+      best = min(best, time.perf_counter() - start)
+    return nodes / best
+  finally:
+    gc.enable()
+
+
+if __name__ == '__main__':
+  formulas = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+  runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+  statements = [stmt for source in generated_corpus(formulas) for stmt in Parser().parse(Lexer().tokenize(source))]
+  counter, _ = visitors(dispatchmeta)
+  nodes = sum(stmt.accept(counter) for stmt in statements)
+  print(f'{len(statements)} statements, {nodes} nodes')
+
+  metaclasses = [('multimeta', multimeta), ('dispatchmeta', dispatchmeta)] if multimeta else [('dispatchmeta', dispatchmeta)]
+  rates = {}
+  for name, metaclass in metaclasses:
+    for visitor in visitors(metaclass):
+      rates[name, type(visitor).__name__] = rate(visitor, statements, nodes, runs)
+  for (name, kind), value in rates.items():
+    before = rates.get(('multimeta', kind))
+    gain = f'   x{value / before:5.1f}' if before and name != 'multimeta' else ''
+    print(f'{name:12} {kind:9} {value / 1e6:7.2f} M nodes/s{gain}')
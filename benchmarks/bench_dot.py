@@ -0,0 +1,70 @@
+"""
+Benchmark: DOT generation of large generated formulas
+  MakeDot   : the graphviz.Digraph built in memory, then saved
+  DotWriter : the lines streamed to the file, full graph and with a node budget
+The time and the peak of memory of the generation are reported (the peak is measured in a
+second run, tracemalloc slows down the allocations). MakeDot only runs on the
+forest of small statements: the deep formula is beyond its recursion limit.
+Usage: python benchmarks/bench_dot.py [nodes]
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Vega_version'))
+
+from lex import Lexer
+from parser import Parser
+from hoc_ast import MakeDot
+from dot_stream import DotWriter
+from optimizer import count_nodes
+
+
+def forest(nodes):
+  #Statements of about 20 nodes each
+  source = '\n'.join(f'v{i} = sqrt(x*{i} + y*y) - (-x) % 3 + sin(y/{i + 1})' for i in range(nodes // 20))
+  return Parser().parse(Lexer().tokenize(source))
+
+def deep(nodes):
+  #A single left-deep formula
+  source = 'f = 1' + ''.join(f' + x*{i % 7}' for i in range(nodes // 4))
+  return Parser().parse(Lexer().tokenize(source))
+
+def measure(func):
+  start = time.perf_counter()
+  func()
+  elapsed = time.perf_counter() - start
+  tracemalloc.start()
+  func()
+  peak = tracemalloc.get_traced_memory()[1]
+  tracemalloc.stop()
+  return elapsed, peak
+
+def make_dot(statements, path):
+  dot = MakeDot()
+  for stmt in statements:
+    stmt.accept(dot)
+  dot.dot.save(path)
+
+def dot_writer(statements, path, **budget):
+  with open(path, 'w') as file:
+    DotWriter(file, **budget).write(statements)
+
+
+if __name__ == '__main__':
+  nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+  path = os.path.join(tempfile.mkdtemp(), 'hoc_ast.dot')
+  for name, statements in (('forest', forest(nodes)), ('deep', deep(nodes))):
+    print(f'{name}: {sum(count_nodes(stmt) for stmt in statements)} nodes')
+    runs = [('DotWriter', lambda: dot_writer(statements, path)),
+            ('DotWriter max_nodes=1000', lambda: dot_writer(statements, path, max_nodes = 1000)),
+            ('  count_hidden=False', lambda: dot_writer(statements, path, max_nodes = 1000, count_hidden = False)),
+            ('DotWriter max_depth=8', lambda: dot_writer(statements, path, max_depth = 8))]
+    if name == 'forest':
+      runs.insert(0, ('MakeDot', lambda: make_dot(statements, path)))
+    for label, func in runs:
+      elapsed, peak = measure(func)
+      print(f'  {label:25} {elapsed * 1000:8.1f} ms   peak {peak / 2**20:7.2f} MiB   file {os.path.getsize(path) / 2**20:6.2f} MiB')
+  os.remove(path)
@@ -0,0 +1,59 @@
+"""
+Benchmark: visitor walk (Evaluator) vs compiled closures (Compiler)
+Both paths evaluate the same parsed formula many times over the same environment.
+  deep : nested parentheses, ((x+1)*0.5+2)*0.5 ...
+  wide : a long chain 1 + x - y*2 * sin(x) + ...
+Usage: python benchmarks/bench_evaluator.py [repeat]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Vega_version'))
+sys.setrecursionlimit(100000)
+
+from lex import Lexer
+from parser import Parser
+from evaluator import Evaluator, compile_expr
+
+
+def deep_formula(depth):
+  source = 'x'
+  for i in range(depth):
+    source = f'({source}+{i % 7 + 1})*0.5'
+  return source
+
+def wide_formula(width):
+  terms = ['x', 'y*2', 'sin(x)', 'y/3', 'sqrt(y)']
+  ops = ['+', '-', '*', '+']
+  source = '1'
+  for i in range(width):
+    source += ops[i % len(ops)] + terms[i % len(terms)]
+  return source
+
+def timeit(func, repeat):
+  start = time.perf_counter()
+  for _ in range(repeat):
+    func()
+  return time.perf_counter() - start
+
+def bench(name, source, repeat):
+  expr = Parser().parse(Lexer().tokenize(source))[0]
+  env = {'x': 0.75, 'y': 2.0}
+
+  evaluator = Evaluator(env)
+  walk = timeit(lambda: expr.accept(evaluator), repeat)
+
+  compiled = compile_expr(expr)
+  closures = timeit(lambda: compiled(env), repeat)
+
+  assert expr.accept(evaluator) == compiled(env)
+  print(f'{name:<12} visitor {walk:8.4f}s   compiled {closures:8.4f}s   speedup x{walk / closures:5.1f}')
+
+
+if __name__ == '__main__':
+  repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+  bench('deep (50)', deep_formula(50), repeat)
+  bench('deep (200)', deep_formula(200), repeat // 4)
+  bench('wide (100)', wide_formula(100), repeat)
+  bench('wide (1000)', wide_formula(1000), repeat // 10)
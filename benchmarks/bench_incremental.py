@@ -0,0 +1,55 @@
+"""
+Benchmark: latency of a one-line edit in scripts of growing size
+  full        : Lexer.tokenize + Parser.parse of the whole edited script
+  incremental : IncrementalParser.edit_line, the statements around the line are parsed again
+Usage: python benchmarks/bench_incremental.py [edits] [lines ...]
+"""
+import gc
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Vega_version'))
+
+from lex import Lexer
+from parser import Parser
+from incremental import IncrementalParser
+
+
+def script(lines, rng):
+  terms = ['x', 'y', 'r', '2', 'PI', 'sqrt(x)', 'sin(y)', '(r+1)']
+  return '\n'.join(f'v{i} = ' + ' + '.join(rng.choice(terms) + rng.choice('*/') + rng.choice(terms) for _ in range(3))
+                   for i in range(lines))
+
+def timeit(edit, edits):
+  gc.collect()
+  gc.disable()
+  try:
+    start = time.perf_counter()
+    for number, text in edits:
+      edit(number, text)
+    return (time.perf_counter() - start) / len(edits)
+  finally:
+    gc.enable()
+
+
+if __name__ == '__main__':
+  count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+  sizes = [int(arg) for arg in sys.argv[2:]] or [100, 1000, 10000]
+  rng = random.Random(0)
+  for lines in sizes:
+    source = script(lines, rng)
+    edits = [(number, f'v{number} = x*{rng.randint(1, 99)} + y') for number in (rng.randrange(lines) for _ in range(count))]
+
+    lines_of = source.split('\n')
+    def full(number, text):
+      lines_of[number] = text
+      Parser().parse(Lexer().tokenize('\n'.join(lines_of)))
+
+    parser = IncrementalParser()
+    parser.load(source)
+    full_time = timeit(full, edits)
+    incremental_time = timeit(parser.edit_line, edits)
+    print(f'{lines:6} lines   full {full_time * 1e3:8.3f} ms   incremental {incremental_time * 1e3:8.3f} ms   '
+          f'x{full_time / incremental_time:7.1f}   ({parser.reparsed} statements parsed again)')
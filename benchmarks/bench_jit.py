@@ -0,0 +1,69 @@
+"""
+Benchmark: one formula evaluated in a tight loop, per evaluation
+  visitor     : Evaluator.run
+  closures    : compile_program (evaluator.Compiler)
+  jit program : jit_program, generated source, env dict -> list of values
+  jit lambda  : jit_expr, generated lambda with the variables as arguments
+  jit cache   : JitCache.run by source text, interpreted then promoted after the threshold
+  hand        : the same formula written by hand in Python
+Usage: python benchmarks/bench_jit.py [evaluations]
+"""
+import gc
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Vega_version'))
+
+from lex import Lexer
+from parser import Parser
+from evaluator import Evaluator, compile_program
+from jit import JitCache, jit_expr, jit_program
+
+formulas = [
+  ('sqrt(x*x + y*y)', lambda x, y: math.sqrt(x*x + y*y)),
+  ('atan(y/x)*DEG + x^2 % 7', lambda x, y: math.atan(y/x)*57.29577951308232 + math.fmod(math.pow(x, 2.0), 7.0)),
+  ('exp(-(x-y)*(x-y)/2)/sqrt(2*PI) + abs(sin(x)*cos(y))',
+   lambda x, y: math.exp(-(x-y)*(x-y)/2.0)/math.sqrt(2.0*math.pi) + math.fabs(math.sin(x)*math.cos(y))),
+]
+
+def timeit(function, count):
+  gc.collect()
+  gc.disable()
+  try:
+    best = float('inf')
+    for _ in range(3):
+      start = time.perf_counter()
+      function(count)
+      best = min(best, time.perf_counter() - start)
+    return best / count
+  finally:
+    gc.enable()
+
+
+if __name__ == '__main__':
+  count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+  envs = [{'x': 1.0 + i % 97 / 10, 'y': 0.5 + i % 89 / 10} for i in range(1000)]
+  for source, hand in formulas:
+    statements = Parser().parse(Lexer().tokenize(source))
+    closures = compile_program(statements)
+    program = jit_program(statements)
+    function = jit_expr(statements[0])
+    cache = JitCache(threshold = 100)
+    arguments = [tuple(env[name] for name in function.names) for env in envs]
+    points = [(env['x'], env['y']) for env in envs]
+    assert program(dict(envs[1])) == closures(dict(envs[1])) == [hand(**envs[1])]
+
+    runs = {
+      'visitor': lambda n: [Evaluator(envs[i % 1000]).run(statements) for i in range(n)],
+      'closures': lambda n: [closures(envs[i % 1000]) for i in range(n)],
+      'jit program': lambda n: [program(envs[i % 1000]) for i in range(n)],
+      'jit lambda': lambda n: [function(*arguments[i % 1000]) for i in range(n)],
+      'jit cache': lambda n: [cache.run(source, envs[i % 1000]) for i in range(n)],
+      'hand': lambda n: [hand(*points[i % 1000]) for i in range(n)],
+    }
+    print(source)
+    times = {name: timeit(run, count) for name, run in runs.items()}
+    for name, elapsed in times.items():
+      print(f'  {name:12} {elapsed * 1e9:8.0f} ns   x{times["visitor"] / elapsed:6.1f}')
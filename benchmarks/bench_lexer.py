@@ -0,0 +1,71 @@
+"""
+Benchmark: tokens per second of Lexer.tokenize
+  scanner : the former implementation, a re.Scanner built on every call with a lambda per token
+  master  : the current implementation, a master regex compiled once, dispatching on lastgroup
+  short : many calls with a small formula (the cost of building the scanner dominates)
+  long  : one call with a long script
+Usage: python benchmarks/bench_lexer.py [seconds]
+"""
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Vega_version'))
+
+from lex import Lexer, Token
+
+
+def classify(tok):
+  if tok in Lexer.constants:
+    return Token('CONST', tok)
+  elif tok in ['sin', 'cos', 'atan', 'log', 'log10', 'exp', 'sqrt', 'abs', 'int',]:
+    return Token('FUNC', tok)
+  else:
+    return Token('VAR', tok)
+
+scanner_rules = [
+  (r'\s+', None),
+  (r'[a-zA-Z_][a-zA-Z0-9_]*',     lambda s, tok: classify(tok)),
+  (r'\d+(\.\d+)?([Ee][+-]?\d+)?', lambda s, tok: Token('NUMBER', tok)),
+  (r'\^',                         lambda s, tok: Token('^', tok)),
+  (r'%',                          lambda s, tok: Token('%', tok)),
+  (r'\+',                         lambda s, tok: Token('+', tok)),
+  (r'-',                          lambda s, tok: Token('-', tok)),
+  (r'\*',                         lambda s, tok: Token('*', tok)),
+  (r'/',                          lambda s, tok: Token('/', tok)),
+  (r'\(',                         lambda s, tok: Token('(', tok)),
+  (r'\)',                         lambda s, tok: Token(')', tok)),
+  (r'=',                          lambda s, tok: Token('=', tok)),
+]
+
+def scanner_tokenize(data):
+  scanner = re.Scanner(scanner_rules)
+  results,_ = scanner.scan(data)
+  return iter(results)
+
+def master_tokenize(data, lexer = Lexer()):
+  return lexer.tokenize(data)
+
+def throughput(tokenize, data, seconds):
+  tokens = calls = 0
+  start = time.perf_counter()
+  while time.perf_counter() - start < seconds:
+    for _ in tokenize(data):
+      tokens += 1
+    calls += 1
+  return tokens / (time.perf_counter() - start)
+
+def bench(name, data, seconds):
+  assert [(t.type, t.value) for t in scanner_tokenize(data)] == [(t.type, t.value) for t in master_tokenize(data)]
+  old = throughput(scanner_tokenize, data, seconds)
+  new = throughput(master_tokenize, data, seconds)
+  print(f'{name:<8} scanner {old:12,.0f} tok/s   master {new:12,.0f} tok/s   x{new / old:4.1f}')
+
+
+if __name__ == '__main__':
+  seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+  short = 'x = 2*PI*r'
+  line = 'dist = sqrt(x1*x1 + y1*y1) * sin(theta) / 2.5e-3 % 7 ^ E\n'
+  bench('short', short, seconds)
+  bench('long', line * 10000, seconds)
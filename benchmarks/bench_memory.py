@@ -0,0 +1,81 @@
+"""
+Benchmark: memory per AST node and parse time of a large expression file
+The file holds one formula of about N nodes (a long chain of binary operators over
+numbers, variables and function calls). It is tokenized lazily with tokenize_stream.
+The parse is timed without tracing, then the memory of the tree is measured with
+tracemalloc on a second parse. The size of each class of node is given by sys.getsizeof.
+Usage: python benchmarks/bench_memory.py [nodes]
+"""
+from dataclasses import fields
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Vega_version'))
+
+from lex import Lexer, Token
+from parser import Parser
+from hoc_ast import Binary, Function, Node, Number, Unary, Variable
+
+
+def write_formula(path, nodes):
+  #Each term adds about 5 nodes: Binary + (Number | Variable | Unary Variable | Function Variable)
+  terms = ['1.5', 'x', '-y', 'sin(z)', 'alpha']
+  ops = ['+', '-', '*', '/']
+  with open(path, 'w') as f:
+    f.write('2')
+    for i in range(nodes // 2):
+      f.write(f' {ops[i % len(ops)]} {terms[i % len(terms)]}')
+      if i % 16 == 15:
+        f.write('\n')
+
+def count(node):
+  total = 0
+  stack = [node]
+  while stack:
+    node = stack.pop()
+    total += 1
+    for field in fields(node):
+      child = getattr(node, field.name)
+      if isinstance(child, Node):
+        stack.append(child)
+  return total
+
+def instance_size(obj):
+  size = sys.getsizeof(obj)
+  if hasattr(obj, '__dict__'):
+    size += sys.getsizeof(obj.__dict__)
+  return size
+
+
+if __name__ == '__main__':
+  nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+  print('bytes per instance')
+  for obj in [Token('NUMBER', '1'), Number(1.0), Variable('x'), Unary('-', Number(1.0)),
+              Binary('+', Number(1.0), Number(2.0)), Function('sin', Number(1.0))]:
+    print(f'  {type(obj).__name__:<10} {instance_size(obj):4d}')
+
+  with tempfile.TemporaryDirectory() as tmp:
+    path = os.path.join(tmp, 'formula.hoc')
+    write_formula(path, nodes)
+    size = os.path.getsize(path)
+
+    start = time.perf_counter()
+    with open(path) as f:
+      ast = Parser().parse(Lexer().tokenize_stream(f))
+    elapsed = time.perf_counter() - start
+    del ast
+
+    tracemalloc.start()
+    with open(path) as f:
+      ast = Parser().parse(Lexer().tokenize_stream(f))
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+  total = sum(count(stmt) for stmt in ast)
+  print(f'file {size / 2**20:.1f} MiB, {total:,} nodes')
+  print(f'parse time {elapsed:.2f}s ({total / elapsed:,.0f} nodes/s)')
+  print(f'tree {current / 2**20:.1f} MiB, {current / total:.1f} bytes per node (peak {peak / 2**20:.1f} MiB)')
@@ -0,0 +1,53 @@
+"""
+Benchmark: constant folding and simplification on a corpus of formulas
+Reports the nodes eliminated by the Optimizer and the time of evaluating the compiled
+formulas before and after the optimization.
+Usage: python benchmarks/bench_optimizer.py [corpus.hoc ...]
+Without files, a generated corpus is used (one formula per line).
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Vega_version'))
+
+from lex import Lexer
+from parser import Parser
+from evaluator import compile_expr
+from optimizer import Optimizer
+
+
+def generated_corpus(count, seed = 0):
+  rng = random.Random(seed)
+  constants = ['2', '0.5', 'PI', 'E', 'DEG', '(3+4)', 'sqrt(2)', '1', '0']
+  variables = ['x', 'y', 'r', 'theta']
+  for _ in range(count):
+    terms = [rng.choice(constants + variables) for _ in range(rng.randint(4, 16))]
+    ops = [rng.choice('+-*') for _ in terms]
+    yield 'f = ' + ''.join(op + term for op, term in zip(ops, terms))[1:]
+
+def timeit(funcs, env, repeat):
+  start = time.perf_counter()
+  for _ in range(repeat):
+    for func in funcs:
+      func(env)
+  return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+  if len(sys.argv) > 1:
+    lines = [line for path in sys.argv[1:] for line in open(path) if line.strip()]
+  else:
+    lines = list(generated_corpus(2000))
+
+  ast = [stmt for line in lines for stmt in Parser().parse(Lexer().tokenize(line))]
+  optimizer = Optimizer()
+  optimized = optimizer.run(ast)
+  print(f'{len(ast)} statements: {optimizer.nodes_before} nodes -> {optimizer.nodes_after} nodes '
+        f'({optimizer.eliminated} eliminated, {100 * optimizer.eliminated / optimizer.nodes_before:.1f}%)')
+
+  env = {'x': 0.5, 'y': 2.0, 'r': 3.0, 'theta': 0.25}
+  before = timeit([compile_expr(stmt) for stmt in ast], env, 50)
+  after = timeit([compile_expr(stmt) for stmt in optimized], env, 50)
+  print(f'compiled evaluation: {before:.3f}s -> {after:.3f}s (x{before / after:.2f})')
@@ -0,0 +1,60 @@
+"""
+Benchmark: scaling of the parallel evaluation from 1 to N worker processes
+  serial     : evaluate_batch in the main process
+  rows       : ParallelEvaluator.evaluate_rows, one formula over many rows
+  statements : ParallelEvaluator.evaluate_statements, many independent formulas
+The pool is started before the timings (a warm-up run), as a server or a batch job keeps it.
+Usage: python benchmarks/bench_parallel.py [workers] [rows]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Vega_version'))
+
+from lex import Lexer
+from parser import Parser
+from vectorized import evaluate_batch
+from parallel import ParallelEvaluator
+
+
+def best(function, repeat = 3):
+  times = []
+  for _ in range(repeat):
+    start = time.perf_counter()
+    function()
+    times.append(time.perf_counter() - start)
+  return min(times)
+
+def report(name, serial, workloads):
+  print(f'{name:10}  serial {serial * 1000:9.1f} ms')
+  for workers, elapsed in workloads:
+    speedup = serial / elapsed
+    print(f'{"":10}  {workers:2d} workers {elapsed * 1000:9.1f} ms   x{speedup:5.2f}   efficiency {speedup / workers:5.1%}')
+
+
+if __name__ == '__main__':
+  most = int(sys.argv[1]) if len(sys.argv) > 1 else os.cpu_count()
+  rows = int(sys.argv[2]) if len(sys.argv) > 2 else 2_000_000
+  counts = sorted({1, *(2 ** i for i in range(most.bit_length()) if 2 ** i <= most), most})
+  print(f'{os.cpu_count()} cores')
+
+  rng = np.random.default_rng(0)
+  columns = {'x': rng.random(rows) + 1, 'y': rng.random(rows), 't': rng.random(rows)}
+  parse = lambda source: Parser().parse(Lexer().tokenize(source))
+  formula = parse('r = sqrt(x*x + y*y)\na = atan(y/x)\nr*sin(a + t) + r*cos(a - t) + log(r)^2')
+  formulas = parse('\n'.join(f'f{i} = sqrt(x*{i} + y)*sin(t + {i}) + exp(-x/{i + 1})' for i in range(32)))
+  small = {name: column[:rows // 8] for name, column in columns.items()}
+
+  for name, statements, data, method in [('rows', formula, columns, 'evaluate_rows'),
+                                         ('statements', formulas, small, 'evaluate_statements')]:
+    serial = best(lambda: evaluate_batch(statements, data))
+    workloads = []
+    for workers in counts:
+      with ParallelEvaluator(workers) as evaluator:
+        run = getattr(evaluator, method)
+        run(statements, data)
+        workloads.append((workers, best(lambda: run(statements, data))))
+    report(name, serial, workloads)
@@ -0,0 +1,47 @@
+"""
+Benchmark: parse cache on a workload that repeats a few thousand formulas
+  uncached : Lexer.tokenize + Parser.parse for every request
+  cached   : ParseCache.parse, exact keys and whitespace-normalized keys
+Usage: python benchmarks/bench_parse_cache.py [requests] [formulas]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Vega_version'))
+
+from lex import Lexer
+from parser import Parser
+from parse_cache import ParseCache
+
+
+def workload(requests, formulas, seed = 0):
+  rng = random.Random(seed)
+  terms = ['x', 'y', 'r', '2', 'PI', 'sqrt(x)', 'sin(y)', '(r+1)']
+  corpus = ['f = ' + ' + '.join(rng.choice(terms) + rng.choice('*/') + rng.choice(terms) for _ in range(rng.randint(2, 8)))
+            for _ in range(formulas)]
+  #The same formula is sent with different spacing, as clients do
+  spacing = [' ', '  ', ' ']
+  return [rng.choice(spacing).join(rng.choice(corpus).split(' ')) for _ in range(requests)]
+
+def timeit(parse, sources):
+  start = time.perf_counter()
+  for source in sources:
+    parse(source)
+  return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+  requests = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+  formulas = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+  sources = workload(requests, formulas)
+
+  uncached = timeit(lambda source: Parser().parse(Lexer().tokenize(source)), sources)
+  print(f'uncached   {uncached * 1000:9.1f} ms')
+  for normalize in (False, True):
+    cache = ParseCache(maxsize = 4096, normalize = normalize)
+    elapsed = timeit(cache.parse, sources)
+    stats = cache.stats()
+    print(f'{"normalized" if normalize else "exact":10} {elapsed * 1000:9.1f} ms   x{uncached / elapsed:5.1f}   '
+          f'hits {stats["hits"]} misses {stats["misses"]} evictions {stats["evictions"]}')
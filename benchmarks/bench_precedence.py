@@ -0,0 +1,98 @@
+"""
+Benchmark: precedence climbing vs the former left-to-right expression parser
+  legacy      : the former Parser.expr, one loop over + - * / % with a chain of _accept
+                calls per operator and no precedence (kept here as LegacyParser)
+  climbing    : Parser.expr, one BINDING_POWER lookup per operator
+  stack       : StackParser.expr, the same table without recursion
+The inputs are long operator chains; the tokens are built once, only the parsing is timed
+(best of 7 runs).
+Usage: python benchmarks/bench_precedence.py [operators]
+"""
+import gc
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Vega_version'))
+
+from lex import Lexer
+from parser import Parser, StackParser
+
+
+class LegacyParser(Parser):
+
+  def expr(self):
+    left = self.factor()
+    if self._accept('^'):
+      exp = self.expr()
+      left = self.factory.exponentiation(left, exp)
+    while self._accept('+') or self._accept('-') or self._accept('*') or self._accept('/') or self._accept('%'):
+      oper = self.tok.value
+      rigth = self.factor()
+      if oper == '/' and self.factory.is_zero(rigth):
+        raise ValueError("Division by zero")
+      left = self.factory.binary(oper, left, rigth)
+    return left
+
+  def factor(self):
+    if self._accept('+') or self._accept('-'):
+      oper = self.tok.value
+      operand = self.factor()
+      return self.factory.unary(oper, operand)
+    elif self._accept('NUMBER'):
+      return self.factory.number(float(self.tok.value))
+    elif self._accept('CONST'):
+      return self.factory.number(Lexer.constants[self.tok.value])
+    elif self._accept('FUNC'):
+      func = self.tok.value
+      self._expect('(')
+      expr = self.expr()
+      self._expect(')')
+      return self.factory.function(func, expr)
+    elif self._accept('VAR'):
+      return self.factory.variable(self.tok.value)
+    elif self._accept('('):
+      expr = self.expr()
+      self._expect(')')
+      return self.factory.parentheses(expr)
+    else:
+      raise SyntaxError(f"Expected NUMBER, VAR, FUNC, CONST or '(' but got {self.next_tok.type}")
+
+  def statement(self):
+    if self._accept('VAR'):
+      var = self.factory.variable(self.tok.value)
+      if self.next_tok and self.next_tok.type == '=':
+        return self.assignment(var)
+      return var
+    return self.expr()
+
+
+def chain(operators, ops, seed = 0):
+  rng = random.Random(seed)
+  terms = ['x', 'y', '2', '0.5', '(x - 1)']
+  return 'f = ' + rng.choice(terms) + ''.join(f' {rng.choice(ops)} {rng.choice(terms)}' for _ in range(operators))
+
+def timeit(cls, tokens, repeat):
+  #Best of repeat runs, without the collector (the trees are large)
+  best = float('inf')
+  gc.disable()
+  try:
+    for _ in range(repeat):
+      start = time.perf_counter()
+      cls().parse(iter(tokens))
+      best = min(best, time.perf_counter() - start)
+  finally:
+    gc.enable()
+  return best
+
+
+if __name__ == '__main__':
+  operators = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+  for ops in ('+', '+-', '+-*/%'):
+    tokens = list(Lexer().tokenize(chain(operators, ops)))
+    times = {name: timeit(cls, tokens, 7) for name, cls in
+             (('legacy', LegacyParser), ('climbing', Parser), ('stack', StackParser))}
+    print(f'{operators} operators {ops:6} ' + '   '.join(
+      f'{name} {elapsed * 1000:7.1f} ms' + (f' (x{times["legacy"] / elapsed:.2f})' if name != 'legacy' else '')
+      for name, elapsed in times.items()))
@@ -0,0 +1,53 @@
+"""
+Benchmark: the cost of profiling, per program (lex, parse and evaluate)
+  plain          : Lexer, Parser and Evaluator, as without the profiling module
+  stages         : Profiler.run, the three stages timed
+  stages + nodes : Profiler.run with nodes = True, every node evaluated is timed
+Usage: python benchmarks/bench_profiling.py [formulas] [runs]
+"""
+import gc
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Vega_version'))
+
+from lex import Lexer
+from parser import Parser
+from evaluator import Evaluator
+from profiling import Profiler
+
+def program(formulas):
+  lines = ['r = sqrt(x*x + y*y)', 'theta = atan(y/x)']
+  lines += [f'r*sin(theta + {i})^2 + log(r + {i + 1}) % 3 + exp(-r/{i + 1})' for i in range(formulas)]
+  return '\n'.join(lines)
+
+def timeit(function, runs):
+  gc.collect()
+  gc.disable()
+  try:
+    best = float('inf')
+    for _ in range(runs):
+      start = time.perf_counter()
+      function()
+      best = min(best, time.perf_counter() - start)
+    return best
+  finally:
+    gc.enable()
+
+
+if __name__ == '__main__':
+  formulas = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+  runs = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+  source = program(formulas)
+  env = {'x': 3.0, 'y': 4.0}
+
+  runs_of = {
+    'plain': lambda: Evaluator(dict(env)).run(Parser().parse(Lexer().tokenize(source))),
+    'stages': lambda: Profiler().run(source, dict(env)),
+    'stages + nodes': lambda: Profiler().run(source, dict(env), nodes = True),
+  }
+  assert runs_of['plain']() == runs_of['stages']()[1] == runs_of['stages + nodes']()[1]
+  times = {name: timeit(run, runs) for name, run in runs_of.items()}
+  for name, elapsed in times.items():
+    print(f'{name:15} {elapsed * 1000:8.2f} ms   x{elapsed / times["plain"]:5.2f}')
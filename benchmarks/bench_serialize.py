@@ -0,0 +1,49 @@
+"""
+Benchmark: shipping parsed formulas, binary AST format vs pickle vs re-parsing
+For a corpus of formulas, reports the size of each encoding and the time to encode and
+to decode it. The binary format is also evaluated in place (BinaryAst.evaluate), without
+building the tree.
+Usage: python benchmarks/bench_serialize.py [formulas]
+"""
+import os
+import pickle
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Vega_version'))
+
+from lex import Lexer
+from parser import Parser
+from evaluator import Evaluator
+from serialize import dumps, loads, BinaryAst
+from bench_optimizer import generated_corpus
+
+
+def timeit(func, *args):
+  start = time.perf_counter()
+  result = func(*args)
+  return result, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+  count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+  source = '\n'.join(generated_corpus(count))
+  ast, parse = timeit(lambda: Parser().parse(Lexer().tokenize(source)))
+
+  data, encode = timeit(dumps, ast)
+  decoded, decode = timeit(loads, data)
+  assert decoded == ast
+  pickled, pickle_encode = timeit(pickle.dumps, ast)
+  unpickled, pickle_decode = timeit(pickle.loads, pickled)
+  assert unpickled == ast
+
+  print(f'{count} formulas')
+  print(f'source  {len(source) / 1024:8.1f} KiB                    parse  {parse * 1000:7.1f} ms')
+  print(f'binary  {len(data) / 1024:8.1f} KiB   encode {encode * 1000:7.1f} ms   decode {decode * 1000:7.1f} ms')
+  print(f'pickle  {len(pickled) / 1024:8.1f} KiB   encode {pickle_encode * 1000:7.1f} ms   decode {pickle_decode * 1000:7.1f} ms')
+
+  env = {'x': 0.5, 'y': 2.0, 'r': 3.0, 'theta': 0.25}
+  expected, walk = timeit(Evaluator(dict(env)).run, ast)
+  values, in_place = timeit(BinaryAst(data).evaluate, dict(env))
+  assert values == expected
+  print(f'evaluate: tree {walk * 1000:7.1f} ms   in place {in_place * 1000:7.1f} ms')
@@ -0,0 +1,62 @@
+"""
+Benchmark: the evaluation server on localhost, with and without coalescing
+  unbatched : max_batch = 1, every request is parsed (cached) and evaluated alone
+  batched   : the requests of a batch with the same formula are evaluated together
+Each client pipelines its requests on one connection and reads the replies as they come.
+Usage: python benchmarks/bench_server.py [clients] [requests per client] [formulas]
+"""
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Vega_version'))
+
+from server import HocServer
+
+
+def workload(clients, requests, formulas, seed = 0):
+  rng = random.Random(seed)
+  corpus = [f'r = sqrt(x*x + y*y)\nr*sin(t + {i}) + log(r + {i + 1})' for i in range(formulas)]
+  return [[json.dumps({'id': n, 'formula': rng.choice(corpus),
+                       'env': {'x': rng.random(), 'y': rng.random(), 't': rng.random()}}).encode() + b'\n'
+           for n in range(requests)] for _ in range(clients)]
+
+async def client(address, lines):
+  reader, writer = await asyncio.open_connection(*address)
+  async def send():
+    for line in lines:
+      writer.write(line)
+      await writer.drain()
+  sending = asyncio.create_task(send())
+  replies = [json.loads(await reader.readline()) for _ in lines]
+  await sending
+  writer.close()
+  return replies
+
+async def run(server, load):
+  address = await server.start()
+  async with server:
+    start = time.perf_counter()
+    results = await asyncio.gather(*(client(address, lines) for lines in load))
+    elapsed = time.perf_counter() - start
+  assert all(reply['id'] == n and 'values' in reply for replies in results for n, reply in enumerate(replies))
+  return elapsed
+
+
+if __name__ == '__main__':
+  clients = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+  requests = int(sys.argv[2]) if len(sys.argv) > 2 else 400
+  formulas = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+  load = workload(clients, requests, formulas)
+  total = clients * requests
+
+  for name, server in [('unbatched', HocServer(max_batch = 1, inflight = 64)),
+                       ('batched', HocServer(inflight = 64))]:
+    elapsed = asyncio.run(run(server, load))
+    stats = server.stats()
+    latency = stats['latency']
+    print(f'{name:9}  {total / elapsed:9.0f} req/s   p50 {latency["p50"] * 1000:7.2f} ms   p99 {latency["p99"] * 1000:7.2f} ms   '
+          f'batches {stats["batches"]} groups {stats["groups"]} coalesced {stats["coalesced"]}')
@@ -0,0 +1,269 @@
+"""
+Benchmark suite: Lexer.tokenize, Parser.parse and the evaluation of every stage, on generated workloads
+Workloads (each one runs on the stages whose grammar has its constructs):
+  chain        : long lines of binary operators over numbers                  stage1+
+  nesting      : lines of deeply nested parentheses                           stage1+
+  assignments  : many assignments between one-letter variables               stage2+
+  identifiers  : assignments between long identifiers                         stage3+
+  functions    : calls of the builtin functions                               stage3+
+  file         : a multi-MB file of chains, read with tokenize_stream          stage1+
+Phases:
+  lex      : Lexer.tokenize to a list of tokens (file: tokenize_stream over the file)
+  parse    : Parser.parse of the tokens (file: iterparse over tokenize_stream, lexing included)
+  evaluate : Evaluator.run of the statements                       (Vega_version only, the
+  compiled : the function of compile_program, compiled beforehand   other stages have no evaluator)
+Each phase is timed (best of repeat, gc disabled), then run once more under tracemalloc for
+its peak memory. The stages have modules of the same names (lex, parser), each stage is
+measured in its own process. The results are written as JSON with the commit they were
+measured on; --compare gives the ratio of each time to a previous result file.
+Every expression of the workloads starts with a number: the parser of stage2 takes an
+expression that starts with a variable for the variable alone.
+Usage: python benchmarks/bench_suite.py [--stages stage1,stage2,stage3,Vega_version] [--scale 1]
+         [--repeat 3] [--file-mb 2] [--output path.json] [--compare previous.json] [--threshold 0.1]
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+root = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+#The constructs of the grammar of each stage
+stages = {
+  'stage1': set(),
+  'stage2': {'variables'},
+  'stage3': {'variables', 'identifiers', 'functions'},
+  'Vega_version': {'variables', 'identifiers', 'functions', 'evaluate'},
+}
+
+#Workloads-------------------------------------------------------
+
+def number(rng):
+  return f'{rng.uniform(1, 100):.3f}'
+
+def chain(size, rng, width = 32):
+  operators = '+-*/'
+  lines = []
+  for _ in range(max(size // width, 1)):
+    lines.append(number(rng) + ''.join(f' {rng.choice(operators)} {number(rng)}' for _ in range(width)))
+  return '\n'.join(lines) + '\n'
+
+def nesting(size, rng, depth = 64):
+  operators = '+-*/'
+  lines = []
+  for _ in range(max(size // depth, 1)):
+    lines.append('(' * depth + number(rng) + ''.join(f' {rng.choice(operators)} {number(rng)})' for _ in range(depth)))
+  return '\n'.join(lines) + '\n'
+
+def assignments(size, rng):
+  letters = 'abcdefghijklmnopqrstuvwxyz'
+  lines = [f'{letter} = {number(rng)}' for letter in letters]
+  for _ in range(size):
+    target, a, b, c = (rng.choice(letters) for _ in range(4))
+    lines.append(f'{target} = 0.5 * {a} + {b} / 2 - 0.25 * {c}')
+  return '\n'.join(lines) + '\n'
+
+def identifiers(size, rng):
+  words = ['velocity', 'pressure', 'temperature', 'density', 'viscosity', 'heat_capacity', 'flow_rate']
+  names = [f'{word}_{index}' for word in words for index in range(10)]
+  lines = [f'{name} = {number(rng)}' for name in names]
+  for _ in range(size):
+    target, a, b, c = (rng.choice(names) for _ in range(4))
+    lines.append(f'{target} = 0.5 * {a} + {b} / 3 - 0.125 * {c}')
+  return '\n'.join(lines) + '\n'
+
+def functions(size, rng):
+  calls = ['sin({})', 'cos({})', 'atan({})', 'exp(0 - abs({}))', 'sqrt(abs({}))', 'log(1 + abs({}))',
+           'log10(2 + abs({}))', 'abs({})', 'int({})']
+  names = ['x', 'y', 'z', 'w']
+  lines = [f'{name} = {number(rng)}' for name in names]
+  for _ in range(size):
+    terms = [rng.choice(calls).format(rng.choice(names)) for _ in range(4)]
+    lines.append(f'{rng.choice(names)} = 0.5 * {terms[0]} + {terms[1]} * {terms[2]} - {terms[3]}')
+  return '\n'.join(lines) + '\n'
+
+#Name -> (generator, constructs needed, size at scale 1)
+workloads = {
+  'chain': (chain, set(), 50_000),
+  'nesting': (nesting, set(), 10_000),
+  'assignments': (assignments, {'variables'}, 5_000),
+  'identifiers': (identifiers, {'identifiers'}, 5_000),
+  'functions': (functions, {'functions'}, 2_000),
+}
+
+def write_file(path, megabytes, rng):
+  with open(path, 'w') as file:
+    written = 0
+    while written < megabytes * 1_000_000:
+      written += file.write(chain(3200, rng))
+  return written
+
+#Measures--------------------------------------------------------
+
+def measure(function, repeat):
+  """
+  The best time of repeat calls, the peak of the memory allocated by one more call (bytes)
+  and its result
+  """
+  gc.collect()
+  gc.disable()
+  try:
+    best = float('inf')
+    for _ in range(repeat):
+      result = None
+      start = time.perf_counter()
+      result = function()
+      best = min(best, time.perf_counter() - start)
+  finally:
+    gc.enable()
+  result = None
+  gc.collect()
+  tracemalloc.start()
+  try:
+    result = function()
+    peak = tracemalloc.get_traced_memory()[1]
+  finally:
+    tracemalloc.stop()
+  return best, peak, result
+
+def entry(stage, workload, phase, size, tokens, statements, seconds, peak):
+  return {'stage': stage, 'workload': workload, 'phase': phase, 'bytes': size, 'tokens': tokens,
+          'statements': statements, 'seconds': seconds, 'mb_per_s': size / seconds / 1e6,
+          'tokens_per_s': tokens / seconds, 'peak_bytes': peak}
+
+def run_stage(stage, scale, repeat, file_mb, seed = 0):
+  """
+  Measures the phases of the workloads of a stage, in this process
+  """
+  sys.path.insert(0, os.path.join(root, stage))
+  from lex import Lexer
+  from parser import Parser
+  if 'evaluate' in stages[stage]:
+    from evaluator import Evaluator, compile_program
+  sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+
+  results = []
+  for name, (generate, needs, size) in workloads.items():
+    if not needs <= stages[stage]:
+      continue
+    source = generate(int(size * scale), random.Random(seed))
+    lex_time, lex_peak, tokens = measure(lambda: list(Lexer().tokenize(source)), repeat)
+    parse_time, parse_peak, statements = measure(lambda: Parser().parse(iter(tokens)), repeat)
+    counts = (len(source), len(tokens), len(statements))
+    results.append(entry(stage, name, 'lex', *counts, lex_time, lex_peak))
+    results.append(entry(stage, name, 'parse', *counts, parse_time, parse_peak))
+    if 'evaluate' in stages[stage]:
+      seconds, peak, _ = measure(lambda: Evaluator({}).run(statements), repeat)
+      results.append(entry(stage, name, 'evaluate', *counts, seconds, peak))
+      program = compile_program(statements)
+      seconds, peak, _ = measure(lambda: program({}), repeat)
+      results.append(entry(stage, name, 'compiled', *counts, seconds, peak))
+    del tokens, statements
+
+  with tempfile.TemporaryDirectory() as directory:
+    path = os.path.join(directory, 'workload.hoc')
+    size = write_file(path, file_mb, random.Random(seed))
+
+    def lex():
+      with open(path) as file:
+        return sum(1 for _ in Lexer().tokenize_stream(file))
+
+    def parse():
+      with open(path) as file:
+        return sum(1 for _ in Parser().iterparse(Lexer().tokenize_stream(file)))
+
+    lex_time, lex_peak, tokens = measure(lex, repeat)
+    parse_time, parse_peak, statements = measure(parse, repeat)
+    results.append(entry(stage, 'file', 'lex', size, tokens, statements, lex_time, lex_peak))
+    results.append(entry(stage, 'file', 'parse', size, tokens, statements, parse_time, parse_peak))
+  return results
+
+#Runs and reports------------------------------------------------
+
+def git(*args):
+  try:
+    return subprocess.run(['git', *args], cwd = root, capture_output = True, text = True, check = True).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+def run_suite(names, scale, repeat, file_mb):
+  results = []
+  for stage in names:
+    with tempfile.NamedTemporaryFile(suffix = '.json') as output:
+      command = [sys.executable, os.path.abspath(__file__), '--worker', stage, '--scale', str(scale),
+                 '--repeat', str(repeat), '--file-mb', str(file_mb), '--output', output.name]
+      subprocess.run(command, check = True)
+      with open(output.name) as file:
+        results.extend(json.load(file))
+  return {
+    'commit': git('rev-parse', 'HEAD'),
+    'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+    'date': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec = 'seconds'),
+    'python': platform.python_version(),
+    'platform': platform.platform(),
+    'scale': scale,
+    'repeat': repeat,
+    'file_mb': file_mb,
+    'results': results,
+  }
+
+def report(results, previous = None, threshold = 0.1):
+  before = {(r['stage'], r['workload'], r['phase']): r for r in previous['results']} if previous else {}
+  regressions = 0
+  print(f'{"stage":13} {"workload":12} {"phase":9} {"ms":>9} {"MB/s":>8} {"Mtok/s":>7} {"peak MB":>8}' +
+        ('   vs before' if previous else ''))
+  for r in results:
+    line = (f'{r["stage"]:13} {r["workload"]:12} {r["phase"]:9} {r["seconds"] * 1000:9.1f} {r["mb_per_s"]:8.2f} '
+            f'{r["tokens_per_s"] / 1e6:7.3f} {r["peak_bytes"] / 1e6:8.2f}')
+    old = before.get((r['stage'], r['workload'], r['phase']))
+    if old is not None:
+      ratio = r['seconds'] / old['seconds']
+      flag = '  slower' if ratio > 1 + threshold else ('  faster' if ratio < 1 - threshold else '')
+      regressions += flag == '  slower'
+      line += f'   x{ratio:5.2f} time x{r["peak_bytes"] / max(old["peak_bytes"], 1):5.2f} memory{flag}'
+    print(line)
+  if previous:
+    print(f'{regressions} slower by more than {threshold:.0%} than {previous.get("commit") or "the previous run"}')
+  return regressions
+
+
+if __name__ == '__main__':
+  arguments = argparse.ArgumentParser(description = 'Benchmark suite of the lexers, parsers and evaluators')
+  arguments.add_argument('--stages', default = ','.join(stages))
+  arguments.add_argument('--scale', type = float, default = 1.0, help = 'multiplies the size of the workloads')
+  arguments.add_argument('--repeat', type = int, default = 3)
+  arguments.add_argument('--file-mb', type = float, default = 2.0, help = 'size of the file workload')
+  arguments.add_argument('--output', help = 'the JSON results (default: benchmarks/results/<commit>.json)')
+  arguments.add_argument('--compare', help = 'a previous JSON result to compare with')
+  arguments.add_argument('--threshold', type = float, default = 0.1, help = 'the change of time reported')
+  arguments.add_argument('--worker', help = argparse.SUPPRESS) #Measures one stage, in a process of its own
+  options = arguments.parse_args()
+
+  if options.worker:
+    with open(options.output, 'w') as file:
+      json.dump(run_stage(options.worker, options.scale, options.repeat, options.file_mb), file)
+    sys.exit()
+
+  names = options.stages.split(',')
+  for name in names:
+    if name not in stages:
+      arguments.error(f'unknown stage {name}, the stages are {", ".join(stages)}')
+  previous = None
+  if options.compare:
+    with open(options.compare) as file:
+      previous = json.load(file)
+  suite = run_suite(names, options.scale, options.repeat, options.file_mb)
+  output = options.output or os.path.join(root, 'benchmarks', 'results', f'{(suite["commit"] or "unknown")[:12]}.json')
+  os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok = True)
+  with open(output, 'w') as file:
+    json.dump(suite, file, indent = 1)
+  report(suite['results'], previous, options.threshold)
+  print(f'Results written to {output}')
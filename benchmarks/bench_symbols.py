@@ -0,0 +1,56 @@
+"""
+Benchmark: variable references, dict environment against slots
+  dict  : compile_program of the parsed statements, the variables are read from a dict by name
+  slots : compile_program of the statements resolved by a SymbolTable, read from a list by index
+Usage: python benchmarks/bench_symbols.py [runs] [formulas]
+"""
+import gc
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Vega_version'))
+
+from lex import Lexer
+from parser import Parser
+from evaluator import compile_program
+from symbols import SymbolTable
+
+
+def source(formulas, rng):
+  names = [f'v{i}' for i in range(20)]
+  lines = [f'{name} = {rng.randint(1, 9)}' for name in names]
+  for _ in range(formulas):
+    terms = ' + '.join(f'{rng.choice(names)}*{rng.choice(names)}' for _ in range(rng.randint(2, 6)))
+    lines.append(f'{rng.choice(names)} = ({terms}) / 1000')
+  return '\n'.join(lines)
+
+def timeit(program, env, runs):
+  gc.collect()
+  gc.disable()
+  try:
+    best = float('inf')
+    for _ in range(5):
+      start = time.perf_counter()
+      for _ in range(runs):
+        program(env)
+      best = min(best, time.perf_counter() - start)
+    return best
+  finally:
+    gc.enable()
+
+
+if __name__ == '__main__':
+  runs = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+  formulas = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+  statements = Parser().parse(Lexer().tokenize(source(formulas, random.Random(0))))
+  table = SymbolTable()
+  resolved = table.resolve_all(statements)
+
+  env = {}
+  by_name = timeit(compile_program(statements), env, runs)
+  by_slot = timeit(compile_program(resolved), table.values, runs)
+  assert table.dump() == env
+  print(f'dict  {by_name * 1000:9.1f} ms')
+  print(f'slots {by_slot * 1000:9.1f} ms   x{by_name / by_slot:5.2f}')
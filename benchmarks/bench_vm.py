@@ -0,0 +1,51 @@
+"""
+Benchmark: bytecode VM vs tree walking on long assignment-heavy scripts
+  visitor  : Evaluator, the visitor walks the tree of every statement
+  closures : compile_program, the statements lowered to closures
+  vm       : compile_bytecode, the register machine
+The compilation is done once, only the runs are timed.
+Usage: python benchmarks/bench_vm.py [statements]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Vega_version'))
+
+from lex import Lexer
+from parser import Parser
+from evaluator import Evaluator, compile_program
+from vm import compile_bytecode
+
+
+def script(statements):
+  lines = ['v0 = 1.5', 'v1 = 2.5']
+  for i in range(2, statements):
+    a, b = f'v{i - 1}', f'v{i - 2}'
+    lines.append([f'v{i} = {a}*0.5 + {b}/3 - 1',
+                  f'v{i} = sqrt(abs({a})) + {b}*{b}/100',
+                  f'v{i} = ({a} - {b}) % 7 + sin({a})'][i % 3])
+  return '\n'.join(lines)
+
+def timeit(func, repeat):
+  start = time.perf_counter()
+  for _ in range(repeat):
+    func()
+  return (time.perf_counter() - start) / repeat
+
+
+if __name__ == '__main__':
+  statements = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+  ast = Parser().parse(Lexer().tokenize(script(statements)))
+
+  program = compile_bytecode(ast)
+  closures = compile_program(ast)
+  assert Evaluator().run(ast) == program.run() == closures({})
+
+  visitor = timeit(lambda: Evaluator().run(ast), 3)
+  compiled = timeit(lambda: closures({}), 10)
+  vm = timeit(lambda: program.run(), 10)
+  print(f'{statements} statements, {len(program.code) // 4} instructions')
+  print(f'visitor  {visitor * 1000:8.2f} ms')
+  print(f'closures {compiled * 1000:8.2f} ms   x{visitor / compiled:.1f}')
+  print(f'vm       {vm * 1000:8.2f} ms   x{visitor / vm:.1f}')
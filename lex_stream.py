@@ -0,0 +1,43 @@
+"""
+Helpers of Lexer.tokenize_stream, shared by the lexers of every stage
+A chunk of input is scanned up to a cut: the end of its longest prefix that is tokenized as in
+the whole input, whatever the input that follows. The rest of the chunk waits for the next one.
+"""
+
+#The characters of the tokens of several characters (ID, VAR and NUMBER)
+token_chars = frozenset('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_.')
+
+def separator(data, i):
+  """
+  True if no token goes over data[i]: a character that cannot be inside a token, or a sign
+  that cannot be the sign of an exponent (the e or E before it does not follow a digit or a '.')
+  """
+  char = data[i]
+  if char in '+-':
+    return not (i > 1 and data[i - 1] in 'eE' and (data[i - 2].isdigit() or data[i - 2] == '.'))
+  return char not in token_chars and not char.isdigit() #\d matches the digits of every script
+
+def cut(data, master):
+  """
+  The end of the longest prefix of data that is tokenized as in the whole input. Data starts at
+  a token. The tokens are scanned with the master regex of the lexer from the last separator:
+  a token that ends 3 characters or more before the end of data is complete (a NUMBER looks at
+  most 2 characters after its end, the e+ of an exponent), the tail after it is at most a token
+  and 2 characters
+  """
+  end = len(data)
+  start = end
+  while start and not separator(data, start - 1):
+    start -= 1
+  for match in master.finditer(data, start):
+    if match.end() > end - 3:
+      break
+    start = match.end()
+  return start
+
+def read_chunks(stream, chunk_size):
+  while True:
+    chunk = stream.read(chunk_size)
+    if not chunk:
+      return
+    yield chunk
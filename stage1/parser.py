@@ -18,6 +18,7 @@ Methods:
   factor : Parse a factor
   list : Parse a list of expressions
   parse : Parse the tokens
+  iterparse : Parse the tokens lazily, one statement at a time
 
 """
 @dataclass
@@ -96,6 +97,18 @@ class Parser:
     self.tokens = tokens
     self._advance()
     return self.list()
+  
+  def iterparse(self, tokens):
+    """
+    Parses the tokens lazily and yields the statements one by one,
+    so a statement is available as soon as its tokens have arrived
+    """
+    self.tok = None
+    self.next_tok = None
+    self.tokens = iter(tokens)
+    self._advance()
+    while self.next_tok is not None:
+      yield self.expr()
     
   
   
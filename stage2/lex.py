@@ -2,7 +2,15 @@ from dataclasses import dataclass
 from rich import print
 import sly
 
+import os
 import re
+import sys
+
+#The helpers of tokenize_stream are shared by the stages, at the root of the repository
+_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _root not in sys.path:
+  sys.path.append(_root)
+from lex_stream import cut as _cut, read_chunks as _read_chunks
 
 """
 Token class
@@ -11,7 +19,7 @@ Attributes:
   value : str. The value of the token
   lineo : int. The line of the token
 """
-@dataclass
+@dataclass(slots = True)
 class Token:
   type: str
   value: str
@@ -21,29 +29,79 @@ class Token:
 Lexer class
 Inherits from sly.Lexer
 Attributes:
-  tokens : list. The tokens
+  tokens : list. The rules (name of the group, pattern), in order of priority
+  types : dict. The type of the token produced by each group
+  master : Pattern. The rules compiled once in a single regex with a named group per rule
 Methods:
   tokenize : Tokenize the input data
+  tokenize_stream : Tokenize lazily a text stream, chunk by chunk
 """ 
 class Lexer(sly.Lexer):
   # Set of token names. This is always required
-  # List of regular expression rules. (name, pattern)
+  # List of regular expression rules. (name of the group, pattern)
   tokens = [
-    (r'\s+', None),
-    (r'[a-z]',                      lambda s, tok: Token('VAR', tok)),  
-    (r'\d+(\.\d+)?([Ee][+-]?\d+)?', lambda s, tok: Token('NUMBER', tok)),
-    (r'%',                          lambda s, tok: Token('%', tok)),
-    (r'\+',                         lambda s, tok: Token('+', tok)),
-    (r'-',                          lambda s, tok: Token('-', tok)),
-    (r'\*',                         lambda s, tok: Token('*', tok)),
-    (r'/',                          lambda s, tok: Token('/', tok)),
-    (r'\(',                         lambda s, tok: Token('(', tok)),
-    (r'\)',                         lambda s, tok: Token(')', tok)),
-    (r'=',                          lambda s, tok: Token('=', tok)),
-    (r'.',                          lambda s, tok: print(f"Illegal Character: '{tok}'")),
+    ('ignore',  r'\s+'),
+    ('VAR',     r'[a-z]'),
+    ('NUMBER',  r'\d+(?:\.\d+)?(?:[Ee][+-]?\d+)?'),
+    ('MOD',     r'%'),
+    ('PLUS',    r'\+'),
+    ('MINUS',   r'-'),
+    ('TIMES',   r'\*'),
+    ('DIVIDE',  r'/'),
+    ('LPAREN',  r'\('),
+    ('RPAREN',  r'\)'),
+    ('ASSIGN',  r'='),
+    ('ILLEGAL', r'.'),
   ]
   
+  types = {
+    'NUMBER': 'NUMBER',
+    'MOD': '%',
+    'PLUS': '+',
+    'MINUS': '-',
+    'TIMES': '*',
+    'DIVIDE': '/',
+    'LPAREN': '(',
+    'RPAREN': ')',
+    'ASSIGN': '=',
+  }
+  
   def tokenize(self,data):
-    scanner = re.Scanner(self.tokens) # The scanner method from re module is used to tokenize the input data
-    results,_ = scanner.scan(data) # The scan method returns a tuple with the tokens and the remaining data
-    return iter(results)
\ No newline at end of file
+    return self._scan(data)
+  
+  def _scan(self, data):
+    types = self.types
+    for match in self.master.finditer(data):
+      kind = match.lastgroup
+      if kind == 'ignore':
+        continue
+      if kind == 'NUMBER':
+        yield Token('NUMBER', match.group())
+      elif kind in types:
+        tok_type = types[kind]
+        yield Token(tok_type, tok_type) #The operators share the type string as value
+      elif kind == 'VAR':
+        yield Token('VAR', sys.intern(match.group())) #The names are interned, all the nodes of a variable share one string
+      else:
+        print(f"Illegal Character: '{match.group()}'")
+  
+  def tokenize_stream(self, stream, chunk_size = 65536):
+    """
+    Tokenizes a text file object (or an iterable of text chunks) lazily, yields the tokens one by one.
+    Only the current chunk is kept in memory. The data up to its cut (lex_stream.cut) is scanned
+    exactly as in the whole input. The tail after it may be a token that continues in the next
+    chunk, so it waits for more data: the tail is at most a token and 2 characters, whatever
+    the input.
+    """
+    chunks = _read_chunks(stream, chunk_size) if hasattr(stream, 'read') else stream
+    pending = ''
+    for chunk in chunks:
+      data = pending + chunk
+      end = _cut(data, self.master)
+      yield from self._scan(data[:end])
+      pending = data[end:]
+    yield from self._scan(pending)
+
+# All the rules in one regex, compiled once for the class. The group that matched (lastgroup) gives the rule.
+# It is set after the class body because sly.Lexer would take a compiled pattern for a token rule
+Lexer.master = re.compile('|'.join(f'(?P<{name}>{pattern})' for name, pattern in Lexer.tokens))
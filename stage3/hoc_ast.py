@@ -1,5 +1,5 @@
 from __future__ import annotations
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Union 
 from rich import print
 from multimethod import multimeta
@@ -46,8 +46,9 @@ Methods:
 
 Note: The accept method is an abstract method that must be implemented in the subclasses of the Node class.
 The visit methhod belongs to the visitor class because it is a multimethod.
+The nodes are slotted dataclasses (no __dict__ per instance), so they must stay slotted in the subclasses.
 """
-@dataclass
+@dataclass(slots = True)
 class Node:
   def accept(self, v: Visitor):
     return v.visit(self) 
@@ -58,7 +59,7 @@ Inherits from Node
 
 An abstract class
 """
-@dataclass
+@dataclass(slots = True)
 class Expression (Node):
   pass
 
@@ -68,12 +69,12 @@ Inherits from Expression
 Attributes:
   name : str. The name of the variable
 """
-@dataclass
+@dataclass(slots = True)
 class Variable (Expression):
   name: str
 
 
-@dataclass
+@dataclass(slots = True)
 class Assignment (Expression):
   var: Variable
   expr: Expression 
@@ -87,7 +88,7 @@ Attributes:
   name : str. The name of the function
   expr : Expression. The expression of the function
 """
-@dataclass
+@dataclass(slots = True)
 class Function (Expression):
   name: str
   expr: Expression
@@ -99,7 +100,7 @@ Attributes:
   base : Expression. The base of the exponentiation
   exp : Expression. The exponent
 """
-@dataclass
+@dataclass(slots = True)
 class Exponentiation (Expression):
   base: Expression
   exp: Expression
@@ -110,7 +111,7 @@ Inherits from Expression
 Attributes:
   expr : Expression. The expression inside the parentheses
 """
-@dataclass
+@dataclass(slots = True)
 class Parentheses (Expression):
   expr: Expression
 
@@ -123,7 +124,7 @@ Attributes:
   left : Expression. The left operand
   rigth : Expression. The right operand
 """
-@dataclass
+@dataclass(slots = True)
 class Binary (Expression):
   operator : str
   left : Expression
@@ -138,7 +139,7 @@ Attributes:
   operator : str. The operator
   operand : Expression. The operand
 """
-@dataclass
+@dataclass(slots = True)
 class Unary(Expression):
   operator: str
   operand: Expression
@@ -149,7 +150,7 @@ Inherits from Expression
 Attributes:
   value : Union [float, int]. The value of the number
 """
-@dataclass
+@dataclass(slots = True)
 class Number (Expression):
   value: Union [float, int]
 
@@ -183,12 +184,14 @@ class MakeDot(Visitor):
     'arrowhead': 'none'
   }
   
-  #Digraph declaration
-  dot = Digraph('hoc_ast')
-  dot.attr('node', **node_default)
-  dot.attr('edge', **edge_default)
-  #Sequence of the nodes  
-  sequence = 0
+  #Digraph of each instance: the nodes of a run do not leak into the next one
+  dot : Digraph = field(default_factory = lambda: Digraph('hoc_ast'))
+  #Sequence of the nodes
+  sequence : int = 0
+
+  def __post_init__(self):
+    self.dot.attr('node', **self.node_default)
+    self.dot.attr('edge', **self.edge_default)
   
   def name(self):
     self.sequence += 1 #Increments the sequence
@@ -17,7 +17,9 @@ Methods:
   expr : Parse an expression
   factor : Parse a factor
   list : Parse a list of expressions
+  statement : Parse an assignment or an expression
   parse : Parse the tokens
+  iterparse : Parse the tokens lazily, one statement at a time
 
 """
 @dataclass
@@ -117,25 +119,40 @@ class Parser:
     list = []
     
     while self.next_tok != None:
-      if self._accept('VAR'):
-        var = Variable(self.tok.value)
-        if self.next_tok and self.next_tok.type == '=':
-          list.append(self.assignment(var))
-        else:
-          list.append(var)
-      else:
-        list.append(self.expr())
-      
-      if self.next_tok is None:
-        break
+      list.append(self.statement())
       
     return list
+  
+  def statement(self):
+    """
+    statement ::= asgn
+              expr
+    """
+    if self._accept('VAR'):
+      var = Variable(self.tok.value)
+      if self.next_tok and self.next_tok.type == '=':
+        return self.assignment(var)
+      return var
+    return self.expr()
+  
   def parse(self, tokens):
     self.tok = None
     self.next_tok = None
     self.tokens = tokens
     self._advance()
     return self.list()
+  
+  def iterparse(self, tokens):
+    """
+    Parses the tokens lazily and yields the statements one by one,
+    so a statement is available as soon as its tokens have arrived
+    """
+    self.tok = None
+    self.next_tok = None
+    self.tokens = iter(tokens)
+    self._advance()
+    while self.next_tok is not None:
+      yield self.statement()
     
   
   
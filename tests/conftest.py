@@ -0,0 +1,28 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+#The modules of Vega_version are imported by name, as the modules of the directory import each other
+sys.path.insert(0, os.path.join(root, 'Vega_version'))
+sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+
+stages = ['stage1', 'stage2', 'stage3', 'Vega_version']
+
+def load(stage, module):
+  """
+  A module of a stage under a name of its own (the stages have modules of the same names)
+  """
+  name = f'{stage}_{module}'
+  if name not in sys.modules:
+    spec = importlib.util.spec_from_file_location(name, os.path.join(root, stage, f'{module}.py'))
+    sys.modules[name] = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(sys.modules[name])
+  return sys.modules[name]
+
+@pytest.fixture(params = stages)
+def lex(request):
+  return load(request.param, 'lex')
@@ -0,0 +1,75 @@
+import sys
+
+import pytest
+
+from lex import Lexer
+from parser import Parser
+from evaluator import Evaluator
+from arena import Arena, HEADER, MAGIC, VERSION, LITTLE, BIG
+
+source = """
+r = 2
+x = y = 2*PI*r
+sqrt(x*x + r*r) - (-y) % 3 ^ 2
+theta = atan(y/x) + log10(abs(-r))
+z * exp(-theta) + int(2.5) - sin(cos(1e-3))
+"""
+
+def parse(source):
+  return Parser().parse(Lexer().tokenize(source))
+
+@pytest.fixture
+def statements():
+  return parse(source)
+
+def arena_of(statements):
+  arena = Arena()
+  arena.roots.extend(arena.add(stmt) for stmt in statements)
+  return arena
+
+def test_round_trip(statements):
+  arena = arena_of(statements)
+  assert arena.to_nodes() == statements
+  copy = Arena.frombytes(arena.tobytes())
+  assert copy.to_nodes() == statements
+  assert copy.evaluate({'z': 1.5}) == Evaluator({'z': 1.5}).run(statements)
+
+def test_parser_into_arena(statements):
+  arena = Arena()
+  arena.roots.extend(Parser(factory = arena).parse(Lexer().tokenize(source)))
+  assert Arena.frombytes(arena.tobytes()).to_nodes() == statements
+
+def test_deep_tree():
+  statements = parse('x' + ' + 1' * 3000 + '\n' + '(' * 500 + 'x' + ')' * 500)
+  assert Arena.frombytes(arena_of(statements).tobytes()).to_nodes() == statements
+
+def foreign(arena):
+  #The bytes the arena would have on a machine of the other byte order
+  names = '\n'.join(arena.names).encode()
+  order = BIG if sys.byteorder == 'little' else LITTLE
+  arrays = []
+  for arr in (arena.ops, arena.a, arena.b, arena.consts, arena.roots):
+    arr = arr[:]
+    arr.byteswap()
+    arrays.append(arr.tobytes())
+  header = HEADER.pack(MAGIC, VERSION, order, len(arena.ops), len(arena.consts), len(arena.roots), len(names))
+  return b''.join([header, *arrays, names])
+
+def test_other_byte_order(statements):
+  arena = arena_of(statements)
+  data = foreign(arena)
+  assert data != arena.tobytes()
+  copy = Arena.frombytes(data)
+  assert copy.to_nodes() == statements
+  assert copy.consts == arena.consts and copy.a == arena.a
+
+def test_byte_order_is_in_the_header(statements):
+  magic, version, order, *_ = HEADER.unpack_from(arena_of(statements).tobytes())
+  assert order == (LITTLE if sys.byteorder == 'little' else BIG)
+
+@pytest.mark.parametrize('offset, value', [(0, 0x00), (4, VERSION + 1), (6, 7)])
+def test_corrupt_header(statements, offset, value):
+  data = bytearray(arena_of(statements).tobytes())
+  data[offset] = value
+  with pytest.raises(ValueError):
+    Arena.frombytes(data)
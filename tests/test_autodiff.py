@@ -0,0 +1,109 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+from lex import Lexer
+from parser import Parser
+from evaluator import Evaluator
+from autodiff import Tape, derivative, derivatives, gradient
+
+#Formulas of x, y and z and their domain: away from 0 for the logs and the sqrt, and from the
+#jumps of %
+formulas = [
+  'x^3 + 2^y - x^y*z',
+  'sqrt(x*x + y) * z',
+  '(x*y) % 1.7 + z % x',
+  'r = sqrt(x^2 + y^2)\nr*sin(z)^2 + log(r) % 3 + atan(y/x)',
+  'x = x*x + y\ny = x/z\nx^y - exp(-y) + log10(abs(z - 9))',
+  'u = x - y\nu = u*u % 5\n-u + cos(u)*+y',
+]
+
+def parse(source):
+  return Parser().parse(Lexer().tokenize(source))
+
+def value(statements, env):
+  return Evaluator(dict(env)).run(statements)[-1]
+
+def finite_difference(statements, env, name, h = 1e-6):
+  up, down = dict(env), dict(env)
+  up[name] += h
+  down[name] -= h
+  return (value(statements, up) - value(statements, down)) / (2 * h)
+
+def symbolic(statements, env, name):
+  return Evaluator(dict(env)).evaluate(derivatives(statements, name)[-1])
+
+def points(seed, count = 5):
+  rng = random.Random(seed)
+  for _ in range(count):
+    yield {'x': rng.uniform(1.1, 1.9), 'y': rng.uniform(0.6, 1.4), 'z': rng.uniform(1.1, 2.9)}
+
+def smooth(statements, env, h = 1e-4):
+  #A point where no % jumps between env - h and env + h: the derivative is the one of a branch
+  return all(abs(value(statements, {**env, name: env[name] + step}) - value(statements, env)) < 100 * h
+             for name in env for step in (-h, h))
+
+@pytest.mark.parametrize('source', formulas)
+def test_against_finite_differences(source):
+  statements = parse(source)
+  checked = 0
+  for env in points(source):
+    if not smooth(statements, env):
+      continue
+    values, grad = gradient(statements, env)
+    assert values == Evaluator(dict(env)).run(statements)
+    for name in env:
+      expected = finite_difference(statements, env, name)
+      assert symbolic(statements, env, name) == pytest.approx(expected, rel = 1e-5, abs = 1e-6)
+      assert grad.get(name, 0.0) == pytest.approx(expected, rel = 1e-5, abs = 1e-6)
+    checked += 1
+  assert checked >= 2
+
+@pytest.mark.parametrize('source', formulas)
+def test_symbolic_and_tape_agree(source):
+  statements = parse(source)
+  tape = Tape.record(statements)
+  for env in points(source, 20):
+    tape.forward(env)
+    grad = tape.backward()
+    for name in env:
+      assert symbolic(statements, env, name) == pytest.approx(grad.get(name, 0.0), rel = 1e-9, abs = 1e-12)
+
+def test_every_output():
+  statements = parse('a = x*y\nb = a + x\na*b')
+  tape = Tape.record(statements)
+  env = {'x': 2.0, 'y': 3.0}
+  assert tape.forward(env) == [6.0, 8.0, 48.0]
+  assert tape.backward(0) == {'x': 3.0, 'y': 2.0}
+  assert tape.backward(1) == {'x': 4.0, 'y': 2.0}
+  assert tape.backward(2) == {'x': 8 * 3 + 6 * 4, 'y': 8 * 2 + 6 * 2}
+  assert [Evaluator(dict(env)).evaluate(tree) for tree in derivatives(statements, 'y')] == [2.0, 2.0, 28.0]
+
+def test_arrays():
+  statements = parse(formulas[3])
+  rng = np.random.default_rng(0)
+  columns = {'x': rng.uniform(1.1, 1.9, 8), 'y': rng.uniform(0.6, 1.4, 8), 'z': rng.uniform(1.1, 2.9, 8)}
+  values, grad = gradient(statements, columns)
+  for row in range(8):
+    env = {name: float(column[row]) for name, column in columns.items()}
+    scalar_values, scalar_grad = gradient(statements, env)
+    assert values[-1][row] == pytest.approx(scalar_values[-1])
+    for name in env:
+      assert grad[name][row] == pytest.approx(scalar_grad[name])
+
+def test_constant_exponent_needs_no_log():
+  #x^2 at x < 0: the derivative does not take the log of the base
+  statements = parse('x^2')
+  assert gradient(statements, {'x': -3.0})[1] == {'x': -6.0}
+  assert Evaluator({'x': -3.0}).evaluate(derivative(statements[0], 'x')) == -6.0
+
+def test_errors():
+  with pytest.raises(ZeroDivisionError):
+    gradient(parse('sqrt(x)'), {'x': 0.0})
+  with pytest.raises(ZeroDivisionError):
+    Evaluator({'x': 0.0}).evaluate(derivative(parse('sqrt(x)')[0], 'x'))
+  with pytest.raises(NameError, match = 'Undefined variable y'):
+    gradient(parse('x*y'), {'x': 1.0})
+  assert gradient(parse('abs(x)'), {'x': 0.0})[1] == {'x': 0.0}
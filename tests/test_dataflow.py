@@ -0,0 +1,69 @@
+import random
+
+import pytest
+
+from lex import Lexer
+from parser import Parser
+from evaluator import Evaluator
+from dataflow import Dataflow
+
+script = """
+area = PI*r^2
+volume = area*h
+r = r + 1
+ratio = volume/(PI*r^2*h)
+sign = abs(h)
+scaled = sign * k
+r * k
+"""
+
+def parse(source):
+  return Parser().parse(Lexer().tokenize(source))
+
+def evaluate(statements, inputs):
+  evaluator = Evaluator(dict(inputs))
+  return evaluator.run(statements), evaluator.env
+
+def test_run():
+  statements = parse(script)
+  inputs = {'r': 2.0, 'h': 3.0, 'k': 0.5}
+  values, env = evaluate(statements, inputs)
+  flow = Dataflow(statements)
+  assert flow.run(inputs) == values
+  assert all(flow.value(name) == value for name, value in env.items())
+
+def test_only_the_dependents_are_evaluated():
+  flow = Dataflow(parse(script))
+  flow.run({'r': 2.0, 'h': 3.0, 'k': 0.5})
+  assert flow.update({'k': 2.0}) == [5, 6]
+  assert flow.recomputed == 2
+  #ratio and abs(h) keep their value: scaled is not evaluated again
+  assert flow.update({'h': -3.0}) == [1]
+  assert flow.unchanged == 2 and flow.recomputed == 3
+  assert flow.update({'h': -3.0}) == [] and flow.recomputed == 0
+
+@pytest.mark.parametrize('seed', range(20))
+def test_random_updates(seed):
+  rng = random.Random(seed)
+  statements = parse(script)
+  inputs = {'r': 2.0, 'h': 3.0, 'k': 0.5}
+  flow = Dataflow(statements)
+  flow.run(inputs)
+  #r + 1 and h are never 0
+  for _ in range(20):
+    previous = list(flow.values)
+    changes = {name: float(rng.choice([-3, -2, 0.5, 1, 2, 3])) for name in rng.sample(sorted(inputs), rng.randint(1, 3))}
+    inputs.update(changes)
+    changed = flow.update(changes)
+    values, env = evaluate(statements, inputs)
+    assert flow.values == values
+    assert changed == [index for index, value in enumerate(values) if value != previous[index]]
+    assert all(flow.value(name) == value for name, value in env.items())
+
+def test_error_stays_pending():
+  flow = Dataflow(parse('y = 1 / x\ny + 1'))
+  flow.run({'x': 1.0})
+  with pytest.raises(ZeroDivisionError):
+    flow.update({'x': 0.0})
+  assert flow.update({'x': 2.0}) == [0, 1]
+  assert flow.values == [0.5, 1.5]
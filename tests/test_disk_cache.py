@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+import disk_cache
+from disk_cache import FormulaCache
+from evaluator import Evaluator
+from hoc_ast import *
+
+formulas = ['r = 2', 'x = y = 2*PI*r', 'sqrt(x*x + r*r) - (-y) % 3 ^ 2', '1 + 0*x']
+
+def run(cache):
+  evaluator = Evaluator()
+  return [evaluator.run(cache.parse(source)) for source in formulas]
+
+def test_round_trip(tmp_path):
+  path = str(tmp_path / 'formulas.hocc')
+  with FormulaCache(path) as cache:
+    expected = run(cache)
+    trees = [cache.parse(source) for source in formulas]
+    cache.save()
+  with FormulaCache(path) as cache:
+    assert cache.entries == len(formulas)
+    assert [cache.parse(source) for source in formulas] == trees
+    assert cache.hits == len(formulas) and cache.misses == 0
+  with FormulaCache(path) as cache:
+    assert run(cache) == expected
+
+def test_optimize_flag_is_part_of_the_format(tmp_path):
+  path = str(tmp_path / 'formulas.hocc')
+  with FormulaCache(path, optimize = True) as cache:
+    optimized = cache.parse('2*3 + x')
+    cache.save()
+  with FormulaCache(path, optimize = False) as cache:
+    assert cache.entries == 0 #Written with another format: ignored
+    plain = cache.parse('2*3 + x')
+    assert cache.misses == 1
+  assert optimized == [Binary('+', Number(6.0), Variable('x'))]
+  assert plain == [Binary('+', Binary('*', Number(2.0), Number(3.0)), Variable('x'))]
+
+def test_other_versions_are_ignored(tmp_path, monkeypatch):
+  path = str(tmp_path / 'formulas.hocc')
+  with FormulaCache(path) as cache:
+    cache.parse('x + 1')
+    cache.save()
+  monkeypatch.setattr(disk_cache, 'TREES_VERSION', disk_cache.TREES_VERSION + 1)
+  with FormulaCache(path) as cache:
+    assert cache.entries == 0
+  monkeypatch.setattr(disk_cache.sys, 'byteorder', 'big' if disk_cache.sys.byteorder == 'little' else 'little')
+  with FormulaCache(path) as cache:
+    assert cache.entries == 0
+
+def test_grammar_is_the_grammar_of_the_parser(tmp_path):
+  with open(os.path.join(os.path.dirname(disk_cache.__file__), 'grammar.txt'), 'rb') as file:
+    assert disk_cache.grammar_digest() == disk_cache.hashlib.sha256(file.read()).digest()
+  with FormulaCache(str(tmp_path / 'formulas.hocc')) as cache:
+    assert cache.grammar == disk_cache.grammar_digest()
+  with pytest.raises(TypeError): #The entries are always parsed by Parser, with its grammar
+    FormulaCache(str(tmp_path / 'formulas.hocc'), grammar = b'stage2')
@@ -0,0 +1,96 @@
+from typing import Union
+
+import pytest
+
+from hoc_ast import *
+
+class Names(Visitor):
+  def visit(self, n : Number):
+    return 'number'
+
+  def visit(self, v : Variable):
+    return 'variable'
+
+  def visit(self, node : Binary | Unary):
+    return 'operator'
+
+  def visit(self, node : Union[Function, Parentheses]):
+    return 'wrapper'
+
+class Override(Names):
+  #Replaces one method and adds another, inherits the others
+  def visit(self, n : Number):
+    return 'override'
+
+  def visit(self, e : Exponentiation):
+    return 'power'
+
+class Single(Visitor):
+  #A method defined only once is dispatched too
+  def visit(self, n : Number):
+    return n.value
+
+  def helper(self, node):
+    return node
+
+class Catchall(Names):
+  def visit(self, node : Node):
+    return 'node'
+
+class Special(Number):
+  __slots__ = ()
+
+def test_dispatch():
+  names = Names()
+  assert names.visit(Number(1.0)) == 'number'
+  assert names.visit(Variable('x')) == 'variable'
+
+def test_union_annotations():
+  names = Names()
+  assert names.visit(Binary('+', Number(1.0), Number(2.0))) == 'operator'
+  assert names.visit(Unary('-', Number(1.0))) == 'operator'
+  assert names.visit(Function('sin', Number(1.0))) == 'wrapper'
+  assert names.visit(Parentheses(Number(1.0))) == 'wrapper'
+
+def test_subclass_override():
+  override = Override()
+  assert override.visit(Number(1.0)) == 'override'
+  assert override.visit(Exponentiation(Number(1.0), Number(2.0))) == 'power'
+  assert Names().visit(Number(1.0)) == 'number' #The base class keeps its methods
+  with pytest.raises(DispatchError):
+    Names().visit(Exponentiation(Number(1.0), Number(2.0)))
+
+def test_inherited_overloads():
+  override = Override()
+  assert override.visit(Variable('x')) == 'variable'
+  assert override.visit(Unary('-', Number(1.0))) == 'operator'
+  assert override.visit(Parentheses(Number(1.0))) == 'wrapper'
+  assert Catchall().visit(Exponentiation(Number(1.0), Number(2.0))) == 'node'
+  assert Catchall().visit(Number(1.0)) == 'number' #The nearest class of the mro wins
+
+def test_subclass_of_node_type():
+  assert Names().visit(Special(1.0)) == 'number'
+  assert Override().visit(Special(1.0)) == 'override'
+
+def test_missing_type():
+  with pytest.raises(DispatchError, match = r'visit\(\) has no method for Assignment'):
+    Names().visit(Assignment(Variable('x'), Number(1.0)))
+  with pytest.raises(TypeError): #DispatchError is a TypeError
+    Override().visit(Assignment(Variable('x'), Number(1.0)))
+
+def test_single_definition():
+  single = Single()
+  assert single.visit(Number(2.0)) == 2.0
+  assert Number(2.0).accept(single) == 2.0
+  with pytest.raises(DispatchError, match = r'visit\(\) has no method for Variable'):
+    single.visit(Variable('x'))
+  assert single.helper('anything') == 'anything' #Not annotated: a plain method
+  assert 'helper' not in Single.__overloads__
+
+def test_dispatched_methods_take_one_argument():
+  with pytest.raises(TypeError, match = 'one argument after self'):
+    class Wrong(Visitor):
+      def visit(self, n : Number):
+        pass
+      def visit(self, a : Number, b : Number):
+        pass
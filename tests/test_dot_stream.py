@@ -0,0 +1,45 @@
+import io
+import tracemalloc
+
+from lex import Lexer
+from parser import Parser
+from dot_stream import DotWriter, size
+
+source = ' + '.join(f'sin(x*{i}) - y/{i + 1}' for i in range(50))
+
+def statements(count):
+  for _ in range(count):
+    yield Parser().parse(Lexer().tokenize(source))[0]
+
+def test_collapsed_statements_are_counted():
+  #A generator of statements gets the same drawing as the list of the same statements
+  drawings = []
+  for source in (statements(10), list(statements(10))):
+    out = io.StringIO()
+    writer = DotWriter(out, max_nodes = 5)
+    writer.write(source)
+    drawings.append((out.getvalue(), writer.collapsed, writer.hidden))
+  assert drawings[0] == drawings[1]
+  nodes = size(next(statements(1)))
+  assert f'... {9 * nodes} nodes in 9 statements' in drawings[0][0]
+
+def test_budget_keeps_memory_bounded():
+  #Once the budget is spent, the remaining statements of a generator are counted one at a time
+  tracemalloc.start()
+  try:
+    kept = list(statements(50))
+    held = tracemalloc.get_traced_memory()[0]
+    del kept
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    DotWriter(io.StringIO(), max_nodes = 5).write(statements(200))
+    peak = tracemalloc.get_traced_memory()[1] - base
+  finally:
+    tracemalloc.stop()
+  assert peak < held / 5
+
+def test_without_counting():
+  out = io.StringIO()
+  writer = DotWriter(out, max_nodes = 5, count_hidden = False)
+  writer.write(statements(3))
+  assert writer.hidden == 0 and '[label="..."' in out.getvalue()
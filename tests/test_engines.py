@@ -0,0 +1,91 @@
+import math
+import random
+
+import pytest
+
+from lex import Lexer
+from parser import Parser
+from evaluator import Evaluator, compile_program
+from vm import compile_bytecode
+from jit import jit_program
+
+def parse(source):
+  return Parser().parse(Lexer().tokenize(source))
+
+def evaluator(statements):
+  return lambda env: Evaluator(env).run(statements)
+
+def vm(statements):
+  return compile_bytecode(statements).run
+
+#Each engine compiles the statements to a function env -> list of values
+engines = {'evaluator': evaluator, 'compiled': compile_program, 'vm': vm, 'jit': jit_program}
+
+def expression(rng, names, depth):
+  if depth == 0 or rng.random() < 0.2:
+    return rng.choice([f'{rng.uniform(0, 10):.3f}', str(rng.randint(0, 3)), rng.choice(names), 'PI'])
+  kind = rng.randrange(5)
+  if kind == 0:
+    return f'{rng.choice(["sin", "cos", "atan", "sqrt", "log", "exp", "abs", "int"])}({expression(rng, names, depth - 1)})'
+  if kind == 1:
+    return f'{rng.choice("+-")}{expression(rng, names, depth - 1)}'
+  if kind == 2:
+    return f'({expression(rng, names, depth - 1)})'
+  operator = rng.choice(['+', '-', '*', '/', '%', '^'])
+  return f'{expression(rng, names, depth - 1)} {operator} {expression(rng, names, depth - 1)}'
+
+def program(rng):
+  names = ['x', 'y', 'z']
+  lines = []
+  for _ in range(rng.randint(1, 5)):
+    line = expression(rng, names, 4)
+    if rng.random() < 0.5:
+      target = rng.choice(['x', 'y', 'w', 'total'])
+      names.append(target)
+      line = f'{target} = {line}'
+    lines.append(line)
+  return '\n'.join(lines)
+
+def outcome(function, env):
+  #The values, or the type of the error: every engine raises the errors of the Evaluator
+  env = dict(env)
+  try:
+    values = function(env)
+  except (ArithmeticError, ValueError, NameError) as e:
+    return type(e).__name__, None
+  return [repr(value) for value in values], env
+
+@pytest.mark.parametrize('seed', range(200))
+def test_engines_agree(seed):
+  rng = random.Random(seed)
+  while True:
+    source = program(rng)
+    try:
+      statements = parse(source)
+      break
+    except ValueError: #The parser rejects a division by the literal 0
+      pass
+  env = {'x': rng.uniform(-3, 3), 'y': rng.uniform(0, 5)}
+  if rng.random() < 0.8:
+    env['z'] = float(rng.randint(-2, 2))
+  outcomes = {name: outcome(build(statements), env) for name, build in engines.items()}
+  assert len(set(map(repr, outcomes.values()))) == 1, (source, outcomes)
+
+@pytest.mark.parametrize('source, env, values', [
+  ('r = 2\nx = y = 2*PI*r\nsqrt(x*x + r*r) - (-y) % 3', {}, [2.0, 4 * math.pi, math.sqrt(16 * math.pi ** 2 + 4) - math.fmod(-4 * math.pi, 3)]),
+  ('2 ^ 3 ^ 2\n7 % -3\n1 + -2 ^ 2', {}, [512.0, 1.0, -3.0]),
+  ('x = x + 1\nx * x', {'x': 2.0}, [3.0, 9.0]),
+])
+@pytest.mark.parametrize('engine', engines)
+def test_values(engine, source, env, values):
+  assert engines[engine](parse(source))(dict(env)) == values
+
+@pytest.mark.parametrize('engine', engines)
+@pytest.mark.parametrize('source, error, message', [
+  ('x = 0\n1 / x', ZeroDivisionError, 'division by zero'),
+  ('sqrt(-1)', ValueError, 'math domain error'),
+  ('x + 1', NameError, 'Undefined variable x'),
+])
+def test_errors(engine, source, error, message):
+  with pytest.raises(error, match = message):
+    engines[engine](parse(source))({})
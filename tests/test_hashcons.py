@@ -0,0 +1,81 @@
+import random
+
+import pytest
+
+from lex import Lexer
+from parser import Parser
+from hoc_ast import *
+from evaluator import Evaluator
+from optimizer import count_nodes
+from hashcons import CSEEvaluator, HashConsFactory, compile_dag, dag_size, distinct_nodes
+
+def parse(source, factory = None):
+  parser = Parser() if factory is None else Parser(factory = factory)
+  return parser.parse(Lexer().tokenize(source))
+
+def test_equal_subtrees_are_one_node():
+  factory = HashConsFactory()
+  stmt = parse('sqrt(x*x + y*y) * 2 + sqrt(x*x + y*y) / sqrt(x*x + y*y)', factory)[0]
+  left, right = stmt.left, stmt.right
+  assert left.left is right.left is right.right
+  assert left.left.expr.left.left is left.left.expr.left.right #x
+  assert factory.hits > 0
+
+def test_identity_across_statements_and_intern():
+  factory = HashConsFactory()
+  first, second = parse('a = (x + 1) * 2\n(x + 1) * 2', factory)
+  assert first.expr is second
+  assert factory.intern(parse('(x + 1) * 2')[0]) is second
+  assert factory.number(2.0) is factory.number(2.0)
+  assert factory.variable('x') is factory.variable('x')
+
+def test_different_subtrees_are_different_nodes():
+  factory = HashConsFactory()
+  assert factory.number(0.0) is not factory.number(-0.0)
+  assert factory.binary('-', factory.variable('x'), factory.variable('y')) is not \
+         factory.binary('-', factory.variable('y'), factory.variable('x'))
+  assert factory.unary('-', factory.number(1.0)) is not factory.unary('+', factory.number(1.0))
+
+def test_dag_size():
+  factory = HashConsFactory()
+  stmt = parse('sqrt(x*x + y*y) * 2 + sqrt(x*x + y*y) / sqrt(x*x + y*y) - sqrt(x*x + y*y)', factory)[0]
+  assert count_nodes(stmt) == 37
+  assert dag_size(stmt) == len(distinct_nodes(stmt)) == 11
+
+def expression(rng, depth):
+  #Few leaves, so that the formulas repeat their subtrees
+  if depth == 0 or rng.random() < 0.2:
+    return rng.choice(['x', 'y', '2', '0.5'])
+  kind = rng.randrange(4)
+  if kind == 0:
+    return f'{rng.choice(["sin", "sqrt", "exp", "abs"])}({expression(rng, depth - 1)})'
+  if kind == 1:
+    return f'-({expression(rng, depth - 1)})'
+  return f'({expression(rng, depth - 1)}) {rng.choice("+-*/^")} ({expression(rng, depth - 1)})'
+
+def outcome(run):
+  try:
+    return [repr(value) for value in run()]
+  except (ArithmeticError, ValueError) as e:
+    return type(e).__name__
+
+@pytest.mark.parametrize('seed', range(50))
+def test_cse_results_equal_the_evaluator(seed):
+  rng = random.Random(seed)
+  source = '\n'.join([f'x = {expression(rng, 4)}', expression(rng, 6), f'y = {expression(rng, 5)}', expression(rng, 6)])
+  statements = parse(source)
+  shared = parse(source, HashConsFactory())
+  assert shared == statements
+  env = {'x': 0.75, 'y': -1.5}
+  assert outcome(lambda: CSEEvaluator(dict(env)).run(shared)) == outcome(lambda: Evaluator(dict(env)).run(statements))
+
+def test_shared_subtree_is_computed_once():
+  calls = []
+  factory = HashConsFactory()
+  stmt = parse('(x*x + 1) * (x*x + 1) - (x*x + 1)', factory)[0]
+  class Env(dict):
+    def __getitem__(self, name):
+      calls.append(name)
+      return dict.__getitem__(self, name)
+  assert compile_dag(stmt)(Env(x = 3.0)) == 90.0
+  assert calls == ['x']
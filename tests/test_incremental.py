@@ -0,0 +1,77 @@
+import random
+
+import pytest
+
+from lex import Lexer
+from parser import Parser
+from incremental import IncrementalParser
+
+script = """r = 2
+x = 2*PI*r
+y = x/2
+z = sqrt(x*x + r*r) - y % 3
+w = atan(z) ^ 2
+sin(w) + cos(y)"""
+
+def parse(source):
+  return Parser().parse(Lexer().tokenize(source))
+
+def check(parser, before, change):
+  #The state is the one of a full parse, and the change turns the old statements into the new ones
+  assert parser.statements == parse(parser.source)
+  assert before[:change.index] + change.added + before[change.index + len(change.removed):] == parser.statements
+  for start, end, stmt in zip(parser.starts, parser.ends, parser.statements):
+    assert parse(parser.source[start:end]) == [stmt]
+
+def test_load():
+  parser = IncrementalParser()
+  assert parser.load(script) == parse(script)
+  assert parser.reparsed == 6
+
+def test_edit_line():
+  parser = IncrementalParser()
+  parser.load(script)
+  before = list(parser.statements)
+  change = parser.edit_line(2, 'y = x/2 + 1')
+  check(parser, before, change)
+  assert change.index == 2 and change.removed == before[2:3] and len(change.added) == 1
+  assert parser.reparsed < len(parser.statements)
+
+@pytest.mark.parametrize('text', ['', '\nq = 4\nq*q', '3 +', '  '])
+def test_edits_at_the_boundaries(text):
+  for start, end in [(0, 0), (0, 5), (len(script), len(script)), (script.index('y ='), script.index('z ='))]:
+    parser = IncrementalParser()
+    parser.load(script)
+    before = list(parser.statements)
+    try:
+      parse(script[:start] + text + script[end:])
+    except SyntaxError: #Not a valid script
+      continue
+    check(parser, before, parser.edit(start, end, text))
+
+def test_invalid_edit_keeps_the_state():
+  parser = IncrementalParser()
+  parser.load(script)
+  before = (parser.source, list(parser.statements), list(parser.starts), list(parser.ends))
+  with pytest.raises(SyntaxError, match = 'unexpected end of input'):
+    parser.edit(len(script), len(script), '\n(2 +')
+  assert (parser.source, parser.statements, parser.starts, parser.ends) == before
+
+@pytest.mark.parametrize('seed', range(50))
+def test_random_edits(seed):
+  rng = random.Random(seed)
+  parser = IncrementalParser()
+  parser.load(script)
+  for _ in range(10):
+    lines = parser.source.split('\n')
+    number = rng.randrange(len(lines))
+    kind = rng.randrange(3)
+    if kind == 0: #A line replaced
+      text = f'{rng.choice("abcrxyz")} = {rng.randint(1, 9)} * {rng.choice("rxy")} + {rng.random():.3f}'
+    elif kind == 1: #A line inserted
+      text = f'{lines[number]}\nv{rng.randint(0, 9)} = {rng.randint(1, 99)}'
+    else: #A number changed in place
+      text = lines[number].replace('2', str(rng.randint(10, 99)), 1)
+    before = list(parser.statements)
+    change = parser.edit_line(number, text)
+    check(parser, before, change)
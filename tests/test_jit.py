@@ -0,0 +1,39 @@
+import pytest
+
+from lex import Lexer
+from parser import Parser
+from evaluator import Evaluator
+from jit import jit_expr, jit_program
+
+def parse(source):
+  return Parser().parse(Lexer().tokenize(source))
+
+#Names of hoc that are names of the generated code, or Python keywords once renamed
+@pytest.mark.parametrize('source, env, values', [
+  ('_env = 3', {}, [3.0]),
+  ('_sqrt = 4; sqrt(_sqrt)', {}, [4.0, 2.0]),
+  ('if_ = 2; if = 3; if_ + if', {}, [2.0, 3.0, 5.0]),
+  ('_0 = 5; _1 = _0 + 1; _0 * _1', {}, [5.0, 6.0, 30.0]),
+  ('_pow = 2; _pow ^ 3 + _fmod % 4', {'_fmod': 7.0}, [2.0, 11.0]),
+  ('_error + _NameError + _program', {'_error': 1.0, '_NameError': 2.0, '_program': 3.0}, [6.0]),
+  ('v_x = 1; x = 2; v_x - x', {}, [1.0, 2.0, -1.0]),
+  ('class = 1; lambda = class + 1', {}, [1.0, 2.0]),
+])
+def test_names_do_not_clash(source, env, values):
+  statements = parse(source.replace('; ', '\n'))
+  evaluator = Evaluator(dict(env))
+  assert evaluator.run(statements) == values
+  jitted = dict(env)
+  assert jit_program(statements)(jitted) == values
+  assert jitted == evaluator.env
+
+@pytest.mark.parametrize('source', ['_sqrt * sqrt(_env)', 'if_ - if', 'lambda * _0 + v__0'])
+def test_expr_names_do_not_clash(source):
+  expr = parse(source)[0]
+  env = {'_sqrt': 2.0, '_env': 9.0, 'if_': 5.0, 'if': 3.0, 'lambda': 4.0, '_0': 1.0, 'v__0': 0.5}
+  function = jit_expr(expr)
+  assert function(*(env[name] for name in function.names)) == Evaluator(dict(env)).run([expr])[0]
+
+def test_undefined_variable():
+  with pytest.raises(NameError, match = '_env'):
+    jit_program(parse('_env + 1'))({})
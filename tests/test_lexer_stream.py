@@ -0,0 +1,97 @@
+import io
+import random
+
+import pytest
+
+from conftest import load, stages
+from lex_stream import cut
+
+
+def sources(lex, count = 200, seed = 0):
+  #Random inputs of the characters of the stage, with and without whitespace
+  identifiers = ['x', 'alpha', 'sin', 'PI', 'e', 'E', 'rate_2', 'one', 'x1e', 'x1'] if 'ID' in dict(lex.Lexer.tokens) else ['x', 'e']
+  if 'VAR' not in dict(lex.Lexer.tokens) and 'ID' not in dict(lex.Lexer.tokens):
+    identifiers = []
+  if identifiers:
+    identifiers += ['1e', '2.e'] #Numbers followed by e
+  atoms = ['1', '2.5', '10', '1e5', '3E-2', '7e+12', '0.25e-3', *identifiers]
+  operators = ['+', '-', '*', '/', '%', '(', ')', '=', '^', ' ', '\n', '  ']
+  rng = random.Random(seed)
+  for _ in range(count):
+    yield ''.join(rng.choice(atoms) + rng.choice(operators) for _ in range(rng.randint(1, 40)))
+
+def pairs(tokens):
+  return [(tok.type, tok.value) for tok in tokens]
+
+def test_stream_matches_whole_input(lex):
+  lexer = lex.Lexer()
+  for data in sources(lex):
+    whole = pairs(lexer.tokenize(data))
+    for size in (1, 2, 3, 7, 64):
+      assert pairs(lexer.tokenize_stream(io.StringIO(data), chunk_size = size)) == whole, (data, size)
+      chunks = [data[i:i + size] for i in range(0, len(data), size)]
+      assert pairs(lexer.tokenize_stream(chunks)) == whole, (data, size)
+
+def test_stream_indexes_match_whole_input():
+  lexer = load('Vega_version', 'lex').Lexer()
+  data = 'x1 = 2.5e+3*(alpha - 4)\nsqrt(x1)+y_2^2'
+  whole = [(tok.type, tok.value, tok.index) for tok in lexer.tokenize(data)]
+  streamed = [(tok.type, tok.value, tok.index) for tok in lexer.tokenize_stream(io.StringIO(data), chunk_size = 3)]
+  assert streamed == whole
+
+def test_stream_without_whitespace_scans_bounded_buffers(lex):
+  #The tail carried to the next chunk is at most a token: the scanned buffers do not grow
+  scanned = []
+  lexer = lex.Lexer()
+  scan = lexer._scan
+  def _scan(data, *args):
+    scanned.append(len(data))
+    return scan(data, *args)
+  lexer._scan = _scan
+  data = '+'.join(['12'] * 20000)
+  tokens = list(lexer.tokenize_stream(io.StringIO(data), chunk_size = 64))
+  assert len(tokens) == 39999
+  assert max(scanned) <= 64 + 2
+
+def scanned_lengths(lexer):
+  #The lengths of the buffers scanned by the lexer
+  scanned = []
+  scan = lexer._scan
+  def _scan(data, *args):
+    scanned.append(len(data))
+    return scan(data, *args)
+  lexer._scan = _scan
+  return scanned
+
+def letters(lex):
+  if 'VAR' not in dict(lex.Lexer.tokens) and 'ID' not in dict(lex.Lexer.tokens):
+    pytest.skip('no variables in the grammar of the stage')
+
+@pytest.mark.parametrize('data', ['one+' * 20000, 'x1e-' * 20000 + 'y', 'e+' * 30000 + '1', '1e+' * 20000 + '1'],
+                         ids = ['one+', 'x1e-', 'e+', '1e+'])
+def test_chains_of_e_scan_bounded_buffers(lex, data):
+  #A sign after an identifier (or a number) that ends in e is not the sign of an exponent
+  letters(lex)
+  lexer = lex.Lexer()
+  whole = pairs(lexer.tokenize(data))
+  scanned = scanned_lengths(lexer)
+  assert pairs(lexer.tokenize_stream(io.StringIO(data), chunk_size = 64)) == whole
+  assert max(scanned) <= 64 + 2 + max(len(value) for _, value in whole)
+
+def test_chains_of_e_are_linear():
+  lexer = load('Vega_version', 'lex').Lexer()
+  data = 'one+' * 200000
+  scanned = scanned_lengths(lexer)
+  assert sum(1 for _ in lexer.tokenize_stream(io.StringIO(data), chunk_size = 4096)) == 400000
+  assert max(scanned) <= 4096 + 6
+
+@pytest.mark.parametrize('data, end', [
+  ('one+one+one+', 12),
+  ('1e+', 0),
+  ('x + 1e+', 4),
+  ('x1e+2', 0),
+  ('2 * 3', 4),
+  ('', 0),
+])
+def test_cut(data, end):
+  assert cut(data, load('Vega_version', 'lex').Lexer.master) == end
@@ -0,0 +1,89 @@
+import math
+import random
+
+import pytest
+
+from lex import Lexer
+from parser import Parser
+from hoc_ast import *
+from evaluator import Evaluator
+from optimizer import Optimizer, count_nodes
+
+def parse(source):
+  return Parser().parse(Lexer().tokenize(source))
+
+def optimize(source):
+  return Optimizer().run(parse(source))
+
+@pytest.mark.parametrize('source, tree', [
+  ('(3+4)*x + 0', Binary('*', Number(7.0), Variable('x'))),
+  ('2*PI*r', Binary('*', Number(2 * math.pi), Variable('r'))),
+  ('x*1 + 0*1 - (y/1)', Binary('-', Variable('x'), Variable('y'))),
+  ('-(-x) ^ 1', Variable('x')),
+  ('+x', Variable('x')),
+  ('sqrt(4) + log(E)', Number(3.0)),
+  ('y = (x)', Assignment(Variable('y'), Variable('x'))),
+])
+def test_folding(source, tree):
+  assert optimize(source) == [tree]
+
+def test_node_counts():
+  optimizer = Optimizer()
+  statements = parse('r = 2\nx = 2*PI*r\n(3+4)*x + 0\nsqrt(2)*(r^1)/1 - -(-log(E))')
+  before = sum(count_nodes(stmt) for stmt in statements)
+  optimized = optimizer.run(statements)
+  assert [count_nodes(stmt) for stmt in optimized] == [3, 5, 3, 5]
+  assert optimizer.nodes_before == before == 33
+  assert optimizer.nodes_after == 16 and optimizer.eliminated == 17
+
+#The operations that fail are left in the tree: the error happens when the formula is evaluated
+@pytest.mark.parametrize('tree, error', [
+  (Binary('/', Number(1.0), Number(0.0)), ZeroDivisionError),
+  (Exponentiation(Number(0.0), Unary('-', Number(1.0))), ValueError),
+  (Binary('%', Number(1.0), Number(0.0)), ValueError),
+  (Function('log', Number(0.0)), ValueError),
+  (Function('sqrt', Unary('-', Number(1.0))), ValueError),
+  (Function('exp', Number(1000.0)), OverflowError),
+])
+def test_failing_operations_are_not_folded(tree, error):
+  optimized = Optimizer().run([tree])[0]
+  assert not isinstance(optimized, Number)
+  with pytest.raises(error):
+    Evaluator().run([tree])
+  with pytest.raises(error):
+    Evaluator().run([optimized])
+
+def test_division_by_a_folded_zero():
+  optimized = optimize('1/(1-1)')[0]
+  assert optimized == Binary('/', Number(1.0), Number(0.0))
+
+def expression(rng, depth):
+  #Formulas with many constants, so that most subtrees are folded
+  if depth == 0 or rng.random() < 0.25:
+    return rng.choice(['0', '1', '2', '0.5', '3', 'PI', 'x', 'y'])
+  kind = rng.randrange(5)
+  if kind == 0:
+    return f'{rng.choice(["sin", "cos", "sqrt", "log", "exp", "abs", "int"])}({expression(rng, depth - 1)})'
+  if kind == 1:
+    return f'{rng.choice("+-")}({expression(rng, depth - 1)})'
+  operator = rng.choice(['+', '-', '*', '/', '%', '^'])
+  return f'({expression(rng, depth - 1)}) {operator} ({expression(rng, depth - 1)})'
+
+def outcome(statements, env):
+  try:
+    return [repr(value) for value in Evaluator(dict(env)).run(statements)]
+  except (ArithmeticError, ValueError) as e:
+    return type(e).__name__
+
+@pytest.mark.parametrize('seed', range(100))
+def test_optimized_results_are_equal(seed):
+  rng = random.Random(seed)
+  while True:
+    try:
+      statements = parse('\n'.join(expression(rng, 5) for _ in range(3)))
+      break
+    except ValueError: #The parser rejects a division by the literal 0
+      pass
+  optimized = Optimizer().run(statements)
+  for env in ({'x': 2.0, 'y': 0.5}, {'x': -1.0, 'y': 0.0}, {'x': 0.0, 'y': -3.0}):
+    assert outcome(optimized, env) == outcome(statements, env)
@@ -0,0 +1,97 @@
+import os
+
+import numpy as np
+import pytest
+
+from lex import Lexer
+from parser import Parser
+from vectorized import evaluate_batch
+import parallel
+from parallel import ParallelEvaluator, evaluate_parallel
+from hoc_ast import *
+
+script = """
+r = sqrt(x*x + y*y)
+a = atan(y/x)
+s = r*sin(a)
+c = r*cos(a)
+r = r + 1
+k = 2*PI
+s + c + r + k*z
+"""
+
+def parse(source):
+  return Parser().parse(Lexer().tokenize(source))
+
+def segments():
+  #The shared memory segments of the machine (POSIX: files of /dev/shm)
+  return set(os.listdir('/dev/shm'))
+
+@pytest.fixture(scope = 'module')
+def evaluator():
+  with ParallelEvaluator(2) as evaluator:
+    yield evaluator
+
+@pytest.fixture
+def columns():
+  rng = np.random.default_rng(0)
+  return {'x': rng.random(1001) + 1, 'y': rng.random(1001) - 0.5, 'z': 3.0}
+
+@pytest.mark.parametrize('by', ['rows', 'statements'])
+def test_same_results_as_sequential(evaluator, columns, by):
+  statements = parse(script)
+  expected = evaluate_batch(statements, columns)
+  method = evaluator.evaluate_rows if by == 'rows' else evaluator.evaluate_statements
+  results = method(statements, columns)
+  assert len(results) == len(expected)
+  for result, value in zip(results, expected):
+    np.testing.assert_array_equal(result, np.broadcast_to(value, result.shape))
+
+def test_evaluate_parallel(columns):
+  statements = parse(script)
+  rows = evaluate_parallel(statements, columns, workers = 2, by = 'rows')
+  levels = evaluate_parallel(statements, columns, workers = 2, by = 'statements')
+  for a, b in zip(rows, levels):
+    np.testing.assert_array_equal(a, b)
+  with pytest.raises(ValueError):
+    evaluate_parallel(statements, columns, workers = 1, by = 'columns')
+
+@pytest.mark.skipif(not os.path.isdir('/dev/shm'), reason = 'no /dev/shm')
+def test_no_segment_left_behind(evaluator, columns):
+  before = segments()
+  evaluator.evaluate_rows(parse(script), columns)
+  evaluator.evaluate_statements(parse(script), columns)
+  assert segments() == before
+
+@pytest.mark.skipif(not os.path.isdir('/dev/shm'), reason = 'no /dev/shm')
+def test_worker_error(evaluator, columns):
+  #The error of a worker is raised by the parent, the worker closes its view of the block
+  before = segments()
+  for method in (evaluator.evaluate_rows, evaluator.evaluate_statements):
+    with pytest.raises(NameError, match = 'Undefined variable q'):
+      method(parse('y = x + 1\nq * y'), columns)
+  assert segments() == before
+  assert len(evaluator.evaluate_rows(parse(script), columns)) == 7 #The workers are still usable
+
+def test_worker_releases_the_views(monkeypatch):
+  #A plan that fails while it holds views of the block: the error is raised as it is and the
+  #frames of its traceback no longer hold the views when the block is closed
+  class Failing:
+    columns = ('x',)
+    def __call__(self, columns, out):
+      raise FloatingPointError('overflow')
+  monkeypatch.setattr(parallel, 'compile_vector', lambda expr: Failing())
+  block = parallel.shared_memory.SharedMemory(create = True, size = 2 * 4 * 8)
+  try:
+    with pytest.raises(FloatingPointError) as info:
+      parallel._evaluate(block.name, (2, 4), {'x': 0, '@0': 1}, {}, [('@0', Variable('x'))], 0, 4)
+  finally:
+    block.close()
+    block.unlink()
+  values = [value for entry in info.traceback[1:] for value in entry.frame.f_locals.values()]
+  values += [item for value in values if isinstance(value, dict) for item in value.values()]
+  assert not any(isinstance(value, np.ndarray) for value in values)
+
+def test_columns_of_different_lengths(evaluator):
+  with pytest.raises(ValueError):
+    evaluator.evaluate_rows(parse('x + y'), {'x': np.zeros(3), 'y': np.zeros(4)})
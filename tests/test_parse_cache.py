@@ -0,0 +1,56 @@
+import pytest
+
+from parse_cache import ParseCache
+
+def test_eviction_order():
+  cache = ParseCache(maxsize = 3)
+  for source in ['a = 1', 'b = 2', 'c = 3']:
+    cache.parse(source)
+  cache.parse('a = 1') #a is now the most recently used, b the least
+  cache.parse('d = 4')
+  assert list(cache.entries) == ['c = 3', 'a = 1', 'd = 4']
+  assert 'b = 2' not in cache
+  cache.parse('e = 5')
+  cache.parse('f = 6')
+  assert list(cache.entries) == ['d = 4', 'e = 5', 'f = 6']
+  assert cache.evictions == 3
+
+def test_counters():
+  cache = ParseCache(maxsize = 2)
+  sources = ['x = 1', 'y = 2', 'x = 1', 'z = 3', 'y = 2', 'x = 1', 'x = 1']
+  for source in sources:
+    cache.parse(source)
+  #x miss, y miss, x hit, z miss (evicts y), y miss (evicts x), x miss (evicts z), x hit
+  assert cache.stats() == {'size': 2, 'maxsize': 2, 'hits': 2, 'misses': 5, 'evictions': 3}
+  assert cache.hits + cache.misses == len(sources)
+  cache.clear()
+  assert cache.stats() == {'size': 0, 'maxsize': 2, 'hits': 0, 'misses': 0, 'evictions': 0}
+
+def test_filled_past_capacity():
+  cache = ParseCache(maxsize = 100)
+  sources = [f'v{i} = {i}' for i in range(250)]
+  for source in sources:
+    cache.parse(source)
+  assert len(cache) == 100
+  assert list(cache.entries) == sources[-100:]
+  assert (cache.misses, cache.hits, cache.evictions) == (250, 0, 150)
+  for source in sources[-100:]:
+    cache.parse(source)
+  assert (cache.misses, cache.hits, cache.evictions) == (250, 100, 150)
+
+def test_hits_share_the_statements():
+  cache = ParseCache(normalize = True)
+  first = cache.parse('x = 1 + 2')
+  assert cache.parse('x  =  1+ 2') is not first #'1+ 2' is another key than '1 + 2'
+  assert cache.parse(' x = 1   +   2 ') is first
+  assert cache.parse('ab') != cache.parse('a b')
+
+def test_syntax_errors_are_not_cached():
+  cache = ParseCache()
+  with pytest.raises(SyntaxError):
+    cache.parse('x = = 1')
+  assert len(cache) == 0 and cache.misses == 1
+
+def test_maxsize_must_be_positive():
+  with pytest.raises(ValueError):
+    ParseCache(maxsize = 0)
@@ -0,0 +1,62 @@
+import pytest
+
+from lex import Lexer
+from parser import Parser, StackParser
+from hoc_ast import *
+
+def parse(source):
+  return Parser().parse(Lexer().tokenize(source))
+
+def bare(node):
+  #The tree without its Parentheses nodes: the explicit grouping of the expected trees
+  return fold(node, lambda node, values: values[0] if type(node) is Parentheses else rebuild(node, values))
+
+#Each source and the same expression with its grouping written out
+@pytest.mark.parametrize('source, grouped', [
+  ('1 + 2 * 3', '1 + (2 * 3)'),
+  ('1 * 2 + 3', '(1 * 2) + 3'),
+  ('1 - 2 - 3', '(1 - 2) - 3'),
+  ('8 / 4 / 2', '(8 / 4) / 2'),
+  ('1 + 2 * 3 % 4', '1 + ((2 * 3) % 4)'),
+  ('2 ^ 3 ^ 2', '2 ^ (3 ^ 2)'),
+  ('-2 ^ 2', '-(2 ^ 2)'),
+  ('2 ^ -1', '2 ^ (-1)'),
+  ('-x * y', '(-x) * y'),
+  ('2 * -3', '2 * (-3)'),
+  ('x ^ y * z', '(x ^ y) * z'),
+  ('7 % 3 ^ 2', '7 % (3 ^ 2)'),
+  ('sin(x) ^ 2', '(sin(x)) ^ 2'),
+  ('a = b = 1 + 2 * 3', 'a = b = (1 + (2 * 3))'),
+])
+def test_precedence(source, grouped):
+  assert bare(parse(source)[0]) == bare(parse(grouped)[0])
+
+def test_trees():
+  assert parse('-2^2 + 1')[0] == Binary('+', Unary('-', Exponentiation(Number(2.0), Number(2.0))), Number(1.0))
+  assert parse('x = y = z - 1')[0] == Assignment(Variable('x'), Assignment(Variable('y'), Binary('-', Variable('z'), Number(1.0))))
+
+def test_statements():
+  assert len(parse('x = 1\n\ny = 2\nx + y\n')) == 3
+
+def test_syntax_error():
+  with pytest.raises(SyntaxError):
+    parse('1 + * 2')
+
+@pytest.mark.parametrize('parser', [Parser, StackParser])
+@pytest.mark.parametrize('source', ['2+', '(2', 'sqrt(2', 'sqrt', 'x =', 'x = y =', '-', '2 *\n'])
+def test_end_of_input(parser, source):
+  with pytest.raises(SyntaxError, match = 'unexpected end of input'):
+    parser().parse(Lexer().tokenize(source))
+
+@pytest.mark.parametrize('parser', [Parser, StackParser])
+def test_unexpected_token(parser):
+  with pytest.raises(SyntaxError, match = "Expected \\) but got NUMBER"):
+    parser().parse(Lexer().tokenize('(2 3'))
+  with pytest.raises(SyntaxError, match = 'but got \\)'):
+    parser().parse(Lexer().tokenize('2 + )'))
+
+def test_iterparse_end_of_input():
+  statements = Parser().iterparse(Lexer().tokenize('x = 1\ny = (x'))
+  assert next(statements) == Assignment(Variable('x'), Number(1.0))
+  with pytest.raises(SyntaxError, match = 'unexpected end of input'):
+    next(statements)
@@ -0,0 +1,83 @@
+import os
+import subprocess
+import sys
+
+import profiling
+from profiling import Profiler, CostDot
+
+script = 'x = 1 + 2\nx*x'
+
+def parse_collapsed(text):
+  #One 'frame;frame;... ns' line per stack, the names can hold spaces ('x =')
+  assert text.endswith('\n')
+  lines = [line.rsplit(' ', 1) for line in text.splitlines()]
+  return {tuple(stack.split(';')): int(ns) for stack, ns in lines}
+
+def test_collapsed_stacks():
+  profiler = Profiler()
+  statements, values = profiler.run(script, nodes = True)
+  assert values == [3.0, 9.0]
+  collapsed = parse_collapsed(profiler.collapsed())
+  assert set(collapsed) <= set(profiler.frames)
+  assert {('lex',), ('parse',), ('evaluate',), ('evaluate', 'x ='), ('evaluate', 'x =', '+'),
+          ('evaluate', '*')} <= set(collapsed)
+  assert all(ns == profiler.frames[stack].own and ns > 0 for stack, ns in collapsed.items())
+
+def test_frame_counts():
+  profiler = Profiler()
+  profiler.run(script, nodes = True)
+  calls = {stack: frame.calls for stack, frame in profiler.frames.items()}
+  assert calls == {('lex',): 1, ('parse',): 1, ('evaluate',): 1,
+                   ('evaluate', 'x ='): 1, ('evaluate', 'x =', '+'): 1,
+                   ('evaluate', 'x =', '+', '1.0'): 1, ('evaluate', 'x =', '+', '2.0'): 1,
+                   ('evaluate', '*'): 1, ('evaluate', '*', 'x'): 2}
+  for stack, frame in profiler.frames.items():
+    #The total of a frame is its own time plus the totals of the frames it called
+    inner = sum(child.total for path, child in profiler.frames.items() if path[:-1] == stack)
+    assert frame.total == frame.own + inner
+  profiler.run(script)
+  assert profiler.frames[('evaluate',)].calls == 2 and profiler.frames[('lex',)].calls == 2
+
+def test_stages_only():
+  profiler = Profiler()
+  profiler.run(script)
+  assert set(profiler.frames) == {('lex',), ('parse',), ('evaluate',)}
+  assert profiler.nodes == {}
+
+def test_cost_dot():
+  profiler = Profiler()
+  statements, _ = profiler.run(script, nodes = True)
+  dot = CostDot(profiler = profiler)
+  for stmt in statements:
+    stmt.accept(dot)
+  source = dot.dot.source
+  assert source.count('colorscheme=reds9') == 7 #The target of the assignment is not evaluated
+  assert 'fillcolor=9' in source #The costliest node
+
+def run_main(cwd, *args, env = None):
+  subprocess.run([sys.executable, profiling.__file__, *args], cwd = cwd, env = env, capture_output = True, check = True)
+
+def files(tree):
+  return {os.path.join(root, name) for root, _, names in os.walk(tree) for name in names
+          if not name.endswith('.pyc')}
+
+def test_main_writes_outside_the_tree(tmp_path):
+  #Without a directory the files go to a new temporary directory, here in tmp_path
+  tree = os.path.dirname(os.path.dirname(os.path.abspath(profiling.__file__)))
+  before = files(tree)
+  run_main(os.path.dirname(profiling.__file__), env = {**os.environ, 'TMPDIR': str(tmp_path)})
+  assert files(tree) == before
+  directory, = tmp_path.iterdir()
+  assert directory.name.startswith('hoc_profile_')
+  assert sorted(os.listdir(directory)) == ['hoc_ast.dot', 'profile.folded']
+  assert ('evaluate',) in parse_collapsed((directory / 'profile.folded').read_text())
+
+def test_main_writes_to_the_directory(tmp_path):
+  source = tmp_path / 'program.hoc'
+  source.write_text('y = 2\ny*y + 1\n')
+  output = tmp_path / 'out'
+  output.mkdir()
+  run_main(tmp_path, str(source), str(output))
+  assert sorted(os.listdir(output)) == ['hoc_ast.dot', 'profile.folded']
+  collapsed = parse_collapsed((output / 'profile.folded').read_text())
+  assert ('evaluate', 'y =') in collapsed and ('evaluate', '+', '*', 'y') in collapsed
@@ -0,0 +1,60 @@
+import math
+
+import pytest
+
+from lex import Lexer
+from parser import Parser
+from evaluator import Evaluator
+from hoc_ast import *
+from serialize import BinaryAst, dump, dumps, load, loads
+
+source = """
+r = 2
+x = y = 2*PI*r
+sqrt(x*x + r*r) - (-y) % 3 ^ 2
+theta = atan(y/x) + log10(abs(-r))
+z * exp(-theta) + int(2.5) - sin(cos(1e-3))
+"""
+
+def parse(source):
+  return Parser().parse(Lexer().tokenize(source))
+
+@pytest.fixture
+def statements():
+  return parse(source)
+
+def test_round_trip(statements):
+  assert len(statements) == 5
+  data = dumps(statements)
+  assert loads(data) == statements
+  assert loads(bytearray(data)) == statements
+
+def test_file_round_trip(statements, tmp_path):
+  path = tmp_path / 'statements.hocb'
+  with open(path, 'wb') as file:
+    dump(statements, file)
+  with open(path, 'rb') as file:
+    assert load(file) == statements
+
+def test_evaluate(statements):
+  ast = BinaryAst(dumps(statements))
+  try:
+    assert ast.evaluate({'z': 1.5}) == Evaluator({'z': 1.5}).run(statements)
+  finally:
+    ast.release()
+
+def test_signed_zeros():
+  #0.0 == -0.0: the constant table keys them with their sign
+  statements = loads(dumps([Binary('+', Number(0.0), Number(-0.0))]))
+  assert [math.copysign(1, n.value) for n in (statements[0].left, statements[0].right)] == [1, -1]
+
+def test_deep_tree():
+  #The stream is written and read with explicit stacks
+  statements = parse('x' + ' + 1' * 3000 + '\n' + '(' * 500 + 'x' + ')' * 500)
+  assert loads(dumps(statements)) == statements
+
+def test_corrupt_header(statements):
+  data = bytearray(dumps(statements))
+  data[0] ^= 0xff
+  with pytest.raises(ValueError):
+    loads(data)
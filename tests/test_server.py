@@ -0,0 +1,58 @@
+import asyncio
+import json
+
+from server import HocServer
+
+async def exchange(lines, **options):
+  async with HocServer(**options) as server:
+    host, port = await server.start()
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(b''.join(lines))
+    writer.write_eof()
+    replies = [json.loads(line) for line in (await reader.read(-1)).split(b'\n') if line]
+    writer.close()
+    return replies
+
+def test_replies_in_order():
+  replies = asyncio.run(exchange([b'{"id": 1, "formula": "x*y + 1", "env": {"x": 2, "y": 3}}\n', b'1 + 2\n']))
+  assert replies == [{'id': 1, 'values': [7.0]}, {'values': [3.0]}]
+
+def test_undecodable_line_gets_an_error_and_reading_goes_on():
+  replies = asyncio.run(exchange([b'1 + \xff\n', b'{"formula": "\xfe"}\n', b'2 * 3\n']))
+  assert [reply.get('error', '').split(':')[0] for reply in replies] == ['UnicodeDecodeError'] * 2 + ['']
+  assert replies[2] == {'values': [6.0]}
+
+def test_line_too_long():
+  replies = asyncio.run(exchange([b'1 + 1\n', b'1' * (2 ** 17) + b'\n', b'2 + 2\n']))
+  assert replies == [{'values': [2.0]}, {'error': 'ValueError: Request line too long'}]
+
+class BrokenWriter:
+  #The transport of a client that left: every write fails
+  def write(self, data):
+    raise ConnectionResetError('The client left')
+
+  async def drain(self):
+    pass
+
+  def close(self):
+    pass
+
+def test_writer_failure_stops_reading():
+  async def run():
+    async with HocServer(inflight = 2) as server:
+      await server.start()
+      reader = asyncio.StreamReader()
+      reader.feed_data(b'1 + 1\n' * 100)
+      reader.feed_eof()
+      #handle swallows the cancellation of a timeout: it has to end by itself
+      handling = asyncio.create_task(server.handle(reader, BrokenWriter()))
+      done, _ = await asyncio.wait([handling], timeout = 5)
+      return handling in done
+  assert asyncio.run(run())
+
+def test_parse_errors_get_an_error_and_the_batch_goes_on():
+  lines = [b'2 +\n', b'(2\n', b'1 / 0\n', b'x = = 1\n', b'2 * 3\n']
+  replies = asyncio.run(exchange(lines))
+  assert replies[:4] == [{'error': 'SyntaxError: unexpected end of input'}] * 2 + \
+    [{'error': 'ValueError: Division by zero'}, {'error': "SyntaxError: Expected NUMBER, VAR, FUNC, CONST or '(' but got ="}]
+  assert replies[4] == {'values': [6.0]}
@@ -0,0 +1,74 @@
+import math
+
+import pytest
+
+from lex import Lexer
+from parser import Parser
+from evaluator import Evaluator, compile_program
+from hoc_ast import *
+from symbols import SymbolTable
+
+def parse(source):
+  return Parser().parse(Lexer().tokenize(source))
+
+def variables(node):
+  #The targets of the assignments are not children of their Assignment
+  nodes = [n.var if type(n) is Assignment else n for n in postorder(node)]
+  return [n for n in nodes if type(n) is Variable]
+
+def test_slot_assignment():
+  table = SymbolTable()
+  assert table.readonly == len(Lexer.constants)
+  assert [table.slots[name] for name in Lexer.constants] == list(range(table.readonly))
+  x, y = table.slot('x'), table.slot('y')
+  assert (x, y) == (table.readonly, table.readonly + 1)
+  assert table.slot('x') == x and len(table) == table.readonly + 2
+  assert table.values[x] is None
+
+def test_slots_are_reused_across_statements():
+  table = SymbolTable()
+  statements = table.resolve_all(parse('r = 2\nx = 2*PI*r\nr = x + r\nsqrt(x*x + r*r)'))
+  slots = {}
+  for stmt in statements:
+    for v in variables(stmt):
+      assert slots.setdefault(v.name, v.slot) == v.slot
+  assert slots == {'r': table.slots['r'], 'x': table.slots['x']}
+  assert len(table) == table.readonly + 2
+
+def test_resolved_trees_run_on_the_slots():
+  source = 'r = 2\nx = 2*PI*r\nr = x + r\nsqrt(x*x + r*r)'
+  table = SymbolTable()
+  statements = table.resolve_all(parse(source))
+  assert statements == parse(source) #The slot is not part of the comparison
+  evaluator = Evaluator()
+  assert compile_program(statements)(table.values) == evaluator.run(parse(source))
+  assert table.dump() == evaluator.env
+
+def test_readonly_symbols():
+  table = SymbolTable()
+  with pytest.raises(NameError, match = 'Cannot assign the constant PI'):
+    table['PI'] = 3.0
+  with pytest.raises(NameError, match = 'Cannot assign the constant E'):
+    table.resolve(Assignment(Variable('E'), Number(1.0)))
+  with pytest.raises(NameError):
+    table.load({'x': 1.0, 'GAMMA': 0.5})
+  assert table['PI'] == math.pi
+  assert table.resolve(Variable('PI')).slot == table.slots['PI'] #Reading a constant is allowed
+
+def test_undefined():
+  table = SymbolTable()
+  table.slot('x')
+  for name in ['x', 'y']:
+    with pytest.raises(NameError, match = f'Undefined variable {name}'):
+      table[name]
+  assert 'x' in table and 'y' not in table
+  with pytest.raises(NameError, match = 'Undefined variable x'):
+    compile_program(table.resolve_all(parse('x + 1')))(table.values)
+
+def test_load_dump_array():
+  table = SymbolTable()
+  table.load({'x': 1.5, 'y': -2.0})
+  table.slot('z')
+  assert table.dump() == {'x': 1.5, 'y': -2.0}
+  values = table.array()
+  assert values[table.slots['x']] == 1.5 and math.isnan(values[table.slots['z']])
@@ -0,0 +1,85 @@
+import itertools
+import math
+
+import numpy as np
+import pytest
+
+from lex import Lexer
+from parser import Parser
+from evaluator import Evaluator
+from vectorized import compile_vector, evaluate_batch, power
+
+#The grid of inputs: signs, zeros, non-finite values
+points = [-2.5, -1.0, -0.5, -0.0, 0.0, 0.5, 1.0, 3.0, math.inf, -math.inf, math.nan]
+x, y = (np.array(column) for column in zip(*itertools.product(points, repeat = 2)))
+
+def parse(source):
+  return Parser().parse(Lexer().tokenize(source))
+
+def expected(statements, row):
+  """
+  The values of the Evaluator for a row, None for a statement that raises (NumPy gives a
+  value that is not finite instead)
+  """
+  evaluator = Evaluator({'x': float(x[row]), 'y': float(y[row])})
+  values = []
+  for stmt in statements:
+    try:
+      values.append(evaluator.evaluate(stmt))
+    except (ArithmeticError, ValueError):
+      return values + [None] * (len(statements) - len(values))
+  return values
+
+@pytest.mark.parametrize('source', [
+  'x + y * 2 - -x',
+  'x / y',
+  '(x - y) / (x * y)',
+  'x % y',
+  'x ^ y',
+  'x ^ 2 + y ^ 0.5',
+  'sqrt(x) + log(y)',
+  'exp(x) * atan(y) - abs(x)',
+  'log10(abs(x) + 1) / cos(y)',
+  'sin(x) * y',
+  'z = x / y\nz * z + y',
+])
+def test_equal_to_the_evaluator(source):
+  statements = parse(source)
+  with np.errstate(all = 'ignore'):
+    results = evaluate_batch(statements, {'x': x, 'y': y})
+  for row in range(len(x)):
+    for value, result in zip(expected(statements, row), results):
+      if value is None:
+        assert not np.isfinite(result[row]), (source, x[row], y[row])
+      elif math.isnan(value):
+        assert np.isnan(result[row]), (source, x[row], y[row])
+      else:
+        assert result[row] == value, (source, x[row], y[row])
+
+def test_nan_propagates():
+  plan = compile_vector(parse('sqrt(x*x + y*y) + 1')[0])
+  result = plan({'x': np.array([math.nan, 3.0]), 'y': np.array([4.0, math.nan])})
+  assert np.isnan(result).all()
+
+def test_broadcast_and_reuse():
+  plan = compile_vector(parse('x * y + 1')[0])
+  assert plan({'x': np.arange(3.0), 'y': 2.0}).tolist() == [1.0, 3.0, 5.0]
+  assert plan({'x': np.arange(2.0), 'y': np.array([3.0, 4.0])}).tolist() == [1.0, 5.0]
+
+def test_undefined_column():
+  with pytest.raises(NameError, match = 'y'):
+    compile_vector(parse('x + y')[0])({'x': x})
+
+def test_square_root_as_power():
+  #pow and not sqrt: NumPy takes a scalar exponent of 0.5 for a square root
+  with np.errstate(all = 'ignore'):
+    result = compile_vector(parse('x ^ 0.5')[0])({'x': np.array([-math.inf, -0.0, 4.0])})
+  assert result.tolist() == [math.pow(-math.inf, 0.5), 0.0, 2.0]
+  assert math.copysign(1, result[1]) == 1
+
+def test_power_without_out():
+  #The ufuncs of the plans are also called without out (autodiff.Tape over arrays)
+  with np.errstate(all = 'ignore'):
+    assert power(-math.inf, 0.5) == math.inf
+    assert power(np.array([-math.inf, 9.0]), 0.5).tolist() == [math.inf, 3.0]
+    assert power(np.array([2.0]), 3.0).tolist() == [8.0]